@@ -0,0 +1,55 @@
+"""How the dynamic resolution controller follows a changing GPU load.
+
+Simulates frames whose GPU time is a fixed cost plus a cost per rendered pixel,
+with a load that rises, peaks and falls again (plus noise), and reports per
+phase the share of frames over budget at a fixed full resolution and with the
+controller, the average render scale and the number of scale changes (render
+target reallocations would be zero, the scale only changes the viewport).
+Runs without a GPU.
+
+Run from the repository root:
+    python -m benchmarks.bench_dynamic_resolution
+    python -m benchmarks.bench_dynamic_resolution --budget 8.3
+"""
+import argparse
+import numpy as np
+from graphics.resolution import ResolutionController
+
+WIDTH, HEIGHT = 1920, 1080
+FIXED_MS = 2.0  # Culling, shadow maps... everything independent of the resolution
+FRAMES_PER_PHASE = 600
+
+# Cost per megapixel (ms) of the phases:
+PHASES = (("light", 4.0), ("heavy", 9.0), ("peak", 14.0), ("heavy", 9.0), ("light", 4.0))
+
+
+def frame_ms(scale: float, ms_per_megapixel: float, rng: np.random.Generator) -> float:
+    megapixels = WIDTH * HEIGHT * scale * scale / 1e6
+    return (FIXED_MS + megapixels * ms_per_megapixel) * rng.lognormal(0.0, 0.08)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1000.0 / 60.0, help="frame budget in ms")
+    args = parser.parse_args()
+    rng = np.random.default_rng(5)
+    controller = ResolutionController(target_ms=args.budget)
+
+    print(f"{'phase':>8} {'ms/MP':>6} {'over (full)':>12} {'over (dyn)':>11} {'scale':>6} {'changes':>8}")
+    for name, ms_per_megapixel in PHASES:
+        changes = controller.changes
+        full = np.array([frame_ms(1.0, ms_per_megapixel, rng) for _ in range(FRAMES_PER_PHASE)])
+        dynamic, scales = [], []
+        for _ in range(FRAMES_PER_PHASE):
+            scales.append(controller.scale)
+            dynamic.append(frame_ms(controller.scale, ms_per_megapixel, rng))
+            controller.update(dynamic[-1])
+
+        over_full = np.mean(full > args.budget) * 100.0
+        over_dynamic = np.mean(np.array(dynamic) > args.budget) * 100.0
+        print(f"{name:>8} {ms_per_megapixel:>6.1f} {over_full:>11.1f}% {over_dynamic:>10.1f}% "
+              f"{np.mean(scales):>6.2f} {controller.changes - changes:>8}")
+
+
+if __name__ == "__main__":
+    main()
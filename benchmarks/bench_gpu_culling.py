@@ -0,0 +1,130 @@
+"""CPU encode time of the GPU-driven path against CPU culling, per entity count.
+
+With --verify it instead renders one frame with the GPU-driven path, reads the
+visible rows back and fails (exit code 1) unless they, and the CPU culling
+(`cull_spheres`), match the frustum computed from the camera parameters (fov,
+aspect, clip distances) without any matrix. Spheres within a rounding error
+of a frustum plane may go either way.
+
+Run from the repository root:
+    python -m benchmarks.bench_gpu_culling
+    python -m benchmarks.bench_gpu_culling --verify --software
+"""
+import sys
+import time
+import argparse
+import statistics
+import math
+import numpy as np
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.culling import extract_frustum_planes, cull_spheres
+from graphics.mesh import Mesh, create_cube_mesh, create_sphere_data
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+ENTITY_COUNTS = (1_000, 10_000, 100_000)
+FRAMES = 20
+
+# Distance to a frustum plane below which spheres may go either way:
+TOLERANCE = 1e-2
+
+
+def create_scene(ctx: GraphicsContext, entity_count: int) -> tuple[Renderer, Scene]:
+    renderer = Renderer(ctx)
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 0), aspect=ctx.aspect_ratio)
+    camera.clip_far = 200.0
+    camera.update()
+    scene = Scene(camera, spatial_index=False)
+
+    # Two meshes (two indirect draws), scattered all around the camera:
+    cube = create_cube_mesh(ctx.device, arena=renderer.arena)
+    sphere = Mesh(ctx.device, *create_sphere_data(8), arena=renderer.arena)
+    rng = np.random.default_rng(7)
+    positions = rng.uniform(-150.0, 150.0, (entity_count, 3))
+    for i, position in enumerate(positions.tolist()):
+        scene.add(Entity(renderer, cube if i % 2 else sphere, position=glm.vec3(*position)))
+
+    return renderer, scene
+
+
+def plane_distances(camera: Camera, centers: np.ndarray) -> np.ndarray:
+    """Signed distances (inside positive) of the centers to the six frustum planes,
+    from the camera parameters. The camera sits at the origin looking down -z."""
+    x, y, depth = centers[:, 0], centers[:, 1], -centers[:, 2]
+    tan_y = math.tan(math.radians(camera.fovy) / 2.0)
+    tan_x = tan_y * camera.aspect
+    scale_x, scale_y = 1.0 / math.hypot(1.0, tan_x), 1.0 / math.hypot(1.0, tan_y)
+    return np.column_stack([
+        (tan_x * depth + x) * scale_x,  # Left
+        (tan_x * depth - x) * scale_x,  # Right
+        (tan_y * depth + y) * scale_y,  # Bottom
+        (tan_y * depth - y) * scale_y,  # Top
+        depth - camera.clip_near,  # Near
+        camera.clip_far - depth,  # Far
+    ])
+
+
+def verify(ctx: GraphicsContext, entity_count: int) -> bool:
+    renderer, scene = create_scene(ctx, entity_count)
+    renderer.gpu_driven = True
+    renderer.render(scene)
+    gpu = renderer.gpu_culler.read_visible()
+
+    transforms = renderer.transforms
+    camera = scene.camera
+    rows = scene.rows
+    centers, radii = transforms.world_centers[rows], transforms.world_radii[rows]
+    planes = extract_frustum_planes(camera.get_view_matrix(), camera.get_projection_matrix())
+    cpu = rows[cull_spheres(planes, centers, radii)]
+
+    # The known answer, rows touching a plane may go either way:
+    margins = plane_distances(camera, centers.astype(np.float64)) + radii[:, None]
+    expected = rows[np.all(margins >= 0.0, axis=1)]
+    ambiguous = rows[np.any(np.abs(margins) < TOLERANCE, axis=1)]
+
+    gpu_errors = len(np.setdiff1d(np.setxor1d(gpu, expected), ambiguous))
+    cpu_errors = len(np.setdiff1d(np.setxor1d(cpu, expected), ambiguous))
+    duplicates = len(gpu) - len(np.unique(gpu))
+
+    print(f"{entity_count} entities: {len(expected)} visible, {len(gpu)} on the GPU, {len(cpu)} on the CPU, "
+          f"{len(ambiguous)} on a plane, {gpu_errors} GPU errors, {cpu_errors} CPU errors, {duplicates} duplicates")
+    return gpu_errors == 0 and cpu_errors == 0 and duplicates == 0
+
+
+def bench(ctx: GraphicsContext, entity_count: int, gpu_driven: bool) -> float:
+    renderer, scene = create_scene(ctx, entity_count)
+    renderer.gpu_driven = gpu_driven
+
+    timings = []
+    for _ in range(FRAMES):
+        start = time.perf_counter()
+        command_buffer = renderer.encode_frame(scene)
+        timings.append(time.perf_counter() - start)
+        renderer.submit(command_buffer)
+    return statistics.median(timings) * 1000.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, action="append", help="entity count (repeatable)")
+    parser.add_argument("--verify", action="store_true", help="compare the GPU culling with the CPU reference")
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(640, 480), force_fallback_adapter=args.software)
+    entity_counts = args.entities or ENTITY_COUNTS
+    if args.verify:
+        return 0 if all([verify(ctx, entity_count) for entity_count in entity_counts]) else 1
+
+    for entity_count in entity_counts:
+        cpu = bench(ctx, entity_count, gpu_driven=False)
+        gpu = bench(ctx, entity_count, gpu_driven=True)
+        print(f"{entity_count:>7} entities: {cpu:8.2f} ms encode (CPU culling) {gpu:8.2f} ms encode (GPU-driven)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""World matrix propagation of wide and deep hierarchies.
+
+Builds transform stores of 100k rows with different shapes and reports the
+time of a full update, of moving 1% of the rows (and with them their
+subtrees) and of moving one root. Reparenting is timed including the
+set_parent calls and the next update: one row (its subtree moves between the
+levels), 1% of the rows one at a time (subtrees move until that costs as much
+as a rebuild) and 1% batched through set_parents (one rebuild). Runs without
+a GPU.
+
+Run from the repository root:
+    python -m benchmarks.bench_hierarchy
+    python -m benchmarks.bench_hierarchy --nodes 1000000
+"""
+import time
+import argparse
+import numpy as np
+from scene.transform import TransformStore
+
+NODE_COUNT = 100_000
+REPEATS = 5
+
+
+def wide(count: int) -> np.ndarray:
+    """One root per 1000 rows, everything else directly below it."""
+    rows = np.arange(count)
+    return np.where(rows % 1000 == 0, -1, rows // 1000 * 1000)
+
+
+def deep(count: int) -> np.ndarray:
+    """Chains of 1000 rows."""
+    rows = np.arange(count)
+    return np.where(rows % 1000 == 0, -1, rows - 1)
+
+
+def tree(count: int) -> np.ndarray:
+    """One complete 4-ary tree."""
+    return (np.arange(count) - 1) // 4
+
+
+def flat(count: int) -> np.ndarray:
+    """No links at all, for comparison."""
+    return np.full(count, -1)
+
+
+SHAPES = {"flat": flat, "wide": wide, "deep": deep, "tree": tree}
+
+
+def create_store(parents: np.ndarray, rng: np.random.Generator) -> TransformStore:
+    count = len(parents)
+    store = TransformStore(capacity=count)
+    for _ in range(count):
+        store.allocate()
+    store.positions[:count] = rng.uniform(-1.0, 1.0, (count, 3))
+    store.rotations[:count] = rng.uniform(0.0, 360.0, (count, 3))
+    for row, parent in enumerate(parents.tolist()):
+        if parent >= 0:
+            store.set_parent(row, parent)
+    return store
+
+
+def best_of(prepare, function) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        prepare()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=NODE_COUNT)
+    args = parser.parse_args()
+    rng = np.random.default_rng(1234)
+    count = args.nodes
+
+    header = ("shape", "levels", "full", "1% moved", "root moved", "reparent", "1% single", "1% batched")
+    print(" ".join(f"{name:>10}" for name in header) + "   [ms]")
+
+    for name, shape in SHAPES.items():
+        parents = shape(count)
+        store = create_store(parents, rng)
+
+        def mark(rows) -> None:
+            store.dirty[rows] = True
+
+        full = best_of(lambda: mark(np.arange(count)), store.update_matrices)
+        levels = max(len(store.hierarchy._level_rows), 1)
+        moved = best_of(lambda: mark(rng.choice(count, count // 100, replace=False)), store.update_matrices)
+        root = best_of(lambda: mark([0]), store.update_matrices)
+
+        # Move non-root rows below another row with a smaller index (no cycles):
+        def reparent(rows: int) -> None:
+            for row in rng.choice(np.arange(1, count), rows, replace=False).tolist():
+                store.set_parent(row, int(rng.integers(0, row)))
+            store.update_matrices()
+
+        def reparent_batched() -> None:
+            rows = rng.choice(np.arange(1, count), count // 100, replace=False)
+            store.hierarchy.set_parents(rows, rng.integers(0, rows), store.count)
+            store.dirty[rows] = True
+            store.update_matrices()
+
+        def settle() -> None:
+            # Levels current (and the budget for moves renewed) before every run:
+            mark([0])
+            store.update_matrices()
+
+        reparented = best_of(settle, lambda: reparent(1))
+        single = best_of(settle, lambda: reparent(count // 100))
+        batched = best_of(settle, reparent_batched)
+
+        timings = (full, moved, root, reparented, single, batched)
+        print(f"{name:>10} {levels:>10} " + " ".join(f"{t * 1000:>10.2f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Throughput of the OBJ and glTF (.glb) importers on generated meshes.
+
+Writes a height field grid with (size - 1)^2 * 2 triangles in both formats
+into a temporary directory and reports MB/s and triangles/s. Runs without a GPU.
+
+Run from the repository root:
+    python -m benchmarks.bench_importers
+    python -m benchmarks.bench_importers --size 2048 --processes 8
+"""
+import json
+import time
+import struct
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+from graphics import importers
+from graphics.importers import load_obj, load_glb
+
+SIZES = (256, 1024)
+
+
+def create_grid(size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions, normals and triangle indices of a size x size height field."""
+    x, z = np.meshgrid(np.linspace(-1.0, 1.0, size, dtype=np.float32),
+                       np.linspace(-1.0, 1.0, size, dtype=np.float32))
+    y = 0.1 * np.sin(x * 8.0) * np.cos(z * 8.0)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+
+    normals = np.stack([-np.gradient(y, axis=1), np.full_like(y, 2.0 / size), -np.gradient(y, axis=0)], axis=-1)
+    normals = (normals / np.linalg.norm(normals, axis=-1, keepdims=True)).reshape(-1, 3)
+
+    a = (np.arange(size - 1)[:, None] * size + np.arange(size - 1)).ravel()
+    b, c, d = a + size, a + size + 1, a + 1
+    indices = np.stack([a, b, c, c, d, a], axis=-1).reshape(-1, 3)
+    return positions, normals.astype(np.float32), indices
+
+
+def write_obj(path: Path, positions: np.ndarray, normals: np.ndarray, indices: np.ndarray) -> None:
+    with open(path, "w") as file:
+        file.write("# generated by bench_importers\n")
+        np.savetxt(file, positions, fmt="v %.6f %.6f %.6f")
+        np.savetxt(file, normals, fmt="vn %.6f %.6f %.6f")
+        corners = np.repeat(indices + 1, 2, axis=1)  # Same index for the position and the normal
+        np.savetxt(file, corners, fmt="f %d//%d %d//%d %d//%d")
+
+
+def write_glb(path: Path, positions: np.ndarray, normals: np.ndarray, indices: np.ndarray) -> None:
+    # One interleaved vertex buffer view (position + normal) and one index buffer view:
+    vertices = np.concatenate([positions, normals], axis=1).astype(np.float32)
+    indices = indices.astype(np.uint32).ravel()
+    binary = vertices.tobytes() + indices.tobytes()
+
+    gltf = {
+        "asset": {"version": "2.0"},
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": vertices.nbytes, "byteStride": 24},
+            {"buffer": 0, "byteOffset": vertices.nbytes, "byteLength": indices.nbytes},
+        ],
+        "accessors": [
+            {"bufferView": 0, "byteOffset": 0, "componentType": 5126, "count": len(vertices), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 0, "byteOffset": 12, "componentType": 5126, "count": len(vertices), "type": "VEC3"},
+            {"bufferView": 1, "componentType": 5125, "count": len(indices), "type": "SCALAR"},
+        ],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2}]}],
+    }
+
+    json_chunk = json.dumps(gltf).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + 8 + len(binary)
+
+    with open(path, "wb") as file:
+        file.write(struct.pack("<4sII", importers.GLB_MAGIC, 2, length))
+        file.write(struct.pack("<II", len(json_chunk), importers.GLB_JSON_CHUNK) + json_chunk)
+        file.write(struct.pack("<II", len(binary), importers.GLB_BIN_CHUNK) + binary)
+
+
+def bench(name: str, path: Path, load) -> None:
+    start = time.perf_counter()
+    data = load(path)
+    elapsed = time.perf_counter() - start
+
+    megabytes = path.stat().st_size / 1e6
+    triangles = data.index_count // 3
+    print(f"{name:>16}: {megabytes:8.1f} MB {triangles:>10} triangles {elapsed * 1000:8.1f} ms "
+          f"{megabytes / elapsed:8.1f} MB/s {triangles / elapsed / 1e6:6.2f} M triangles/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, action="append", help="grid size (repeatable)")
+    parser.add_argument("--processes", type=int, default=None, help="OBJ parser processes (default: one per core)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.size or SIZES:
+            obj_path, glb_path = Path(directory) / f"grid_{size}.obj", Path(directory) / f"grid_{size}.glb"
+            write_obj(obj_path, *create_grid(size))
+            write_glb(glb_path, *create_grid(size))
+
+            print(f"grid {size}x{size}:")
+            bench("obj (1 process)", obj_path, lambda path: load_obj(path, processes=1))
+            # Force the process pool, even below PARALLEL_BYTES:
+            importers.PARALLEL_BYTES, parallel_bytes = 0, importers.PARALLEL_BYTES
+            bench("obj (pool)", obj_path, lambda path: load_obj(path, processes=args.processes))
+            importers.PARALLEL_BYTES = parallel_bytes
+            bench("glb", glb_path, load_glb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare per-entity vs. instanced encoding time.
+
+Run from the repository root:
+    python -m benchmarks.bench_instancing
+"""
+import time
+import statistics
+import wgpu
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import create_cube_mesh
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+ENTITY_COUNTS = (1_000, 10_000, 100_000)
+FRAMES = 10
+
+
+def create_scene(renderer: Renderer, ctx: GraphicsContext, count: int) -> Scene:
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 5), aspect=ctx.aspect_ratio)
+    scene = Scene(camera)
+
+    # A handful of meshes, shared by all entities:
+    meshes = [create_cube_mesh(ctx.device) for _ in range(4)]
+    for i in range(count):
+        position = glm.vec3(i % 100, (i // 100) % 100, -(i // 10_000))
+        scene.add(Entity(renderer, meshes[i % len(meshes)], position=position))
+
+    return scene
+
+
+def time_encoding(renderer: Renderer, scene: Scene, target: wgpu.GPUTexture) -> float:
+    timings = []
+    for _ in range(FRAMES):
+        command_encoder = renderer.ctx.device.create_command_encoder()
+        render_pass = command_encoder.begin_render_pass(
+            color_attachments=[
+                wgpu.RenderPassColorAttachment(
+                    view=target.create_view(),
+                    load_op=wgpu.LoadOp.clear,
+                    store_op=wgpu.StoreOp.store,
+                )
+            ],
+            depth_stencil_attachment=wgpu.RenderPassDepthStencilAttachment(
+                view=renderer.depth_view,
+                depth_clear_value=1.0,
+                depth_load_op=wgpu.LoadOp.clear,
+                depth_store_op=wgpu.StoreOp.store,
+            ),
+        )
+
+        start = time.perf_counter()
+        renderer.encode(render_pass, scene)
+        timings.append(time.perf_counter() - start)
+
+        render_pass.end()
+        renderer.ctx.device.queue.submit([command_encoder.finish()])
+
+    return statistics.median(timings)
+
+
+def main():
+    ctx = GraphicsContext(None, size=(640, 480))
+    renderer = Renderer(ctx)
+
+    target = ctx.device.create_texture(
+        size=(640, 480, 1),
+        usage=wgpu.TextureUsage.RENDER_ATTACHMENT,
+        format=ctx.render_format,
+    )
+    renderer._update_depth_buffer(640, 480)
+
+    print(f"{'entities':>10} {'per-entity [ms]':>16} {'instanced [ms]':>16} {'speedup':>8}")
+    for count in ENTITY_COUNTS:
+        scene = create_scene(renderer, ctx, count)
+
+        renderer.instanced = False
+        per_entity = time_encoding(renderer, scene, target)
+
+        renderer.instanced = True
+        instanced = time_encoding(renderer, scene, target)
+
+        print(f"{count:>10} {per_entity * 1000:>16.2f} {instanced * 1000:>16.2f} {per_entity / instanced:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
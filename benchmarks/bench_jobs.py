@@ -0,0 +1,63 @@
+"""Entity update throughput of the job system at 1/2/4/8 threads.
+
+Runs Entity.update (Python game logic) and the transform update of many
+entities for a number of ticks, no GPU needed. Only the free-threaded build
+scales the Python part, with the GIL only the numpy part can overlap.
+
+Run from the repository root:
+    python -m benchmarks.bench_jobs
+"""
+import time
+from types import SimpleNamespace
+import numpy as np
+from pyglm import glm
+from core.jobs import JobSystem, free_threaded
+from scene.entity import Entity
+from scene.transform import TransformStore
+
+ENTITY_COUNT = 50_000
+TICKS = 20
+THREADS = (1, 2, 4, 8)
+
+
+class Spinner(Entity):
+    def update(self, dt: float):
+        rotation = self.rotation
+        rotation.y = (rotation.y + 90.0 * dt) % 360.0
+        self.rotation = rotation
+
+
+def bench(threads: int) -> float:
+    # The calling thread helps executing jobs, so it counts as one of the threads:
+    jobs = JobSystem(workers=threads - 1)
+    renderer = SimpleNamespace(transforms=TransformStore(jobs=jobs))
+    mesh = SimpleNamespace(bounding_center=np.zeros(3, dtype=np.float32), bounding_radius=1.0)
+    entities = [Spinner(renderer, mesh, position=glm.vec3(i % 100, i // 100, 0)) for i in range(ENTITY_COUNT)]
+    renderer.transforms.update_matrices()
+
+    def update_range(start: int, end: int) -> None:
+        for entity in entities[start:end]:
+            entity.update(1 / 60)
+
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        renderer.transforms.begin_tick()
+        jobs.parallel_for(len(entities), update_range)
+        renderer.transforms.update_matrices()
+    elapsed = time.perf_counter() - start
+
+    jobs.shutdown()
+    return ENTITY_COUNT * TICKS / elapsed
+
+
+def main() -> None:
+    print(f"{ENTITY_COUNT} entities, {TICKS} ticks, free-threaded: {free_threaded()}")
+    baseline = None
+    for threads in THREADS:
+        throughput = bench(threads)
+        baseline = baseline or throughput
+        print(f"{threads} threads: {throughput / 1e6:6.3f} M entity updates/s ({throughput / baseline:4.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Triangles submitted and encode time with and without LOD selection.
+
+Simplifies a dense sphere into its LOD chain (reporting the triangle counts and
+the time it took), then renders a field of spheres stretching away from the
+camera with `Renderer.lods` off and on.
+
+Run from the repository root:
+    python -m benchmarks.bench_lod
+    python -m benchmarks.bench_lod --segments 96 --entities 5000
+"""
+import sys
+import time
+import argparse
+import statistics
+import wgpu
+import numpy as np
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import Mesh, create_sphere_data
+from graphics.lod import create_lod_meshes
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+ENTITY_COUNT = 2_000
+SEGMENTS = 64
+FRAMES = 20
+
+
+def create_scene(ctx: GraphicsContext, segments: int, entity_count: int) -> tuple[Renderer, Scene]:
+    renderer = Renderer(ctx)
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 2, 0), aspect=ctx.aspect_ratio)
+    camera.clip_far = 1000.0
+    camera.update()
+    scene = Scene(camera)
+
+    vertices, indices = create_sphere_data(segments)
+    mesh = Mesh(ctx.device, vertices, indices, arena=renderer.arena)
+    start = time.perf_counter()
+    lods = create_lod_meshes(ctx.device, mesh, vertices, indices, arena=renderer.arena)
+    elapsed = time.perf_counter() - start
+    chain = " -> ".join(str(level.triangle_count) for level in [mesh, *lods])
+    print(f"LOD chain: {chain} triangles, simplified in {elapsed * 1000:.1f} ms")
+
+    # Rows of spheres from right in front of the camera up to the far plane:
+    side = int(np.ceil(np.sqrt(entity_count)))
+    for i in range(entity_count):
+        position = glm.vec3((i % side - side / 2) * 3.0, 0, -3.0 - (i // side) * 3.0 * 200.0 / side)
+        scene.add(Entity(renderer, mesh, position=position))
+
+    return renderer, scene
+
+
+def bench(ctx: GraphicsContext, renderer: Renderer, scene: Scene) -> float:
+    width, height = ctx.size
+    renderer._update_depth_buffer(width, height)
+
+    timings = []
+    for _ in range(FRAMES):
+        command_encoder = ctx.device.create_command_encoder()
+        render_pass = command_encoder.begin_render_pass(
+            color_attachments=[
+                wgpu.RenderPassColorAttachment(
+                    view=ctx.get_current_texture().create_view(),
+                    load_op=wgpu.LoadOp.clear,
+                    store_op=wgpu.StoreOp.store,
+                )
+            ],
+            depth_stencil_attachment=wgpu.RenderPassDepthStencilAttachment(
+                view=renderer.depth_view,
+                depth_clear_value=1.0,
+                depth_load_op=wgpu.LoadOp.clear,
+                depth_store_op=wgpu.StoreOp.store,
+            ),
+        )
+        start = time.perf_counter()
+        renderer.encode(render_pass, scene)
+        timings.append(time.perf_counter() - start)
+        render_pass.end()
+        renderer.submit(command_encoder.finish())
+
+    return statistics.median(timings) * 1000.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=ENTITY_COUNT)
+    parser.add_argument("--segments", type=int, default=SEGMENTS, help="sphere resolution")
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(640, 480), force_fallback_adapter=args.software)
+    renderer, scene = create_scene(ctx, args.segments, args.entities)
+
+    for lods in (False, True):
+        renderer.lods = lods
+        milliseconds = bench(ctx, renderer, scene)
+        stats = renderer.cull_stats
+        print(f"lods {'on ' if lods else 'off'}: {stats.drawn:>6} drawn {stats.triangles:>10} triangles "
+              f"{milliseconds:8.2f} ms encode")
+    if renderer.lods:
+        levels = renderer.lod_selector.levels[scene.rows]
+        print("entities per level:", np.bincount(levels, minlength=4).tolist())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
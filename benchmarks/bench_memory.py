@@ -0,0 +1,117 @@
+"""GPU memory of a session that keeps loading and unloading content.
+
+Every cycle loads a working set of meshes (sliding over a larger catalog, so
+consecutive cycles share most of it) through the MeshCache, adds an entity per
+mesh, renders a few frames and then removes the entities and releases the
+meshes again. Reports per mesh cache budget the peak and final mesh memory
+(from the resource registry), how many meshes were uploaded and evicted, and
+the memory report of the last mode.
+
+With --verify it fails (exit code 1) unless all mesh memory is freed once the
+cache is trimmed and the frames in flight retired.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --verify --software
+"""
+import sys
+import argparse
+import numpy as np
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import create_sphere_data
+from graphics.mesh_cache import MeshCache
+from graphics.resources import CATEGORY_MESHES
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+CATALOG = 96  # Distinct meshes
+WORKING_SET = 24
+CYCLES = 40
+FRAMES = 3
+
+# name: mesh cache budget in bytes
+BUDGETS = {
+    "no cache": 0,
+    "16 MB": 16 * 2**20,
+    "unlimited": 2**62,
+}
+
+
+def mesh_memory(ctx: GraphicsContext) -> int:
+    return ctx.resources.usage().get(CATEGORY_MESHES, (0, 0))[1]
+
+
+def run_cycles(ctx: GraphicsContext, renderer: Renderer, scene: Scene, cache: MeshCache,
+               catalog: list, cycles: int) -> int:
+    """Returns the peak mesh memory."""
+    rng = np.random.default_rng(7)
+    peak = 0
+    for cycle in range(cycles):
+        ids = (cycle * 4 + rng.choice(WORKING_SET * 2, WORKING_SET, replace=False)) % len(catalog)
+        meshes = [cache.get_or_create(*catalog[i]) for i in ids.tolist()]
+        entities = [Entity(renderer, mesh, position=glm.vec3(i % 8 - 4, i // 8 - 2, -10))
+                    for i, mesh in enumerate(meshes)]
+        scene.add_many(entities)
+
+        for _ in range(FRAMES):
+            renderer.render(scene)
+        peak = max(peak, mesh_memory(ctx))
+
+        scene.remove_many(entities)
+        for mesh in meshes:
+            cache.release(mesh)
+    return peak
+
+
+def settle(ctx: GraphicsContext, renderer: Renderer, scene: Scene) -> None:
+    """Renders until the deferred releases ran."""
+    for _ in range(renderer.resources.frames_in_flight):
+        renderer.render(scene)
+    ctx.device.queue.on_submitted_work_done_sync()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=CYCLES)
+    parser.add_argument("--verify", action="store_true", help="fail unless all mesh memory is freed")
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(640, 480), force_fallback_adapter=args.software)
+    renderer = Renderer(ctx)
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 5), aspect=ctx.aspect_ratio)
+    scene = Scene(camera)
+    catalog = [create_sphere_data(8 + i) for i in range(CATALOG)]
+
+    # Meshes get buffers of their own (no arena), so freed meshes shrink the memory:
+    baseline = mesh_memory(ctx)
+    failed = False
+    print(f"{'budget':<12}{'peak MB':>10}{'final MB':>10}{'uploads':>10}{'evictions':>10}")
+    for name, budget in BUDGETS.items():
+        cache = MeshCache(ctx.device, budget=budget)
+        peak = run_cycles(ctx, renderer, scene, cache, catalog, args.cycles)
+        settle(ctx, renderer, scene)
+        final = mesh_memory(ctx)
+        print(f"{name:<12}{(peak - baseline) / 2**20:>10.2f}{(final - baseline) / 2**20:>10.2f}"
+              f"{cache.misses:>10}{cache.evictions:>10}")
+
+        cache.trim(0)
+        settle(ctx, renderer, scene)
+        leaked = mesh_memory(ctx) - baseline
+        if args.verify and (leaked or scene.entities or renderer.resources.pending):
+            print(f"{name}: {leaked} bytes of mesh memory leaked, {len(scene.entities)} entities left, "
+                  f"{renderer.resources.pending} releases pending")
+            failed = True
+
+    print()
+    print(ctx.resources.report())
+    if args.verify:
+        print("FAILED" if failed else "OK")
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Before/after stats of the mesh optimization pipeline.
+
+Runs without a GPU. From the repository root:
+    python -m benchmarks.bench_mesh_processing
+"""
+import time
+import numpy as np
+from graphics.mesh import create_cube_data
+from graphics.mesh_processing import process_mesh
+
+
+def create_grid_soup(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Unindexed (triangle soup) height field, every corner is duplicated."""
+    x, z = np.meshgrid(np.arange(size + 1, dtype=np.float32), np.arange(size + 1, dtype=np.float32))
+    y = np.sin(x * 0.3) * np.cos(z * 0.3)
+    grid = np.stack([x, y, z, x / size, y * 0.5 + 0.5, z / size], axis=-1)
+
+    quads = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=2).reshape(-1, 4, 6)
+    vertices = quads[:, [0, 1, 2, 2, 3, 0]].reshape(-1, 6).astype(np.float32)
+
+    # Shuffle the triangles, meshes coming out of tools are rarely in a cache friendly order:
+    triangles = np.random.default_rng(7).permutation(len(vertices) // 3)
+    indices = (triangles[:, None] * 3 + np.arange(3)).ravel().astype(np.uint32)
+    return vertices, indices
+
+
+def main():
+    meshes = {"cube": create_cube_data()}
+    for size in (16, 64, 128):
+        meshes[f"grid_{size}"] = create_grid_soup(size)
+
+    for name, (vertices, indices) in meshes.items():
+        for compact in (False, True):
+            start = time.perf_counter()
+            _, _, layout, stats = process_mesh(vertices, indices, compact=compact)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>10} [{layout.name:>8}] {stats.report()} ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
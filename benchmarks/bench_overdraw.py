@@ -0,0 +1,104 @@
+"""Overdraw and frame time of a dense scene with the overdraw reduction options.
+
+Renders a deep field of overlapping cubes and spheres with back-face culling
+off and on, sorted by state or front-to-back, and with the depth pre-pass.
+Reports the shaded fragments per covered pixel (debug_overdraw, read back from
+the headless target) and the median GPU time of the passes (CPU submit to
+completion without timestamp queries).
+
+Run from the repository root:
+    python -m benchmarks.bench_overdraw
+    python -m benchmarks.bench_overdraw --software --entities 2000
+"""
+import time
+import argparse
+import statistics
+import numpy as np
+import wgpu
+from pyglm import glm
+from core.profiler import Profiler
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import Mesh, create_cube_mesh, create_sphere_data
+from graphics.overdraw import overdraw_summary
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+ENTITY_COUNT = 5_000
+FRAMES = 20
+
+# name: (cull mode, front_to_back, depth_prepass)
+MODES = {
+    "baseline": (wgpu.CullMode.none, False, False),
+    "back-face culling": (wgpu.CullMode.back, False, False),
+    "front-to-back": (wgpu.CullMode.back, True, False),
+    "depth pre-pass": (wgpu.CullMode.back, False, True),
+}
+
+
+def create_scene(ctx: GraphicsContext, entity_count: int) -> tuple[Renderer, Scene]:
+    renderer = Renderer(ctx)
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 0), aspect=ctx.aspect_ratio)
+    camera.clip_far = 200.0
+    camera.update()
+    scene = Scene(camera)
+
+    # Everything inside the view frustum, in random order, so most of it is hidden:
+    cube = create_cube_mesh(ctx.device, arena=renderer.arena)
+    sphere = Mesh(ctx.device, *create_sphere_data(16), arena=renderer.arena)
+    rng = np.random.default_rng(11)
+    depths = rng.uniform(5.0, 150.0, entity_count)
+    spread = rng.uniform(-0.4, 0.4, (entity_count, 2)) * depths[:, None]
+    positions = np.column_stack([spread, -depths])
+    for i, position in enumerate(positions.tolist()):
+        scene.add(Entity(renderer, cube if i % 2 else sphere, position=glm.vec3(*position),
+                         scale=glm.vec3(2.0 + i % 3)))
+    renderer.transforms.update_matrices()
+    return renderer, scene
+
+
+def measure(ctx: GraphicsContext, renderer: Renderer, scene: Scene) -> tuple[dict, float]:
+    renderer.debug_overdraw = True
+    renderer.render(scene)
+    summary = overdraw_summary(ctx.read_pixels())
+    renderer.debug_overdraw = False
+
+    # A fresh profiler per mode, for the GPU pass timings:
+    renderer.profiler = Profiler(enabled=True)
+    timings = []
+    for _ in range(FRAMES):
+        renderer.profiler.begin_frame()
+        start = time.perf_counter()
+        renderer.render(scene)
+        ctx.device.queue.on_submitted_work_done_sync()
+        timings.append(time.perf_counter() - start)
+        renderer.profiler.end_frame()
+
+    gpu = {name: ring.percentiles((50,))["p50"] for name, ring in renderer.profiler.stats.items()
+           if name.startswith("gpu:")}
+    return summary, sum(gpu.values()) if gpu else statistics.median(timings) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=ENTITY_COUNT)
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(1280, 720), force_fallback_adapter=args.software)
+    renderer, scene = create_scene(ctx, args.entities)
+    renderer.static_bundles = False
+
+    print(f"{'mode':<20}{'coverage':>10}{'overdraw':>10}{'max':>6}{'time':>10}  (fragments per covered pixel, ms)")
+    for name, (cull_mode, front_to_back, depth_prepass) in MODES.items():
+        renderer.cull_mode = cull_mode
+        renderer.front_to_back = front_to_back
+        renderer.depth_prepass = depth_prepass
+        summary, frame_ms = measure(ctx, renderer, scene)
+        print(f"{name:<20}{summary['coverage']:>10.2f}{summary['average_covered']:>10.2f}"
+              f"{summary['max']:>6}{frame_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Encode time of parallel bundle recording against the number of threads.
+
+That parallel and serial recording render the same pixels is checked by
+tests/test_parallel_recording.py.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel_recording
+    python -m benchmarks.bench_parallel_recording --software
+"""
+import sys
+import time
+import argparse
+import statistics
+import wgpu
+import numpy as np
+from pyglm import glm
+from core.jobs import JobSystem, free_threaded
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import create_cube_mesh
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+ENTITY_COUNT = 20_000
+THREADS = (1, 2, 4, 8)
+FRAMES = 20
+
+
+def create_scene(ctx: GraphicsContext, threads: int, entity_count: int) -> tuple[Renderer, Scene]:
+    # The calling thread helps executing jobs, so it counts as one of the threads:
+    renderer = Renderer(ctx, jobs=JobSystem(workers=threads - 1))
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 60), aspect=ctx.aspect_ratio)
+    camera.clip_far = 1000.0
+    camera.update()
+    scene = Scene(camera)
+
+    mesh = create_cube_mesh(ctx.device, arena=renderer.arena)
+    side = int(np.ceil(np.sqrt(entity_count)))
+    for i in range(entity_count):
+        position = glm.vec3(i % side - side / 2, i // side - side / 2, -(i % 7))
+        scene.add(Entity(renderer, mesh, position=position, rotation=glm.vec3(i % 90, i % 45, 0)))
+
+    return renderer, scene
+
+
+def render(ctx: GraphicsContext, renderer: Renderer, scene: Scene) -> np.ndarray:
+    renderer.render(scene)
+    return ctx.read_pixels().copy()
+
+
+def bench(ctx: GraphicsContext, threads: int, entity_count: int) -> float:
+    renderer, scene = create_scene(ctx, threads, entity_count)
+    renderer.culling = False
+    width, height = ctx.size
+    renderer._update_depth_buffer(width, height)
+
+    timings = []
+    for _ in range(FRAMES):
+        command_encoder = ctx.device.create_command_encoder()
+        render_pass = command_encoder.begin_render_pass(
+            color_attachments=[
+                wgpu.RenderPassColorAttachment(
+                    view=ctx.get_current_texture().create_view(),
+                    load_op=wgpu.LoadOp.clear,
+                    store_op=wgpu.StoreOp.store,
+                )
+            ],
+            depth_stencil_attachment=wgpu.RenderPassDepthStencilAttachment(
+                view=renderer.depth_view,
+                depth_clear_value=1.0,
+                depth_load_op=wgpu.LoadOp.clear,
+                depth_store_op=wgpu.StoreOp.store,
+            ),
+        )
+        start = time.perf_counter()
+        renderer.encode(render_pass, scene)
+        timings.append(time.perf_counter() - start)
+        render_pass.end()
+        renderer.submit(command_encoder.finish())
+
+    renderer.jobs.shutdown()
+    return statistics.median(timings) * 1000.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=ENTITY_COUNT)
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(640, 480), force_fallback_adapter=args.software)
+    print(f"{args.entities} entities, free-threaded: {free_threaded()}")
+    for threads in THREADS:
+        print(f"{threads} threads: {bench(ctx, threads, args.entities):8.2f} ms encode")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Scene creation from code against saving and loading a scene snapshot.
+
+Builds scenes of two meshes and 1k-100k entities (every fourth one a child of
+the entity before it, every other one static) and reports the time to create
+them entity by entity, to save them and to load them again.
+
+With --verify it instead saves and loads every scene and fails (exit code 1)
+unless transforms, meshes, flags, parent links and world matrices survived
+the round trip.
+
+Run from the repository root:
+    python -m benchmarks.bench_scene_snapshot
+    python -m benchmarks.bench_scene_snapshot --verify --software
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import create_cube_data, create_sphere_data
+from graphics.mesh_cache import MeshCache
+from graphics.mesh_format import write_mesh
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+from scene.snapshot import save_scene, load_scene
+
+ENTITY_COUNTS = (1_000, 10_000, 100_000)
+
+
+def create_camera(ctx: GraphicsContext, renderer: Renderer) -> Camera:
+    return Camera(renderer=renderer, position=glm.vec3(0, 0, 5), aspect=ctx.aspect_ratio)
+
+
+def create_scene(ctx: GraphicsContext, mesh_paths: list[Path], entity_count: int) -> Scene:
+    renderer = Renderer(ctx)
+    scene = Scene(create_camera(ctx, renderer))
+    meshes = MeshCache(ctx.device, arena=renderer.arena).load_many(mesh_paths)
+
+    rng = np.random.default_rng(3)
+    positions = rng.uniform(-100.0, 100.0, (entity_count, 3)).tolist()
+    rotations = rng.uniform(0.0, 360.0, (entity_count, 3)).tolist()
+    previous = None
+    for i in range(entity_count):
+        entity = Entity(renderer, meshes[i % len(meshes)],
+                        position=glm.vec3(*positions[i]),
+                        rotation=glm.vec3(*rotations[i]),
+                        scale=glm.vec3(1.0 + i % 3),
+                        static=i % 2 == 0,
+                        parent=previous if i % 4 == 3 else None)
+        scene.add(entity)
+        previous = entity
+    return scene
+
+
+def load(ctx: GraphicsContext, path: Path) -> Scene:
+    renderer = Renderer(ctx)
+    return load_scene(path, create_camera(ctx, renderer), MeshCache(ctx.device, arena=renderer.arena))
+
+
+def verify(ctx: GraphicsContext, mesh_paths: list[Path], directory: Path, entity_count: int) -> bool:
+    original = create_scene(ctx, mesh_paths, entity_count)
+    path = directory / "scene.sss"
+    save_scene(path, original)
+    loaded = load(ctx, path)
+
+    errors = []
+    a, b = original.transforms, loaded.transforms
+    a.update_matrices()
+    b.update_matrices()
+    rows_a, rows_b = original.rows, loaded.rows
+    for name in ("positions", "rotations", "scales", "static", "drawable", "bounds_radii", "matrices"):
+        if not np.array_equal(getattr(a, name)[rows_a], getattr(b, name)[rows_b]):
+            errors.append(name)
+
+    sources = [entity.mesh.source for entity in original.entities]
+    if sources != [entity.mesh.source for entity in loaded.entities]:
+        errors.append("meshes")
+    index_a = {entity: i for i, entity in enumerate(original.entities)}
+    index_b = {entity: i for i, entity in enumerate(loaded.entities)}
+    parents_a = [index_a.get(entity.parent, -1) for entity in original.entities]
+    if parents_a != [index_b.get(entity.parent, -1) for entity in loaded.entities]:
+        errors.append("parents")
+
+    print(f"{entity_count} entities: " + (f"mismatched {', '.join(errors)}" if errors else "ok"))
+    return not errors
+
+
+def bench(ctx: GraphicsContext, mesh_paths: list[Path], directory: Path, entity_count: int) -> None:
+    start = time.perf_counter()
+    scene = create_scene(ctx, mesh_paths, entity_count)
+    scene.transforms.update_matrices()
+    created = time.perf_counter() - start
+
+    path = directory / "scene.sss"
+    start = time.perf_counter()
+    save_scene(path, scene)
+    saved = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = load(ctx, path)
+    loaded.transforms.update_matrices()
+    loaded_time = time.perf_counter() - start
+
+    print(f"{entity_count:>7} entities: {created * 1000:9.1f} ms create {saved * 1000:8.1f} ms save "
+          f"{loaded_time * 1000:8.1f} ms load ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, action="append", help="entity count (repeatable)")
+    parser.add_argument("--verify", action="store_true", help="check that scenes survive a save and load")
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=(640, 480), force_fallback_adapter=args.software)
+    entity_counts = args.entities or ENTITY_COUNTS
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        mesh_paths = [directory / "cube.ssm", directory / "sphere.ssm"]
+        write_mesh(mesh_paths[0], *create_cube_data())
+        write_mesh(mesh_paths[1], *create_sphere_data(16))
+
+        if args.verify:
+            return 0 if all([verify(ctx, mesh_paths, directory, count) for count in entity_counts]) else 1
+        for entity_count in entity_counts:
+            bench(ctx, mesh_paths, directory, entity_count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
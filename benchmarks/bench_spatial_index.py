@@ -0,0 +1,62 @@
+"""Scaling of spatial index queries against a linear scan.
+
+Runs without a GPU. From the repository root:
+    python -m benchmarks.bench_spatial_index
+"""
+import time
+import numpy as np
+from pyglm import glm
+from graphics.culling import extract_frustum_planes, cull_spheres
+from scene.bvh import BVH, frustum_test, sphere_test
+
+SCENE_SIZES = (10_000, 100_000, 500_000, 1_000_000)
+REPEATS = 5
+
+
+def best_of(function) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(1234)
+
+    # Camera at the origin looking down -z, the world is much larger than the frustum:
+    view = glm.lookAt(glm.vec3(0, 0, 0), glm.vec3(0, 0, -1), glm.vec3(0, 1, 0))
+    proj = glm.perspective(glm.radians(60.0), 16 / 9, 0.1, 100.0)
+    planes = extract_frustum_planes(view, proj)
+
+    header = ("entities", "build", "refit", "frustum", "linear", "sphere", "ray")
+    print(" ".join(f"{name:>10}" for name in header) + "   [ms]")
+
+    for count in SCENE_SIZES:
+        extent = 10.0 * count ** (1 / 3)
+        centers = rng.uniform(-extent, extent, (count, 3)).astype(np.float32)
+        radii = rng.uniform(0.5, 2.0, count).astype(np.float32)
+        lo, hi = centers - radii[:, None], centers + radii[:, None]
+
+        bvh = BVH()
+        build = best_of(lambda: bvh.build(lo, hi))
+
+        # Move 1% of the entities a little bit:
+        moved = rng.choice(count, count // 100, replace=False)
+        lo[moved] += 0.5
+        hi[moved] += 0.5
+        refit = best_of(lambda: bvh.refit(lo, hi))
+
+        frustum = best_of(lambda: bvh.query(lambda a, b: frustum_test(planes, a, b), lo, hi))
+        linear = best_of(lambda: cull_spheres(planes, centers, radii))
+        sphere = best_of(lambda: bvh.query(lambda a, b: sphere_test(np.zeros(3, np.float32), 20.0, a, b), lo, hi))
+        ray = best_of(lambda: bvh.query_ray(np.zeros(3, np.float32), np.array([0, 0, -1], np.float32),
+                                            np.inf, lo, hi))
+
+        timings = (build, refit, frustum, linear, sphere, ray)
+        print(f"{count:>10} " + " ".join(f"{t * 1000:>10.2f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Random allocate/free stress test of the GPU arena.
+
+Creates and destroys meshes suballocated from a GpuArena in waves (mostly
+allocating, then mostly freeing), with one frame per step so the deferred frees
+run. Whenever a buffer gets too fragmented the arena is defragmented. Checks
+the allocator invariants regularly and after every defragmentation reads the
+arena buffers back and compares the data of every live mesh with what was
+uploaded. Fails (exit code 1) if anything is off or no defragmentation happened.
+
+Run from the repository root:
+    python -m benchmarks.stress_arena
+    python -m benchmarks.stress_arena --software
+"""
+import sys
+import argparse
+import numpy as np
+from graphics.arena import ArenaBuffer, GpuArena
+from graphics.context import request_device
+from graphics.mesh import Mesh
+from graphics.resources import resources_of
+
+STEPS = 20_000
+WAVE = 1000  # Steps per allocating or freeing wave
+INITIAL_CAPACITY = 1024 * 1024
+
+
+def check(pool: ArenaBuffer) -> None:
+    allocator = pool.allocator
+    ranges = sorted([(block.offset, block.size, "used") for block in pool.blocks] +
+                    [(offset, size, "free") for offset, size in allocator.free_ranges])
+
+    # No overlaps, free ranges are coalesced and everything is accounted for:
+    cursor, previous = 0, None
+    for offset, size, kind in ranges:
+        assert offset >= cursor, f"{pool.label}: overlap at {offset}"
+        assert not (kind == previous == "free" and offset == cursor), f"{pool.label}: uncoalesced free range at {offset}"
+        cursor, previous = offset + size, kind
+    assert cursor <= allocator.capacity
+    assert allocator.used == sum(block.size for block in pool.blocks)
+    assert all(block.offset % pool.alignment == 0 for block in pool.blocks)
+
+
+def random_mesh_data(rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    count = int(rng.choice((24, 1000, rng.integers(3, 4000))))
+    vertices = rng.random((count, 6), dtype=np.float32)
+    # Odd index counts exercise the padding to 4 bytes:
+    dtype = np.uint16 if rng.random() < 0.5 else np.uint32
+    indices = rng.integers(0, count, int(rng.integers(3, 3 * count)), dtype=dtype)
+    return vertices, indices
+
+
+def corrupted_meshes(device, arena: GpuArena, meshes: dict) -> int:
+    """Reads the arena buffers back, returns how many meshes lost their data."""
+    contents = {id(pool): np.frombuffer(device.queue.read_buffer(pool.buffer), dtype=np.uint8)
+                for pool in [*arena.vertex_pools.values(), *arena.index_pools.values()]}
+    corrupted = 0
+    for mesh, (vertices, indices) in meshes.values():
+        allocation = mesh.allocation
+        for pool, block, data in ((allocation.vertex_pool, allocation.vertex_block, vertices),
+                                  (allocation.index_pool, allocation.index_block, indices)):
+            data = data.view(np.uint8).ravel()
+            stored = contents[id(pool)][block.offset:block.offset + len(data)]
+            corrupted += not np.array_equal(stored, data)
+    return corrupted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=STEPS)
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    args = parser.parse_args()
+
+    _, device = request_device(args.software)
+    resources = resources_of(device)
+    arena = GpuArena(device, initial_capacity=INITIAL_CAPACITY)
+    rng = np.random.default_rng(42)
+
+    meshes: dict[int, tuple[Mesh, tuple[np.ndarray, np.ndarray]]] = {}  # Live meshes and their data
+    compactions = corrupted = 0
+    peak_fragmentation = 0.0
+
+    for step in range(args.steps):
+        free_probability = 0.3 if step // WAVE % 2 == 0 else 0.7
+        if meshes and rng.random() < free_probability:
+            key = list(meshes)[rng.integers(len(meshes))]
+            mesh, _ = meshes.pop(key)
+            mesh.destroy()
+        else:
+            data = random_mesh_data(rng)
+            mesh = Mesh(device, *data, arena=arena)
+            meshes[id(mesh)] = (mesh, data)
+        resources.end_frame()
+
+        stats = arena.stats().values()
+        peak_fragmentation = max([peak_fragmentation, *(pool.fragmentation for pool in stats)])
+        if any(pool.fragmentation > 0.5 and pool.free > pool.capacity // 4 for pool in stats):
+            arena.defragment()
+            compactions += 1
+            corrupted += corrupted_meshes(device, arena, meshes)
+
+        if step % 500 == 0:
+            for pool in [*arena.vertex_pools.values(), *arena.index_pools.values()]:
+                check(pool)
+
+    resources.flush()
+    corrupted += corrupted_meshes(device, arena, meshes)
+
+    print(f"steps={args.steps} meshes={len(meshes)} compactions={compactions} "
+          f"peak fragmentation={peak_fragmentation:.1%} corrupted meshes={corrupted}")
+    for label, stats in arena.stats().items():
+        print(f"{label}: capacity={stats.capacity / 2**20:.1f} MB utilization={stats.utilization:.1%} "
+              f"fragmentation={stats.fragmentation:.1%}")
+
+    failed = corrupted > 0 or compactions == 0
+    print("FAILED" if failed else "OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
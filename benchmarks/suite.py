@@ -0,0 +1,165 @@
+"""Reproducible headless rendering benchmark.
+
+Renders scenes of configurable size offscreen for a fixed number of frames and
+reports CPU update, encode and submit times plus frames per second as JSON.
+From the repository root:
+
+    python -m benchmarks.suite --entities 1000 10000 --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.1
+
+With --baseline the run fails (exit code 1) when a metric regressed by more
+than the threshold. Use --software on machines without a GPU.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+from pyglm import glm
+from graphics.context import GraphicsContext
+from graphics.renderer import Renderer
+from graphics.mesh import Mesh, create_sphere_data
+from scene.camera import Camera
+from scene.entity import Entity
+from scene.scene import Scene
+
+# Metrics where lower is better, everything else (fps) is higher is better:
+TIMINGS = ("update_ms", "encode_ms", "submit_ms", "frame_ms")
+
+
+def create_scene(renderer: Renderer, ctx: GraphicsContext, entity_count: int, mesh_segments: int) -> Scene:
+    camera = Camera(renderer=renderer, position=glm.vec3(0, 0, 5), aspect=ctx.aspect_ratio)
+    camera.clip_far = 1000.0
+    scene = Scene(camera)
+
+    vertices, indices = create_sphere_data(mesh_segments)
+    mesh = Mesh(ctx.device, vertices, indices, arena=renderer.arena)
+
+    # Cube shaped block of entities in front of the camera:
+    side = int(np.ceil(entity_count ** (1 / 3)))
+    for i in range(entity_count):
+        x, y, z = i % side, (i // side) % side, i // (side * side)
+        position = glm.vec3(x - side / 2, y - side / 2, -z * 1.5)
+        scene.add(Entity(renderer, mesh, position=position))
+
+    return scene
+
+
+def summarize(samples: list[float]) -> dict:
+    values = np.array(samples) * 1000.0
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+    }
+
+
+def run_scene(ctx: GraphicsContext, args: argparse.Namespace, entity_count: int) -> dict:
+    renderer = Renderer(ctx, instanced=args.instanced)
+    scene = create_scene(renderer, ctx, entity_count, args.mesh_segments)
+    transforms = renderer.transforms
+
+    rng = np.random.default_rng(args.seed)
+    moving = scene.rows[rng.random(entity_count) < args.moving_fraction]
+
+    timings = {name: [] for name in TIMINGS}
+    for frame in range(args.warmup + args.frames):
+        frame_start = time.perf_counter()
+
+        # CPU update: move entities and compute their matrices:
+        transforms.rotations[moving, 1] += 1.0
+        transforms.dirty[moving] = True
+        scene.camera.update()
+        transforms.update_matrices()
+        update_end = time.perf_counter()
+
+        command_buffer = renderer.encode_frame(scene)
+        encode_end = time.perf_counter()
+
+        # Submit and wait for the GPU, so the frame time includes the GPU work:
+        renderer.submit(command_buffer)
+        ctx.device.queue.on_submitted_work_done_sync()
+        frame_end = time.perf_counter()
+
+        if frame >= args.warmup:
+            timings["update_ms"].append(update_end - frame_start)
+            timings["encode_ms"].append(encode_end - update_end)
+            timings["submit_ms"].append(frame_end - encode_end)
+            timings["frame_ms"].append(frame_end - frame_start)
+
+    metrics = {name: summarize(samples) for name, samples in timings.items()}
+    metrics["fps"] = 1000.0 / metrics["frame_ms"]["mean"]
+    metrics["drawn"] = renderer.cull_stats.drawn
+    return metrics
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns a description of every metric that regressed beyond the threshold."""
+    regressions = []
+    for name, metrics in results["scenes"].items():
+        reference = baseline["scenes"].get(name)
+        if reference is None:
+            continue
+
+        for metric in TIMINGS:
+            current, previous = metrics[metric]["p50"], reference[metric]["p50"]
+            if current > previous * (1.0 + threshold):
+                regressions.append(f"{name} {metric}: {previous:.3f} -> {current:.3f} ms")
+
+        if metrics["fps"] < reference["fps"] * (1.0 - threshold):
+            regressions.append(f"{name} fps: {reference['fps']:.1f} -> {metrics['fps']:.1f}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--mesh-segments", type=int, default=16, help="mesh complexity (sphere segments)")
+    parser.add_argument("--moving-fraction", type=float, default=0.1)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720])
+    parser.add_argument("--instanced", action="store_true")
+    parser.add_argument("--software", action="store_true", help="use the fallback (software) adapter")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+
+    ctx = GraphicsContext(None, size=tuple(args.size), force_fallback_adapter=args.software)
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {
+            "python": sys.version,
+            "gil_enabled": getattr(sys, "_is_gil_enabled", lambda: True)(),
+            "platform": platform.platform(),
+            "adapter": {key: str(value) for key, value in ctx.adapter.info.items()},
+        },
+        "scenes": {},
+    }
+    for entity_count in args.entities:
+        name = f"entities_{entity_count}"
+        results["scenes"][name] = run_scene(ctx, args, entity_count)
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,258 @@
-from rendercanvas.auto import RenderCanvas, loop
-from graphics.context import GraphicsContext
-from graphics.renderer import Renderer
-from scene.camera import Camera
-from scene.scene import Scene
-import glm
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from .jobs import JobSystem
+from .scheduler import FixedTimestep, FrameLimiter, PACING_VSYNC, PACING_CAPPED, PACING_FASTEST
+from .startup import StartupProfile, request_device_async
+
+# The heavy modules (wgpu, numpy, glm, rendercanvas) are imported in __init__,
+# in parallel with acquiring the GPU device:
+if TYPE_CHECKING:
+    from graphics.mesh import Mesh
+    from scene.scene import Scene
+
+logger = logging.getLogger(__name__)
+
+# Events that can change what is on screen, they wake up a throttled engine:
+WAKE_EVENTS = ("pointer_down", "pointer_up", "pointer_move", "wheel", "key_down", "key_up", "resize")
+
 
 class GameEngine:
-    def __init__(self) -> None:
-        self.canvas = RenderCanvas(title="🦭 SealSoftEngine v6", size=(800, 600), vsync=False)
-        self.ctx = GraphicsContext(self.canvas)
-        self.renderer = Renderer(self.ctx)
-        self.scene = self._create_test_scene()
-        self.canvas.request_draw(self.gameloop)
-    
+    def __init__(self,
+                 headless: bool = False,
+                 size: tuple[int, int] = (800, 600),
+                 software_adapter: bool = False,
+                 profile: bool = False,
+                 tick_rate: float = 60.0,
+                 pacing: str = PACING_CAPPED,
+                 max_fps: float = 144.0,
+                 idle_fps: float = 5.0,
+                 workers: int | None = None,
+                 frame_budget_ms: float | None = None,
+                 mesh_budget_mb: float = 0.0,
+                 assets: list[str | Path] = (),
+                 scene_path: str | Path | None = None,
+                 startup: StartupProfile | None = None,
+                 startup_report: bool = False) -> None:
+        # Startup timings, pass a profile created earlier to include the imports:
+        self.startup = startup or StartupProfile()
+        self.startup_report = startup_report
+        startup = self.startup
+
+        # Adapter and device are acquired in the background right away:
+        executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="STARTUP")
+        device = request_device_async(executor, startup, software_adapter)
+
+        with startup.phase("import numpy+glm"):
+            from .profiler import Profiler
+
+        # Frame timings, toggle at runtime with `profiler.enabled`:
+        self.profiler = Profiler(enabled=profile)
+
+        # Worker pool for entity updates, transforms and culling (None: one per core
+        # on free-threaded builds, inline with the GIL):
+        self.jobs = JobSystem(workers)
+
+        # The simulation runs in fixed ticks, rendering interpolates between them:
+        self.timestep = FixedTimestep(tick_rate)
+
+        # Frame pacing, idle engines (static scene, minimized) drop to `idle_fps`:
+        self.pacing = pacing
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.throttled = False
+        self.running = False
+        self._wake = True
+        self._last_version = -1
+        self._last_camera_state = None
+
+        # Headless engines render offscreen (CI, benchmarks), there is no window:
+        if headless:
+            self.canvas = None
+            self.limiter = FrameLimiter()
+        else:
+            with startup.phase("window"):
+                # Only imported here, selecting a GUI backend fails without a display:
+                from rendercanvas.auto import RenderCanvas
+                self.canvas = RenderCanvas(title="🦭 SealSoftEngine v6", size=size, vsync=pacing == PACING_VSYNC)
+                self.canvas.add_event_handler(self._on_event, *WAKE_EVENTS)
+
+        with startup.phase("import engine"):
+            from graphics.context import GraphicsContext
+            from graphics.renderer import Renderer
+            from graphics.mesh_cache import MeshCache
+            from graphics.streaming import AssetStreamer
+
+        with startup.phase("wait for device"):
+            self.ctx = GraphicsContext(self.canvas, size=size, device=device.result())
+
+        with startup.phase("renderer"):
+            self.renderer = Renderer(self.ctx, profiler=self.profiler, jobs=self.jobs, prewarm=False)
+
+            # With a frame budget the render scale drops whenever the GPU can't keep up:
+            if frame_budget_ms is not None:
+                self.renderer.dynamic_resolution = True
+                self.renderer.resolution.target_ms = frame_budget_ms
+
+            # Meshes nobody uses anymore stay cached (for reloads) up to `mesh_budget_mb`:
+            self.mesh_cache = MeshCache(self.ctx.device, arena=self.renderer.arena,
+                                        budget=int(mesh_budget_mb * 2**20))
+
+            # Meshes loaded while the game is running (`streamer.request`) are
+            # uploaded a few megabytes per frame:
+            self.streamer = AssetStreamer(self.ctx.device, arena=self.renderer.arena)
+
+        # Pipelines compile in the background while the assets are loaded:
+        pipelines = executor.submit(self._timed, "pipelines", self.renderer.prewarm_pipelines)
+        with startup.phase("assets"):
+            meshes = self.mesh_cache.load_many(assets, executor)
+            self.assets: dict[str, "Mesh"] = {str(path): mesh for path, mesh in zip(assets, meshes)}
+        with startup.phase("scene"):
+            # A scene snapshot (see scene.snapshot) is loaded in bulk, meshes in parallel:
+            if scene_path is not None:
+                self.scene = self._load_scene(scene_path, executor)
+            else:
+                self.scene = self._create_test_scene()
+        with startup.phase("wait for pipelines"):
+            pipelines.result()
+        executor.shutdown(wait=False)
+
+        if self.canvas is not None:
+            self._apply_update_mode()
+            self.canvas.request_draw(self.gameloop)
+
     def handle_input(self) -> None:
         ...
-    
-    def gameloop(self):
-        self.handle_input()
 
-        # Game-logic updates here...
+    def gameloop(self, dt: float | None = None):
+        profiler = self.profiler
+        profiler.begin_frame()
 
-        self.renderer.render(scene=self.scene)
+        with profiler.scope("input"):
+            self.handle_input()
 
-        self.canvas.request_draw()
+        with profiler.scope("update"):
+            transforms = self.renderer.transforms
+            for _ in range(self.timestep.advance(dt)):
+                transforms.begin_tick()
+                self.scene.update(self.timestep.dt)
+            transforms.interpolate(self.timestep.alpha)
+
+        with profiler.scope("streaming"):
+            self.streamer.update()
+
+        # Nothing to see while minimized:
+        width, height = self.ctx.size
+        visible = width > 0 and height > 0
+        if visible:
+            self.renderer.render(scene=self.scene)
+
+        if self.startup.first_frame is None:
+            self.startup.mark_first_frame()
+            if self.startup_report:
+                logger.info("startup:\n%s", self.startup.report())
+
+        self._set_throttled(not visible or self._is_idle())
+        profiler.end_frame()
 
     def run(self):
-        loop.run()
+        if self.canvas is not None:
+            from rendercanvas.auto import loop
+            loop.run()
+            return
+
+        self.running = True
+        while self.running:
+            self.gameloop()
+            self.limiter.wait(self.target_fps)
+
+    def run_frames(self, count: int, dt: float | None = None) -> None:
+        """Runs a fixed number of frames without an event loop (headless).
+
+        With `dt` every frame advances the simulation by exactly `dt` seconds,
+        so runs are reproducible. The frames are not paced.
+        """
+        for _ in range(count):
+            self.gameloop(dt)
+
+    def stop(self) -> None:
+        self.running = False
+
+    def save_scene(self, path: str | Path) -> None:
+        """Writes the current scene to a snapshot file, see `scene_path`."""
+        from scene.snapshot import save_scene
+        save_scene(path, self.scene)
+
+    def memory_report(self) -> str:
+        """GPU memory by category (see graphics.resources)."""
+        return self.ctx.resources.report()
+
+    @property
+    def target_fps(self) -> float:
+        if self.throttled:
+            return self.idle_fps
+        return 0.0 if self.pacing == PACING_FASTEST else self.max_fps
+
+    def _is_idle(self) -> bool:
+        """True when the last frame looked exactly like the one before."""
+        camera = self.scene.camera
+        camera_state = (tuple(camera.position), tuple(camera.front), camera.fovy, camera.aspect)
+        version = self.renderer.transforms.version
 
-    def _create_test_scene(self) -> Scene:
-        camera = Camera(renderer=self.renderer, 
-                        position=glm.vec3(0, 0, 5), 
-                        aspect=self.ctx.aspect_ratio)
+        idle = not self._wake and version == self._last_version and camera_state == self._last_camera_state
+        self._wake = False
+        self._last_version = version
+        self._last_camera_state = camera_state
+        return idle
 
-        scene = Scene(camera)
+    def _set_throttled(self, throttled: bool) -> None:
+        if throttled == self.throttled:
+            return
+        self.throttled = throttled
+        if self.canvas is not None:
+            self._apply_update_mode()
+
+    def _apply_update_mode(self) -> None:
+        # The canvas schedules the draws, so the loop sleeps instead of spinning:
+        if self.throttled:
+            # Draw on events, otherwise every now and then to keep ticking:
+            self.canvas.set_update_mode("ondemand", min_fps=self.idle_fps, max_fps=self.max_fps)
+        elif self.pacing == PACING_FASTEST:
+            self.canvas.set_update_mode("fastest")
+        elif self.pacing == PACING_VSYNC:
+            # Presenting blocks on the display, no extra cap:
+            self.canvas.set_update_mode("continuous", max_fps=1000.0)
+        else:
+            self.canvas.set_update_mode("continuous", max_fps=self.max_fps)
+
+    def _on_event(self, event: dict) -> None:
+        self._wake = True
+        self._set_throttled(False)
+        self.canvas.request_draw()
+
+    def _timed(self, phase: str, function):
+        with self.startup.phase(phase):
+            return function()
+
+    def _create_camera(self):
+        from pyglm import glm
+        from scene.camera import Camera
+
+        return Camera(renderer=self.renderer,
+                      position=glm.vec3(0, 0, 5),
+                      aspect=self.ctx.aspect_ratio)
+
+    def _load_scene(self, path: str | Path, executor) -> "Scene":
+        from scene.snapshot import load_scene
+        return load_scene(path, self._create_camera(), self.mesh_cache, executor)
+
+    def _create_test_scene(self) -> "Scene":
+        from scene.scene import Scene
+
+        scene = Scene(self._create_camera())
 
         # Add some objects to the scene:
         ...
-        
+
         return scene
@@ -0,0 +1,179 @@
+import os
+import sys
+import random
+import threading
+from collections import deque
+
+
+def free_threaded() -> bool:
+    """True on a free-threaded (no GIL) CPython build with the GIL disabled."""
+    return not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+class Job:
+    """A function call scheduled on a JobSystem, runs once all its dependencies finished."""
+    __slots__ = ("function", "args", "exception", "_pending", "_continuations", "_finished", "_lock", "_done")
+
+    def __init__(self, function, args: tuple) -> None:
+        self.function = function
+        self.args = args
+        self.exception: BaseException | None = None
+        self._pending = 1  # Unfinished dependencies, +1 until the job was submitted
+        self._continuations: list[Job] = []
+        self._finished = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+
+class JobSystem:
+    """Persistent worker pool with one work-stealing queue per worker.
+
+    Workers push new jobs to the back of their own queue and pop from there
+    (hot caches), idle workers steal from the front of the others. Threads
+    waiting for a job help executing jobs instead of blocking, so jobs can
+    wait for other jobs (e.g. nested `parallel_for`).
+
+    With the GIL only one thread runs Python code at a time, so by default no
+    worker threads are started there and everything runs on the calling thread.
+    numpy releases the GIL though, so pass `workers` to use threads anyway.
+    """
+    def __init__(self, workers: int | None = None) -> None:
+        if workers is None:
+            workers = (os.process_cpu_count() or 1) - 1 if free_threaded() else 0
+        self.workers = workers
+
+        # One queue per worker plus a shared one for all other threads:
+        self.queues = [deque() for _ in range(workers + 1)]
+        self._local = threading.local()
+        self._condition = threading.Condition()
+        self._running = True
+
+        self.threads = [
+            threading.Thread(target=self._worker, args=(index,), name=f"JOB_WORKER_{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, function, *args, dependencies: tuple[Job, ...] | list[Job] = ()) -> Job:
+        """Schedules `function(*args)`, once all `dependencies` finished."""
+        job = Job(function, args)
+        job._pending += len(dependencies)
+
+        finished = 1
+        for dependency in dependencies:
+            with dependency._lock:
+                if dependency._finished:
+                    finished += 1
+                else:
+                    dependency._continuations.append(job)
+        self._release(job, finished)
+        return job
+
+    def wait(self, *jobs: Job) -> None:
+        """Waits for all jobs, executing other jobs meanwhile. Re-raises job exceptions."""
+        index = self._queue_index()
+        for job in jobs:
+            while not job._done.is_set():
+                other = self._take(index)
+                if other is not None:
+                    self._run(other)
+                else:
+                    job._done.wait(0.001)
+
+        for job in jobs:
+            if job.exception is not None:
+                raise job.exception
+
+    def parallel_for(self, count: int, function, chunk_size: int | None = None) -> None:
+        """Calls `function(start, end)` for chunks of range(count) in parallel and waits."""
+        if count == 0:
+            return
+        if chunk_size is None:
+            # A few chunks per thread, so stealing can even out uneven chunks:
+            chunk_size = max(1, -(-count // ((self.workers + 1) * 4)))
+        if self.workers == 0 or count <= chunk_size:
+            function(0, count)
+            return
+
+        self.wait(*[self.submit(function, start, min(start + chunk_size, count))
+                    for start in range(0, count, chunk_size)])
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def _queue_index(self) -> int:
+        # Workers have their own queue, every other thread uses the last one:
+        return getattr(self._local, "index", self.workers)
+
+    def _push(self, job: Job) -> None:
+        if self.workers == 0:
+            self._run(job)
+            return
+
+        self.queues[self._queue_index()].append(job)
+        with self._condition:
+            self._condition.notify()
+
+    def _take(self, index: int) -> Job | None:
+        try:
+            return self.queues[index].pop()
+        except IndexError:
+            pass
+
+        # Steal the oldest job of another queue, starting at a random one:
+        count = len(self.queues)
+        start = random.randrange(count)
+        for offset in range(count):
+            victim = (start + offset) % count
+            if victim == index:
+                continue
+            try:
+                return self.queues[victim].popleft()
+            except IndexError:
+                pass
+        return None
+
+    def _run(self, job: Job) -> None:
+        try:
+            job.function(*job.args)
+        except BaseException as exception:
+            job.exception = exception
+
+        with job._lock:
+            job._finished = True
+            continuations = job._continuations
+            job._continuations = []
+        job._done.set()
+
+        for continuation in continuations:
+            self._release(continuation, 1)
+
+    def _release(self, job: Job, count: int) -> None:
+        with job._lock:
+            job._pending -= count
+            ready = job._pending == 0
+        if ready:
+            self._push(job)
+
+    def _worker(self, index: int) -> None:
+        self._local.index = index
+        while True:
+            job = self._take(index)
+            if job is not None:
+                self._run(job)
+                continue
+
+            with self._condition:
+                if not self._running:
+                    return
+                if not any(self.queues):
+                    self._condition.wait()
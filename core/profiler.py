@@ -0,0 +1,187 @@
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size buffer of the last `capacity` samples with rolling percentiles."""
+    def __init__(self, capacity: int) -> None:
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, len(self.values))
+
+    def push(self, value: float) -> None:
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def percentiles(self, percentiles=(50, 95, 99)) -> dict[str, float]:
+        if not len(self):
+            return {f"p{p}": 0.0 for p in percentiles}
+        results = np.percentile(self.values[:len(self)], percentiles)
+        return {f"p{p}": float(result) for p, result in zip(percentiles, results)}
+
+
+@dataclass
+class FrameCapture:
+    """All markers of one frame, timestamps in nanoseconds."""
+    index: int
+    start: int
+    end: int = 0
+    cpu: list[tuple[str, int, int, int]] = field(default_factory=list)  # name, start, end, depth
+    gpu: list[tuple[str, int, int]] = field(default_factory=list)  # name, start, end (GPU clock)
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.profiler._depth += 1
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info) -> None:
+        end = time.perf_counter_ns()
+        profiler = self.profiler
+        profiler._depth -= 1
+        frame = profiler._frame
+        if frame is not None:
+            frame.cpu.append((self.name, self.start, end, profiler._depth))
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class Profiler:
+    """Per-frame CPU scopes and GPU pass timings.
+
+    Markers are nestable context managers:
+
+        profiler.begin_frame()
+        with profiler.scope("update"):
+            ...
+        profiler.end_frame()
+
+    The durations of every marker go into ring buffers for rolling percentiles
+    and the last `capture_frames` frames are kept for `export_chrome_trace`.
+    A disabled profiler hands out one shared no-op scope, so markers can stay
+    in the hot paths.
+    """
+    def __init__(self, enabled: bool = False, capacity: int = 512, capture_frames: int = 120) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frame_index = 0
+
+        # Rolling durations (ms) per marker name, "frame" is the whole frame:
+        self.stats: dict[str, RingBuffer] = {}
+        self.captures: deque[FrameCapture] = deque(maxlen=capture_frames)
+
+        self._frame: FrameCapture | None = None
+        self._depth = 0
+
+    def scope(self, name: str) -> _Scope | _NullScope:
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._frame = FrameCapture(self.frame_index, time.perf_counter_ns())
+        self._depth = 0
+
+    def end_frame(self) -> None:
+        frame = self._frame
+        self.frame_index += 1
+        if frame is None:
+            return
+
+        self._frame = None
+        frame.end = time.perf_counter_ns()
+        self._record("frame", frame.end - frame.start)
+
+        # Markers with the same name (e.g. one per pass) are summed up per frame:
+        totals: dict[str, int] = {}
+        for name, start, end, _ in frame.cpu:
+            totals[name] = totals.get(name, 0) + end - start
+        for name, total in totals.items():
+            self._record(name, total)
+
+        self.captures.append(frame)
+
+    def add_gpu_times(self, frame_index: int, timings: list[tuple[str, int, int]]) -> None:
+        """GPU pass timestamps of an earlier frame, they arrive a few frames late."""
+        if not self.enabled:
+            return
+
+        for name, start, end in timings:
+            self._record(f"gpu:{name}", end - start)
+
+        for frame in reversed(self.captures):
+            if frame.index == frame_index:
+                frame.gpu.extend(timings)
+                break
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Rolling p50/p95/p99 in milliseconds for every marker."""
+        return {name: ring.percentiles() for name, ring in self.stats.items()}
+
+    def report(self) -> str:
+        lines = [f"{'marker':<24}{'p50':>10}{'p95':>10}{'p99':>10}  (ms, {len(self.stats.get('frame', ()))} frames)"]
+        for name, percentiles in self.summary().items():
+            lines.append(f"{name:<24}" + "".join(f"{value:>10.3f}" for value in percentiles.values()))
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str | Path) -> None:
+        """Writes the captured frames as Chrome trace-event JSON (chrome://tracing, Perfetto).
+
+        The GPU clock is unrelated to the CPU clock, so the GPU passes of a frame
+        are placed relative to the start of its "submit" marker.
+        """
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "CPU"}},
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": 1, "args": {"name": "GPU"}},
+        ]
+        origin = self.captures[0].start if self.captures else 0
+
+        def to_us(ns: int) -> float:
+            return (ns - origin) / 1000.0
+
+        for frame in self.captures:
+            events.append({"name": f"frame {frame.index}", "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+                           "ts": to_us(frame.start), "dur": (frame.end - frame.start) / 1000.0})
+            for name, start, end, _ in frame.cpu:
+                events.append({"name": name, "cat": "cpu", "ph": "X", "pid": 0, "tid": 0,
+                               "ts": to_us(start), "dur": (end - start) / 1000.0})
+
+            if frame.gpu:
+                anchor = next((start for name, start, _, _ in frame.cpu if name == "submit"), frame.end)
+                gpu_origin = min(start for _, start, _ in frame.gpu)
+                for name, start, end in frame.gpu:
+                    events.append({"name": name, "cat": "gpu", "ph": "X", "pid": 0, "tid": 1,
+                                   "ts": to_us(anchor + start - gpu_origin), "dur": (end - start) / 1000.0})
+
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+    def _record(self, name: str, duration_ns: int) -> None:
+        ring = self.stats.get(name)
+        if ring is None:
+            ring = self.stats[name] = RingBuffer(self.capacity)
+        ring.push(duration_ns / 1e6)
@@ -0,0 +1,71 @@
+import time
+
+# Pacing modes of the windowed engine:
+PACING_VSYNC = "vsync"      # Presenting waits for the display
+PACING_CAPPED = "capped"    # Frames are capped to max_fps
+PACING_FASTEST = "fastest"  # As fast as possible (benchmarks)
+
+
+class FixedTimestep:
+    """Runs the simulation in fixed ticks, independent of the frame rate.
+
+    Elapsed frame time goes into an accumulator which is consumed in steps of
+    `dt`. The remainder is the `alpha` used to interpolate between the last two
+    simulation states when rendering.
+    """
+    def __init__(self, tick_rate: float = 60.0, max_ticks: int = 8) -> None:
+        self.dt = 1.0 / tick_rate
+        self.max_ticks = max_ticks  # Per frame, so a slow frame can't snowball
+        self.accumulator = 0.0
+        self.ticks = 0
+        self._last_time: float | None = None
+
+    @property
+    def alpha(self) -> float:
+        return self.accumulator / self.dt
+
+    def advance(self, elapsed: float | None = None) -> int:
+        """Adds the time since the last call (or `elapsed`). Returns the number of ticks to run."""
+        now = time.perf_counter()
+        if elapsed is None:
+            elapsed = now - self._last_time if self._last_time is not None else 0.0
+        self._last_time = now
+
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.dt)
+        if ticks > self.max_ticks:
+            # Too far behind, drop the time instead of trying to catch up:
+            ticks = self.max_ticks
+            self.accumulator = self.dt * 0.999
+        else:
+            self.accumulator -= ticks * self.dt
+
+        self.ticks += ticks
+        return ticks
+
+
+class FrameLimiter:
+    """Sleeps until the next frame is due, for loops without a canvas scheduler."""
+    def __init__(self, spin_time: float = 0.001) -> None:
+        # The OS sleep overshoots, the last `spin_time` seconds are busy-waited:
+        self.spin_time = spin_time
+        self._next_frame: float | None = None
+
+    def wait(self, fps: float) -> None:
+        now = time.perf_counter()
+        if fps <= 0 or fps == float("inf"):
+            self._next_frame = now
+            return
+
+        interval = 1.0 / fps
+        if self._next_frame is None or now - self._next_frame > interval:
+            # First frame or we fell behind, don't try to catch up:
+            self._next_frame = now
+            return
+
+        self._next_frame += interval
+        remaining = self._next_frame - now
+        if remaining > self.spin_time:
+            time.sleep(remaining - self.spin_time)
+        while time.perf_counter() < self._next_frame:
+            pass
@@ -0,0 +1,78 @@
+"""Startup phases and their timings.
+
+Only the standard library is imported here, so the timer starts before any of
+the heavy modules (wgpu, numpy, glm, rendercanvas) are loaded.
+"""
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class StartupProfile:
+    """Records how long every startup phase took and the time to the first frame.
+
+    Phases may overlap (they can run on other threads), all times are relative
+    to the creation of the profile.
+    """
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.phases: list[tuple[str, float, float, str]] = []  # name, start, end, thread
+        self.first_frame: float | None = None
+        self._lock = threading.Lock()
+
+    def phase(self, name: str) -> "_Phase":
+        return _Phase(self, name)
+
+    def mark_first_frame(self) -> None:
+        if self.first_frame is None:
+            self.first_frame = time.perf_counter() - self.origin
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": [{"name": name, "start_ms": start * 1000.0, "duration_ms": (end - start) * 1000.0,
+                        "thread": thread} for name, start, end, thread in self.phases],
+            "first_frame_ms": self.first_frame * 1000.0 if self.first_frame is not None else None,
+        }
+
+    def report(self) -> str:
+        lines = [f"{'phase':<20}{'start':>10}{'duration':>10}  thread (ms)"]
+        for name, start, end, thread in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append(f"{name:<20}{start * 1000.0:>10.1f}{(end - start) * 1000.0:>10.1f}  {thread}")
+        if self.first_frame is not None:
+            lines.append(f"{'first frame':<20}{self.first_frame * 1000.0:>10.1f}")
+        return "\n".join(lines)
+
+    def _record(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.phases.append((name, start - self.origin, end - self.origin, threading.current_thread().name))
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: StartupProfile, name: str) -> None:
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.profile._record(self.name, self.start, time.perf_counter())
+
+
+def request_device_async(executor: ThreadPoolExecutor,
+                         profile: StartupProfile,
+                         force_fallback_adapter: bool = False) -> Future:
+    """Imports wgpu and acquires the adapter and device on the executor.
+
+    The native calls release the GIL, so this overlaps with the window creation
+    and the remaining imports on the main thread. Resolves to (adapter, device).
+    """
+    def acquire():
+        with profile.phase("import wgpu"):
+            from graphics.context import request_device
+        with profile.phase("adapter+device"):
+            return request_device(force_fallback_adapter)
+
+    return executor.submit(acquire)
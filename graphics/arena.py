@@ -0,0 +1,284 @@
+import bisect
+from dataclasses import dataclass
+import wgpu
+import numpy as np
+from .mesh import VertexLayout
+from .resources import resources_of, CATEGORY_MESHES
+
+
+def align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class Block:
+    """A suballocated range of an arena buffer. Moves when the arena is compacted."""
+    __slots__ = ("offset", "size")
+
+    def __init__(self, offset: int, size: int) -> None:
+        self.offset = offset
+        self.size = size
+
+
+@dataclass
+class ArenaStats:
+    capacity: int
+    used: int
+    free: int
+    largest_free: int
+    blocks: int
+
+    @property
+    def utilization(self) -> float:
+        return self.used / self.capacity if self.capacity else 0.0
+
+    @property
+    def fragmentation(self) -> float:
+        """0.0 when all free memory is one range, approaching 1.0 when it is scattered."""
+        return 1.0 - self.largest_free / self.free if self.free else 0.0
+
+
+class RangeAllocator:
+    """First-fit allocator over [0, capacity) with a sorted, coalescing free list."""
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.used = 0
+        self.free_ranges: list[list[int]] = [[0, capacity]] if capacity else []  # [offset, size]
+
+    def allocate(self, size: int, alignment: int) -> int | None:
+        for i, (offset, free_size) in enumerate(self.free_ranges):
+            aligned = align(offset, alignment)
+            padding = aligned - offset
+            if free_size - padding < size:
+                continue
+
+            # Split the free range, padding in front of the block stays free:
+            tail = free_size - padding - size
+            remainder = []
+            if padding:
+                remainder.append([offset, padding])
+            if tail:
+                remainder.append([aligned + size, tail])
+            self.free_ranges[i:i + 1] = remainder
+
+            self.used += size
+            return aligned
+        return None
+
+    def free(self, offset: int, size: int) -> None:
+        self.used -= size
+        i = bisect.bisect_left(self.free_ranges, offset, key=lambda free_range: free_range[0])
+        self.free_ranges.insert(i, [offset, size])
+
+        # Coalesce with the next and the previous free range:
+        if i + 1 < len(self.free_ranges) and offset + size == self.free_ranges[i + 1][0]:
+            self.free_ranges[i][1] += self.free_ranges.pop(i + 1)[1]
+        if i > 0 and self.free_ranges[i - 1][0] + self.free_ranges[i - 1][1] == offset:
+            self.free_ranges[i - 1][1] += self.free_ranges.pop(i)[1]
+
+    def grow(self, capacity: int) -> None:
+        end = self.capacity
+        self.capacity = capacity
+        if self.free_ranges and sum(self.free_ranges[-1]) == end:
+            self.free_ranges[-1][1] += capacity - end
+        else:
+            self.free_ranges.append([end, capacity - end])
+
+    def compact(self, blocks: list[Block], alignment: int) -> list[tuple[int, int, int]]:
+        """Packs all blocks to the front. Returns the (source, destination, size) moves."""
+        moves = []
+        cursor = 0
+        free_ranges = []
+        for block in sorted(blocks, key=lambda block: block.offset):
+            # Padding in front of a block (sizes that are no multiple of the alignment) stays free:
+            aligned = align(cursor, alignment)
+            if aligned > cursor:
+                free_ranges.append([cursor, aligned - cursor])
+            moves.append((block.offset, aligned, block.size))
+            block.offset = aligned
+            cursor = aligned + block.size
+
+        self.used = sum(block.size for block in blocks)
+        if cursor < self.capacity:
+            free_ranges.append([cursor, self.capacity - cursor])
+        self.free_ranges = free_ranges
+        return moves
+
+    def stats(self, blocks: int) -> ArenaStats:
+        largest = max((size for _, size in self.free_ranges), default=0)
+        return ArenaStats(capacity=self.capacity, used=self.used, free=self.capacity - self.used,
+                          largest_free=largest, blocks=blocks)
+
+
+class ArenaBuffer:
+    """One large GPU buffer suballocated by a RangeAllocator."""
+    def __init__(self, device: wgpu.GPUDevice, label: str, usage: int, alignment: int, capacity: int) -> None:
+        self.device = device
+        self.label = label
+        self.usage = usage | wgpu.BufferUsage.COPY_DST | wgpu.BufferUsage.COPY_SRC
+        self.alignment = alignment
+        self.allocator = RangeAllocator(capacity)
+        self.blocks: set[Block] = set()
+        self.buffer = self._create_buffer(capacity)
+        self.generation = 0  # Bumped whenever the buffer is replaced
+
+    def allocate(self, data: np.ndarray, upload: bool = True) -> Block:
+        """Allocates a block for `data`. Without `upload` the data is not written,
+        the caller fills the block itself (e.g. with buffer copies)."""
+        data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        if len(data) % 4:
+            # write_buffer only takes multiples of 4 bytes:
+            data = np.pad(data, (0, -len(data) % 4))
+
+        offset = self.allocator.allocate(len(data), self.alignment)
+        if offset is None:
+            required = self.allocator.capacity + len(data) + self.alignment
+            self._grow(max(self.allocator.capacity * 2, align(required, 4)))
+            offset = self.allocator.allocate(len(data), self.alignment)
+
+        block = Block(offset, len(data))
+        self.blocks.add(block)
+        if upload:
+            self.device.queue.write_buffer(self.buffer, offset, data)
+        return block
+
+    def free(self, block: Block) -> None:
+        self.blocks.remove(block)
+        self.allocator.free(block.offset, block.size)
+
+    def defragment(self, command_encoder: wgpu.GPUCommandEncoder) -> wgpu.GPUBuffer | None:
+        """Records the compaction into a new buffer. Returns the old buffer, which
+        has to be destroyed after the commands were submitted."""
+        if self.allocator.stats(len(self.blocks)).fragmentation == 0.0:
+            return None
+
+        # Copies within the same buffer are not allowed, so compact into a new one:
+        old_buffer = self.buffer
+        self.buffer = self._create_buffer(self.allocator.capacity)
+        self.generation += 1
+        for source, destination, size in self.allocator.compact(list(self.blocks), self.alignment):
+            command_encoder.copy_buffer_to_buffer(old_buffer, source, self.buffer, destination, size)
+        return old_buffer
+
+    def _grow(self, capacity: int) -> None:
+        old_buffer = self.buffer
+        self.buffer = self._create_buffer(capacity)
+        self.generation += 1
+
+        # Offsets stay the same, so everything is copied with one command:
+        command_encoder = self.device.create_command_encoder(label=f"{self.label}_GROW")
+        command_encoder.copy_buffer_to_buffer(old_buffer, 0, self.buffer, 0, self.allocator.capacity)
+        self.device.queue.submit([command_encoder.finish()])
+        resources_of(self.device).release_later(old_buffer)
+
+        self.allocator.grow(capacity)
+
+    def _create_buffer(self, capacity: int) -> wgpu.GPUBuffer:
+        buffer = self.device.create_buffer(label=self.label, size=capacity, usage=self.usage)
+        return resources_of(self.device).track(buffer, CATEGORY_MESHES, self)
+
+
+class MeshAllocation:
+    """Where the vertices and indices of a mesh live inside the arena."""
+    def __init__(self, vertex_pool: ArenaBuffer, vertex_block: Block, stride: int,
+                 index_pool: ArenaBuffer | None, index_block: Block | None, index_size: int) -> None:
+        self.vertex_pool = vertex_pool
+        self.vertex_block = vertex_block
+        self.stride = stride
+        self.index_pool = index_pool
+        self.index_block = index_block
+        self.index_size = index_size  # Bytes per index
+
+    @property
+    def vertex_buffer(self) -> wgpu.GPUBuffer:
+        return self.vertex_pool.buffer
+
+    @property
+    def index_buffer(self) -> wgpu.GPUBuffer | None:
+        return self.index_pool.buffer if self.index_pool else None
+
+    @property
+    def base_vertex(self) -> int:
+        return self.vertex_block.offset // self.stride
+
+    @property
+    def first_index(self) -> int:
+        return self.index_block.offset // self.index_size if self.index_block else 0
+
+    @property
+    def size(self) -> int:
+        return self.vertex_block.size + (self.index_block.size if self.index_block else 0)
+
+    def destinations(self) -> list[tuple[wgpu.GPUBuffer, int]]:
+        """(buffer, offset) of the vertex and the index data, only valid until
+        the arena grows or is defragmented."""
+        if self.index_pool is None:
+            return [(self.vertex_pool.buffer, self.vertex_block.offset)]
+        return [(self.vertex_pool.buffer, self.vertex_block.offset),
+                (self.index_pool.buffer, self.index_block.offset)]
+
+    def free(self) -> None:
+        self.vertex_pool.free(self.vertex_block)
+        if self.index_pool:
+            self.index_pool.free(self.index_block)
+
+
+class GpuArena:
+    """Suballocates meshes out of a few large vertex and index buffers.
+
+    There is one vertex buffer per vertex layout (offsets must be a multiple of
+    the stride for base_vertex) and one index buffer per index format, so the
+    renderer only has to rebind buffers when the pipeline changes anyway.
+    """
+    def __init__(self, device: wgpu.GPUDevice, initial_capacity: int = 4 * 1024 * 1024) -> None:
+        self.device = device
+        self.initial_capacity = initial_capacity
+        self.vertex_pools: dict[str, ArenaBuffer] = {}
+        self.index_pools: dict[str, ArenaBuffer] = {}
+
+    def allocate(self,
+                 vertices: np.ndarray,
+                 indices: np.ndarray | None,
+                 layout: VertexLayout,
+                 upload: bool = True) -> MeshAllocation:
+        vertex_pool = self.vertex_pools.get(layout.name)
+        if vertex_pool is None:
+            vertex_pool = ArenaBuffer(self.device, f"ARENA_VERTEX_BUFFER_{layout.name.upper()}",
+                                      wgpu.BufferUsage.VERTEX, int(np.lcm(layout.stride, 4)), self.initial_capacity)
+            self.vertex_pools[layout.name] = vertex_pool
+        vertex_block = vertex_pool.allocate(vertices, upload)
+
+        index_pool, index_block, index_size = None, None, 0
+        if indices is not None:
+            index_format = str(indices.dtype)
+            index_size = indices.dtype.itemsize
+            index_pool = self.index_pools.get(index_format)
+            if index_pool is None:
+                index_pool = ArenaBuffer(self.device, f"ARENA_INDEX_BUFFER_{index_format.upper()}",
+                                         wgpu.BufferUsage.INDEX, 4, self.initial_capacity)
+                self.index_pools[index_format] = index_pool
+            index_block = index_pool.allocate(indices, upload)
+
+        return MeshAllocation(vertex_pool, vertex_block, layout.stride, index_pool, index_block, index_size)
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever a buffer was replaced, e.g. to invalidate render bundles."""
+        return sum(pool.generation for pool in self._pools())
+
+    def defragment(self) -> None:
+        """Compacts all buffers with copy_buffer_to_buffer."""
+        command_encoder = self.device.create_command_encoder(label="ARENA_DEFRAGMENT")
+        old_buffers = [pool.defragment(command_encoder) for pool in self._pools()]
+        self.device.queue.submit([command_encoder.finish()])
+
+        # Frames in flight may still draw from the old buffers:
+        resources = resources_of(self.device)
+        for buffer in old_buffers:
+            if buffer:
+                resources.release_later(buffer)
+
+    def stats(self) -> dict[str, ArenaStats]:
+        return {pool.label: pool.allocator.stats(len(pool.blocks)) for pool in self._pools()}
+
+    def _pools(self) -> list[ArenaBuffer]:
+        return [*self.vertex_pools.values(), *self.index_pools.values()]
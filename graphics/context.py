@@ -1,19 +1,86 @@
+from typing import TYPE_CHECKING
 import wgpu
-from rendercanvas import BaseRenderCanvas
-from rendercanvas.contexts import WgpuContext
+import numpy as np
+from .gpu_timer import TIMESTAMP_FEATURE
+from .resources import ResourceRegistry, resources_of, CATEGORY_TARGETS
+
+if TYPE_CHECKING:
+    # Only for annotations, the canvas is created (and rendercanvas imported) by the engine:
+    from rendercanvas import BaseRenderCanvas
+    from rendercanvas.contexts import WgpuContext
+
+
+def request_device(force_fallback_adapter: bool = False) -> tuple[wgpu.GPUAdapter, wgpu.GPUDevice]:
+    # The fallback adapter is a software rasterizer, for machines without a GPU:
+    adapter = wgpu.gpu.request_adapter_sync(power_preference="high-performance",
+                                            force_fallback_adapter=force_fallback_adapter)
+
+    # Timestamp queries are optional, the profiler falls back to CPU timings without them:
+    features = [TIMESTAMP_FEATURE] if TIMESTAMP_FEATURE in adapter.features else []
+    return adapter, adapter.request_device_sync(required_features=features)
 
 
 class GraphicsContext:
-    def __init__(self, canvas: BaseRenderCanvas) -> None:
+    def __init__(self,
+                 canvas: "BaseRenderCanvas | None",
+                 size: tuple[int, int] = (800, 600),
+                 force_fallback_adapter: bool = False,
+                 device: tuple[wgpu.GPUAdapter, wgpu.GPUDevice] | None = None) -> None:
+        # Without a canvas we render headless into an offscreen texture. The
+        # adapter and device can be requested up front (see request_device).
         self.canvas = canvas
-        self.adapter = wgpu.gpu.request_adapter_sync(power_preference="high-performance")
-        self.device = self.adapter.request_device_sync()
-        self.present_context: WgpuContext = self.canvas.get_context("wgpu")
-        self.render_format = self.present_context.get_preferred_format(self.adapter)
+        self.adapter, self.device = device or request_device(force_fallback_adapter)
 
-        self.present_context.configure(device=self.device, format=self.render_format)
+        # Every buffer and texture created on the device, see resources:
+        self.resources: ResourceRegistry = resources_of(self.device)
+
+        self.present_context: "WgpuContext | None" = None
+        self.offscreen_texture: wgpu.GPUTexture | None = None
+
+        if canvas is not None:
+            self.present_context = self.canvas.get_context("wgpu")
+            self.render_format = self.present_context.get_preferred_format(self.adapter)
+            self.present_context.configure(device=self.device, format=self.render_format)
+        else:
+            self.render_format = wgpu.TextureFormat.rgba8unorm
+            self.offscreen_texture = self._create_offscreen_texture(size)
+
+    @property
+    def headless(self) -> bool:
+        return self.canvas is None
+
+    @property
+    def size(self) -> tuple[int, int]:
+        if self.canvas is not None:
+            return self.canvas.get_physical_size()
+        width, height, _ = self.offscreen_texture.size
+        return width, height
 
     @property
     def aspect_ratio(self):
-        w, h = self.canvas.get_physical_size()
+        w, h = self.size
         return w / h
+
+    def get_current_texture(self) -> wgpu.GPUTexture:
+        if self.present_context is not None:
+            return self.present_context.get_current_texture()
+        return self.offscreen_texture
+
+    def read_pixels(self) -> np.ndarray:
+        """Reads the offscreen texture back into a (height, width, 4) uint8 array."""
+        width, height = self.size
+        data = self.device.queue.read_texture(
+            {"texture": self.offscreen_texture, "mip_level": 0, "origin": (0, 0, 0)},
+            {"offset": 0, "bytes_per_row": width * 4, "rows_per_image": height},
+            (width, height, 1),
+        )
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+    def _create_offscreen_texture(self, size: tuple[int, int]) -> wgpu.GPUTexture:
+        texture = self.device.create_texture(
+            label="OFFSCREEN_TEXTURE",
+            size=(*size, 1),
+            usage=wgpu.TextureUsage.RENDER_ATTACHMENT | wgpu.TextureUsage.COPY_SRC,
+            format=self.render_format,
+        )
+        return self.resources.track(texture, CATEGORY_TARGETS, self)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+import numpy as np
+from pyglm import glm
+
+
+@dataclass
+class CullStats:
+    """Counters of the last frame."""
+    tested: int = 0
+    culled: int = 0
+    drawn: int = 0
+    triangles: int = 0  # Submitted, after the LOD selection
+
+
+def extract_frustum_planes(view: glm.mat4x4, proj: glm.mat4x4) -> np.ndarray:
+    """Returns the 6 normalized frustum planes (a, b, c, d) as a (6, 4) array.
+
+    Points inside the frustum satisfy a*x + b*y + c*z + d >= 0 for all planes.
+    """
+    # Converting a glm matrix to numpy yields it in row (math) order, m[i] is row i:
+    m = np.array(proj * view, dtype=np.float32)
+
+    planes = np.array([
+        m[3] + m[0],  # Left
+        m[3] - m[0],  # Right
+        m[3] + m[1],  # Bottom
+        m[3] - m[1],  # Top
+        m[3] + m[2],  # Near
+        m[3] - m[2],  # Far
+    ], dtype=np.float32)
+
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def cull_spheres(planes: np.ndarray, centers: np.ndarray, radii: np.ndarray) -> np.ndarray:
+    """Returns a boolean mask of the spheres that are (partially) inside the frustum."""
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distances >= -radii[:, None], axis=1)
@@ -0,0 +1,275 @@
+"""GPU-driven rendering: frustum culling in a compute shader and indirect draws.
+
+The model matrices and world space bounding spheres of all transform store
+rows live in a storage buffer, only rows that moved are uploaded. Every frame
+`cull.wgsl` tests all rows against the frustum and appends the visible ones to
+the list of their draw, counting them in the indirect arguments of the draw.
+There is one indirect draw per distinct mesh, so the CPU cost of a frame does
+not grow with the number of entities.
+"""
+import math
+import wgpu
+import numpy as np
+from .culling import extract_frustum_planes
+from .mesh import BindState
+from .resources import resources_of, CATEGORY_CULLING
+from .shader_preprocessor import ShaderPreprocessor
+
+# Shader variant of the draws (see shader.wgsl):
+DEFINES = (("GPU_DRIVEN", ""),)
+
+# Rows without a draw in the draw id buffer (see cull.wgsl):
+NO_DRAW = 0xFFFFFFFF
+
+WORKGROUP_SIZE = 64
+
+INSTANCE_FLOATS = 16 + 4  # Model matrix + bounding sphere, see instances.wgsl
+ARGS_SIZE = 5 * 4  # draw_indexed_indirect arguments
+PARAMS_SIZE = 6 * 16 + 16  # 6 planes + count, padded to 16 bytes
+
+
+class GpuCuller:
+    """Culls the rows of one scene on the GPU and draws them with indirect draws.
+
+    Call `update` and `dispatch` before the render pass and `draw` inside it.
+    The draws (one per mesh) are rebuilt whenever entities are added or change
+    their mesh. `read_visible` reads the result back, for tests and debugging.
+    """
+    def __init__(self, device: wgpu.GPUDevice, arena=None, preprocessor: ShaderPreprocessor | None = None) -> None:
+        self.device = device
+        self.arena = arena  # Defragmenting the arena moves meshes, their draws are rebuilt then
+
+        # The range of every draw in the visible list is bound with a dynamic
+        # offset, so it starts at a multiple of this many rows:
+        self.draw_alignment = device.limits["min-storage-buffer-offset-alignment"] // 4
+
+        preprocessor = preprocessor or ShaderPreprocessor()
+        module = device.create_shader_module(label="SHADER_CULL", code=preprocessor.process("cull.wgsl"))
+        self.pipeline = device.create_compute_pipeline(
+            label="CULL_PIPELINE",
+            layout=wgpu.AutoLayoutMode.auto,
+            compute=wgpu.ProgrammableStage(module=module, entry_point="cs_main"),
+        )
+        self.draw_layout = self._create_draw_layout()
+        self.params = resources_of(device).track(
+            device.create_buffer(label="CULL_PARAMS_BUFFER", size=PARAMS_SIZE,
+                                 usage=wgpu.BufferUsage.UNIFORM | wgpu.BufferUsage.COPY_DST),
+            CATEGORY_CULLING, self)
+
+        # Rows of the transform store, the CPU copy is packed like the buffer:
+        self.capacity = 0
+        self.instance_data = np.zeros((0, INSTANCE_FLOATS), dtype=np.float32)
+        self.instances: wgpu.GPUBuffer = None
+        self.draw_ids: wgpu.GPUBuffer = None  # Per row, NO_DRAW or the index into `meshes`
+        self._version = -1  # Transform store version of the last upload, -1 uploads everything
+
+        # One draw per mesh:
+        self.meshes: list = []
+        self.args = np.zeros((0, 5), dtype=np.uint32)  # Indirect arguments with instance_count = 0
+        self.bases = np.zeros(0, dtype=np.uint32)  # First slot of every draw in the visible list
+        self.draw_args: wgpu.GPUBuffer = None
+        self.draw_bases: wgpu.GPUBuffer = None
+        self.visible: wgpu.GPUBuffer = None
+        self._offsets: list[int] = []  # Dynamic offsets of the draws
+        self._signature = None
+
+        self.cull_bind_group: wgpu.GPUBindGroup = None
+        self.draw_bind_group: wgpu.GPUBindGroup = None
+        self.count = 0  # Rows tested by the next dispatch
+
+    def update(self, scene, transforms, culling: bool = True) -> None:
+        """Uploads the moved rows, the draws (if they changed) and the frustum."""
+        transforms.update_matrices()
+        if transforms.capacity > self.capacity:
+            self._resize(transforms.capacity)
+        self._upload_instances(transforms)
+
+        signature = (id(scene), scene.version, transforms.mesh_version, self.capacity,
+                     self.arena.generation if self.arena else 0)
+        if signature != self._signature:
+            self._build_draws(scene, transforms)
+            self._signature = signature
+
+        camera = scene.camera
+        if culling:
+            planes = extract_frustum_planes(camera.get_view_matrix(), camera.get_projection_matrix())
+        else:
+            # Planes every sphere is in front of:
+            planes = np.zeros((6, 4), dtype=np.float32)
+            planes[:, 3] = 1.0
+
+        self.count = transforms.count
+        params = planes.tobytes() + np.array([self.count, 0, 0, 0], dtype=np.uint32).tobytes()
+        self.device.queue.write_buffer(self.params, 0, params)
+
+        # The compute pass counts the instances from zero again:
+        if self.meshes:
+            self.device.queue.write_buffer(self.draw_args, 0, self.args.tobytes())
+
+    def dispatch(self, command_encoder: wgpu.GPUCommandEncoder) -> None:
+        """Records the culling compute pass, has to run before the render pass."""
+        if self.count == 0 or not self.meshes:
+            return
+
+        compute_pass = command_encoder.begin_compute_pass(label="CULL_PASS")
+        compute_pass.set_pipeline(self.pipeline)
+        compute_pass.set_bind_group(0, self.cull_bind_group)
+        compute_pass.dispatch_workgroups(math.ceil(self.count / WORKGROUP_SIZE))
+        compute_pass.end()
+
+    def draw(self, render_pass: wgpu.GPURenderPassEncoder, camera, get_pipeline) -> None:
+        """Records one indirect draw per mesh. `get_pipeline(layout)` returns the
+        GPU-driven pipeline of a vertex layout, or None to skip its draws."""
+        if not self.meshes:
+            return
+
+        render_pass.set_bind_group(0, camera.bind_group, [], 0, 99)
+
+        pipeline = None
+        state = BindState()
+        for draw, mesh in enumerate(self.meshes):
+            draw_pipeline = get_pipeline(mesh.layout)
+            if draw_pipeline is None:
+                continue
+            if draw_pipeline is not pipeline:
+                pipeline = draw_pipeline
+                render_pass.set_pipeline(pipeline)
+            render_pass.set_bind_group(1, self.draw_bind_group, [self._offsets[draw]], 0, 1)
+            mesh.draw_indirect(render_pass, self.draw_args, draw * ARGS_SIZE, state)
+
+    def read_visible(self) -> np.ndarray:
+        """The (sorted) rows drawn by the last submitted frame, waits for the GPU."""
+        if not self.meshes:
+            return np.zeros(0, dtype=np.int64)
+
+        queue = self.device.queue
+        args = np.frombuffer(queue.read_buffer(self.draw_args), dtype=np.uint32).reshape(-1, 5)
+        visible = np.frombuffer(queue.read_buffer(self.visible), dtype=np.uint32)
+        rows = [visible[base:base + count] for base, count in zip(self.bases.tolist(), args[:, 1].tolist())]
+        return np.sort(np.concatenate(rows)).astype(np.int64)
+
+    def _upload_instances(self, transforms) -> None:
+        count = transforms.count
+        if self._version < 0:
+            start, end = 0, count
+        elif transforms.version != self._version:
+            changed = np.flatnonzero(transforms.row_versions[:count] > self._version)
+            start, end = (int(changed[0]), int(changed[-1]) + 1) if len(changed) else (0, 0)
+        else:
+            return
+
+        self._version = transforms.version
+        if start == end:
+            return
+
+        data = self.instance_data
+        data[start:end, :16] = transforms.matrices[start:end].reshape(-1, 16)
+        data[start:end, 16:19] = transforms.world_centers[start:end]
+        data[start:end, 19] = transforms.world_radii[start:end]
+        self.device.queue.write_buffer(self.instances, start * data.itemsize * INSTANCE_FLOATS,
+                                       data[start:end].tobytes())
+
+    def _build_draws(self, scene, transforms) -> None:
+        rows = scene.rows
+        ids = np.flatnonzero(transforms.drawable[rows])
+
+        # One draw per distinct mesh:
+        draw_of_mesh: dict[int, int] = {}
+        meshes = []
+        mesh_draws = np.empty(len(ids), dtype=np.int64)
+        for n, i in enumerate(ids.tolist()):
+            mesh = scene.entities[i].mesh
+            draw = draw_of_mesh.get(id(mesh))
+            if draw is None:
+                draw = draw_of_mesh[id(mesh)] = len(meshes)
+                meshes.append(mesh)
+            mesh_draws[n] = draw
+
+        # Group the draws by vertex layout, so the pipeline changes as rarely as possible:
+        order = sorted(range(len(meshes)), key=lambda draw: meshes[draw].layout.name)
+        remap = np.empty(len(meshes), dtype=np.int64)
+        remap[order] = np.arange(len(meshes))
+        self.meshes = [meshes[draw] for draw in order]
+        mesh_draws = remap[mesh_draws]
+
+        draw_ids = np.full(self.capacity, NO_DRAW, dtype=np.uint32)
+        draw_ids[rows[ids]] = mesh_draws
+        self.device.queue.write_buffer(self.draw_ids, 0, draw_ids.tobytes())
+        if not self.meshes:
+            return
+
+        # Every draw gets room for all of its rows in the visible list:
+        counts = np.bincount(mesh_draws, minlength=len(self.meshes))
+        alignment = self.draw_alignment
+        capacities = (counts + alignment - 1) // alignment * alignment
+        self.bases = np.concatenate([[0], np.cumsum(capacities)[:-1]]).astype(np.uint32)
+        self._offsets = (self.bases.astype(np.int64) * 4).tolist()
+        self.args = np.array([mesh.indirect_args() for mesh in self.meshes], dtype=np.uint32)
+
+        # The bound range of the last draw reaches `largest` rows past its base:
+        largest = int(capacities.max())
+        storage = wgpu.BufferUsage.STORAGE | wgpu.BufferUsage.COPY_DST | wgpu.BufferUsage.COPY_SRC
+        self.draw_args = self._replace(self.draw_args, "DRAW_ARGS_BUFFER", self.args.nbytes,
+                                       storage | wgpu.BufferUsage.INDIRECT)
+        self.draw_bases = self._replace(self.draw_bases, "DRAW_BASES_BUFFER", self.bases.nbytes, storage)
+        self.visible = self._replace(self.visible, "VISIBLE_BUFFER", (int(capacities.sum()) + largest) * 4, storage)
+        self.device.queue.write_buffer(self.draw_bases, 0, self.bases.tobytes())
+
+        self.cull_bind_group = self.device.create_bind_group(
+            label="CULL_BIND_GROUP",
+            layout=self.pipeline.get_bind_group_layout(0),
+            entries=[
+                wgpu.BindGroupEntry(binding=0, resource=wgpu.BufferBinding(buffer=self.params)),
+                wgpu.BindGroupEntry(binding=1, resource=wgpu.BufferBinding(buffer=self.instances)),
+                wgpu.BindGroupEntry(binding=2, resource=wgpu.BufferBinding(buffer=self.draw_ids)),
+                wgpu.BindGroupEntry(binding=3, resource=wgpu.BufferBinding(buffer=self.draw_bases)),
+                wgpu.BindGroupEntry(binding=4, resource=wgpu.BufferBinding(buffer=self.draw_args)),
+                wgpu.BindGroupEntry(binding=5, resource=wgpu.BufferBinding(buffer=self.visible)),
+            ],
+        )
+        self.draw_bind_group = self.device.create_bind_group(
+            label="GPU_DRIVEN_BIND_GROUP",
+            layout=self.draw_layout,
+            entries=[
+                wgpu.BindGroupEntry(binding=0, resource=wgpu.BufferBinding(buffer=self.instances)),
+                wgpu.BindGroupEntry(binding=1, resource=wgpu.BufferBinding(buffer=self.visible, offset=0,
+                                                                         size=largest * 4)),
+            ],
+        )
+
+    def _resize(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.instance_data = np.zeros((capacity, INSTANCE_FLOATS), dtype=np.float32)
+        storage = wgpu.BufferUsage.STORAGE | wgpu.BufferUsage.COPY_DST
+        self.instances = self._replace(self.instances, "INSTANCE_STORAGE_BUFFER", self.instance_data.nbytes, storage)
+        self.draw_ids = self._replace(self.draw_ids, "DRAW_IDS_BUFFER", capacity * 4, storage)
+        self._version = -1
+
+    def _replace(self, buffer: wgpu.GPUBuffer | None, label: str, size: int, usage: int) -> wgpu.GPUBuffer:
+        """`buffer`, or a new buffer if it is too small."""
+        resources = resources_of(self.device)
+        if buffer is not None:
+            if buffer.size >= size:
+                return buffer
+            resources.release_later(buffer)
+        return resources.track(self.device.create_buffer(label=label, size=size, usage=usage), CATEGORY_CULLING, self)
+
+    def _create_draw_layout(self) -> wgpu.GPUBindGroupLayout:
+        return self.device.create_bind_group_layout(
+            label="GPU_DRIVEN_BIND_GROUP_LAYOUT",
+            entries=[
+                wgpu.BindGroupLayoutEntry(
+                    binding=0,
+                    visibility=wgpu.ShaderStage.VERTEX,
+                    buffer=wgpu.BufferBindingLayout(type=wgpu.BufferBindingType.read_only_storage),
+                ),
+                wgpu.BindGroupLayoutEntry(
+                    binding=1,
+                    visibility=wgpu.ShaderStage.VERTEX,
+                    buffer=wgpu.BufferBindingLayout(
+                        type=wgpu.BufferBindingType.read_only_storage,
+                        has_dynamic_offset=True,
+                    ),
+                ),
+            ],
+        )
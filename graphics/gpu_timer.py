@@ -0,0 +1,117 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import wgpu
+import numpy as np
+from .resources import resources_of, CATEGORY_PROFILING
+
+TIMESTAMP_FEATURE = "timestamp-query"
+
+
+class GpuTimer:
+    """Measures the GPU time of render passes with timestamp queries.
+
+    Every frame in flight has its own query set and readback buffer. The
+    readback buffer is mapped asynchronously after submitting and read when its
+    slot comes around again; if the mapping is not done by then, that frame is
+    not timed instead of stalling. Without the timestamp-query feature
+    `supported` is False and the timer does nothing.
+    """
+    def __init__(self, device: wgpu.GPUDevice, frames_in_flight: int = 3, max_passes: int = 8) -> None:
+        self.device = device
+        self.supported = TIMESTAMP_FEATURE in device.features
+        self.frames_in_flight = frames_in_flight
+        self.max_passes = max_passes
+        self.slot = 0
+
+        # Per slot: pass names and the profiler frame they belong to (None if unused)
+        self.pass_names: list[list[str]] = [[] for _ in range(frames_in_flight)]
+        self.frame_indices: list[int | None] = [None] * frames_in_flight
+
+        if not self.supported:
+            return
+
+        # Waits for the readback mappings, None once read:
+        self._waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="GPU_TIMER")
+        self._mappings: list[Future | None] = [None] * frames_in_flight
+
+        size = max_passes * 2 * 8  # Begin and end timestamp per pass, 64 bit each
+        resources = resources_of(device)
+        self.query_sets = [
+            device.create_query_set(label="TIMESTAMP_QUERY_SET", type=wgpu.QueryType.timestamp, count=max_passes * 2)
+            for _ in range(frames_in_flight)
+        ]
+        self.resolve_buffers = [
+            resources.track(device.create_buffer(label="TIMESTAMP_RESOLVE_BUFFER", size=size,
+                                                 usage=wgpu.BufferUsage.QUERY_RESOLVE | wgpu.BufferUsage.COPY_SRC),
+                            CATEGORY_PROFILING, self)
+            for _ in range(frames_in_flight)
+        ]
+        self.readback_buffers = [
+            resources.track(device.create_buffer(label="TIMESTAMP_READBACK_BUFFER", size=size,
+                                                 usage=wgpu.BufferUsage.MAP_READ | wgpu.BufferUsage.COPY_DST),
+                            CATEGORY_PROFILING, self)
+            for _ in range(frames_in_flight)
+        ]
+
+    def timestamp_writes(self, name: str) -> wgpu.RenderPassTimestampWrites | None:
+        """Pass this to begin_render_pass to time the pass."""
+        names = self.pass_names[self.slot]
+        if not self.supported or self._busy or len(names) >= self.max_passes:
+            return None
+
+        names.append(name)
+        index = (len(names) - 1) * 2
+        return wgpu.RenderPassTimestampWrites(
+            query_set=self.query_sets[self.slot],
+            beginning_of_pass_write_index=index,
+            end_of_pass_write_index=index + 1,
+        )
+
+    def resolve(self, command_encoder: wgpu.GPUCommandEncoder, frame_index: int) -> None:
+        """Records copying the timestamps of this frame into its readback buffer."""
+        names = self.pass_names[self.slot]
+        if not self.supported or self._busy or not names:
+            return
+
+        count = len(names) * 2
+        command_encoder.resolve_query_set(self.query_sets[self.slot], 0, count, self.resolve_buffers[self.slot], 0)
+        command_encoder.copy_buffer_to_buffer(self.resolve_buffers[self.slot], 0,
+                                              self.readback_buffers[self.slot], 0, count * 8)
+        self.frame_indices[self.slot] = frame_index
+
+    def advance(self) -> tuple[int, list[tuple[str, int, int]]] | None:
+        """Call after submitting. Returns (frame index, [(pass, start ns, end ns)])
+        of the oldest frame in flight, if it had timed passes and its readback
+        buffer is mapped already."""
+        if not self.supported:
+            return None
+
+        # Map the readback buffer of the submitted frame, on the waiter thread:
+        slot = self.slot
+        if self.frame_indices[slot] is not None and self._mappings[slot] is None:
+            mapping = self.readback_buffers[slot].map_async(wgpu.MapMode.READ, 0, len(self.pass_names[slot]) * 2 * 8)
+            self._mappings[slot] = self._waiter.submit(mapping.sync_wait)
+
+        self.slot = (slot + 1) % self.frames_in_flight
+        mapping = self._mappings[self.slot]
+        if mapping is None:
+            self.pass_names[self.slot] = []
+            return None
+        if not mapping.done():
+            return None
+        self._mappings[self.slot] = None
+        mapping.result()  # Raises if the mapping failed
+
+        names, frame_index = self.pass_names[self.slot], self.frame_indices[self.slot]
+        self.pass_names[self.slot] = []
+        self.frame_indices[self.slot] = None
+
+        buffer = self.readback_buffers[self.slot]
+        timestamps = np.frombuffer(buffer.read_mapped(0, len(names) * 2 * 8), dtype=np.uint64).tolist()
+        buffer.unmap()
+
+        return frame_index, [(name, timestamps[2 * i], timestamps[2 * i + 1]) for i, name in enumerate(names)]
+
+    @property
+    def _busy(self) -> bool:
+        # The readback buffer of the slot is still waiting to be mapped (and read):
+        return self._mappings[self.slot] is not None
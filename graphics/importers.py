@@ -0,0 +1,346 @@
+"""Importers for Wavefront OBJ and binary glTF 2.0 (.glb) files.
+
+Both return MeshData in one of the engine's vertex layouts (see mesh_format),
+ready for `Mesh(device, data.vertices, data.indices, data.layout, bounds=data.bounds)`.
+
+The layouts only hold positions and colors: vertex colors are used if the file
+has them, otherwise the normals are shown as colors (like the generated
+spheres), otherwise the mesh is white.
+"""
+import os
+import json
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .mesh import VertexLayout, STANDARD_LAYOUT, COMPACT_LAYOUT, compute_bounds
+from .mesh_format import MeshData, content_hash
+from .mesh_processing import compact_indices, pack_compact
+
+# OBJ files larger than this are parsed in chunks by a process pool:
+PARALLEL_BYTES = 32 * 1024 * 1024
+
+NEWLINE, SPACE, TAB, RETURN = b"\n"[0], b" "[0], b"\t"[0], b"\r"[0]
+
+# Keywords and separators are turned into spaces, np.fromstring parses the rest:
+_OBJ_TRANSLATION = bytes.maketrans(b"vnf/\r\t", b"      ")
+
+# Face corner formats: (values per corner, column of the normal index or None)
+_FACE_FORMATS = {
+    "v": (1, None),
+    "v/vt": (2, None),
+    "v//vn": (2, 1),
+    "v/vt/vn": (3, 2),
+}
+
+GLB_MAGIC = b"glTF"
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+GLTF_TRIANGLES = 4
+
+# glTF accessor component types and element types:
+GLTF_COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+GLTF_TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+
+
+@dataclass
+class _ObjChunk:
+    """Everything parsed from a range of lines of an OBJ file."""
+    positions: np.ndarray
+    colors: np.ndarray | None
+    normals: np.ndarray
+    corners: np.ndarray  # (corner count, values per corner), 1-based or negative
+    counts: np.ndarray  # Corners of every face
+    face_format: str | None
+
+
+def load_obj(path: str | Path, layout: VertexLayout = STANDARD_LAYOUT, processes: int | None = None) -> MeshData:
+    """Imports the geometry (v, vn and f lines) of an OBJ file, polygons are
+    triangulated as fans.
+
+    Files larger than PARALLEL_BYTES are split into chunks at line boundaries
+    and parsed by `processes` processes (default: one per core, 0 disables it).
+    Negative (relative) indices are only supported if all vertices come before
+    the faces.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if size < PARALLEL_BYTES or processes <= 1:
+        chunks = [_parse_obj_range(path, 0, size)]
+    else:
+        bounds = _line_aligned_bounds(path, size, processes)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunks = list(executor.map(_parse_obj_range, [path] * processes, bounds[:-1], bounds[1:]))
+
+    face_formats = {chunk.face_format for chunk in chunks} - {None}
+    if len(face_formats) > 1:
+        raise ValueError(f"{path}: mixed face formats {sorted(face_formats)}")
+    face_format = next(iter(face_formats), None)
+    has_colors = {chunk.colors is not None for chunk in chunks if len(chunk.positions)}
+    if len(has_colors) > 1:
+        raise ValueError(f"{path}: only some vertices have colors")
+
+    positions = np.concatenate([chunk.positions for chunk in chunks])
+    normals = np.concatenate([chunk.normals for chunk in chunks])
+    colors = np.concatenate([chunk.colors for chunk in chunks]) if has_colors == {True} else None
+    if not face_formats:
+        raise ValueError(f"{path}: no faces")
+    corners = np.concatenate([chunk.corners for chunk in chunks if chunk.face_format])
+    counts = np.concatenate([chunk.counts for chunk in chunks])
+
+    triangles = _triangulate(counts)
+    position_ids = _resolve_indices(corners[triangles, 0], len(positions), path)
+
+    normal_column = _FACE_FORMATS[face_format][1]
+    if colors is None and normal_column is not None and len(normals):
+        # Every distinct (position, normal) pair becomes a vertex:
+        normal_ids = _resolve_indices(corners[triangles, normal_column], len(normals), path)
+        vertex_ids, indices = np.unique(position_ids * len(normals) + normal_ids, return_inverse=True)
+        positions = positions[vertex_ids // len(normals)]
+        colors = normals[vertex_ids % len(normals)] * 0.5 + 0.5
+    else:
+        indices = position_ids
+        if colors is None:
+            colors = np.ones_like(positions)
+
+    return _mesh_data(positions, colors, indices, layout)
+
+
+def load_glb(path: str | Path, layout: VertexLayout = STANDARD_LAYOUT, mesh: int = 0) -> MeshData:
+    """Imports one mesh of a binary glTF file, all of its triangle primitives
+    are merged. Node transforms are not applied.
+
+    The file is memory mapped and the accessors are read as views into it, only
+    the final interleaving into the vertex layout copies the data.
+    """
+    path = Path(path)
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(data) < 20:
+        raise ValueError(f"{path} is not a binary glTF file")
+    magic, version, length = struct.unpack_from("<4sII", data)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError(f"{path} is not a binary glTF 2.0 file")
+
+    # The JSON chunk comes first, the (optional) binary chunk second:
+    gltf, binary = None, None
+    offset = 12
+    while offset + 8 <= min(length, len(data)):
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == GLB_JSON_CHUNK:
+            gltf = json.loads(chunk.tobytes())
+        elif chunk_type == GLB_BIN_CHUNK and binary is None:
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise ValueError(f"{path}: missing JSON chunk")
+
+    meshes = gltf.get("meshes", [])
+    if not 0 <= mesh < len(meshes):
+        raise ValueError(f"{path}: no mesh {mesh}, the file has {len(meshes)}")
+
+    positions, colors, indices = [], [], []
+    vertex_count = 0
+    for primitive in meshes[mesh]["primitives"]:
+        if primitive.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES:
+            raise ValueError(f"{path}: only triangle primitives are supported")
+        attributes = primitive["attributes"]
+        primitive_positions = _read_accessor(gltf, binary, attributes["POSITION"], path)
+
+        if "COLOR_0" in attributes:
+            primitive_colors = _read_accessor(gltf, binary, attributes["COLOR_0"], path)[:, :3]
+        elif "NORMAL" in attributes:
+            primitive_colors = _read_accessor(gltf, binary, attributes["NORMAL"], path) * 0.5 + 0.5
+        else:
+            primitive_colors = np.ones((len(primitive_positions), 3), dtype=np.float32)
+
+        if "indices" in primitive:
+            primitive_indices = _read_accessor(gltf, binary, primitive["indices"], path).ravel()
+        else:
+            primitive_indices = np.arange(len(primitive_positions))
+
+        positions.append(primitive_positions)
+        colors.append(primitive_colors)
+        indices.append(primitive_indices.astype(np.int64) + vertex_count)
+        vertex_count += len(primitive_positions)
+
+    return _mesh_data(np.concatenate(positions), np.concatenate(colors), np.concatenate(indices), layout)
+
+
+def _mesh_data(positions: np.ndarray, colors: np.ndarray, indices: np.ndarray, layout: VertexLayout) -> MeshData:
+    vertices = np.empty(len(positions), dtype=STANDARD_LAYOUT.dtype)
+    vertices["position"] = positions
+    vertices["color"] = colors
+    if layout is COMPACT_LAYOUT:
+        vertices = pack_compact(vertices)
+    elif layout is not STANDARD_LAYOUT:
+        raise ValueError(f"meshes can't be imported into the {layout.name} layout")
+
+    indices = compact_indices(indices, len(vertices))
+    return MeshData(
+        vertices=vertices,
+        indices=indices,
+        index_count=len(indices),
+        layout=layout,
+        bounds=compute_bounds(vertices["position"]),
+        content_hash=content_hash(vertices, indices, layout),
+    )
+
+
+def _line_aligned_bounds(path: Path, size: int, count: int) -> list[int]:
+    """Splits the file into `count` byte ranges, every range ends after a newline."""
+    bounds = [0]
+    with open(path, "rb") as file:
+        for i in range(1, count):
+            file.seek(max(size * i // count, bounds[-1]))
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return bounds
+
+
+def _parse_obj_range(path: Path, start: int, end: int) -> _ObjChunk:
+    # Runs in a worker process for large files:
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = np.frombuffer(file.read(end - start), dtype=np.uint8)
+    if len(data) == 0 or data[-1] != NEWLINE:
+        data = np.append(data, np.uint8(NEWLINE))
+
+    ends = np.flatnonzero(data == NEWLINE) + 1
+    starts = np.concatenate([[0], ends[:-1]])
+    first = data[starts]
+    second = data[np.minimum(starts + 1, len(data) - 1)]
+    blank = (second == SPACE) | (second == TAB)
+
+    # Positions, with optional w (ignored) or r g b:
+    vertex_lines = (first == b"v"[0]) & blank
+    values = _parse_lines(data, starts, ends, vertex_lines, np.float32)
+    line_count = np.count_nonzero(vertex_lines)
+    width = len(values) // line_count if line_count else 3
+    if width not in (3, 4, 6) or width * line_count != len(values):
+        raise ValueError(f"{path}: vertices need 3, 4 or 6 values and all the same")
+    values = values.reshape(-1, width)
+    positions = values[:, :3]
+    colors = values[:, 3:6] if width == 6 else None
+
+    normal_lines = (first == b"v"[0]) & (second == b"n"[0])
+    normals = _parse_lines(data, starts, ends, normal_lines, np.float32).reshape(-1, 3)
+
+    face_lines = (first == b"f"[0]) & blank
+    face_format, counts, corners = None, np.zeros(0, dtype=np.int64), np.zeros((0, 1), dtype=np.int64)
+    if np.any(face_lines):
+        face_format = _face_format(data, starts, ends, np.flatnonzero(face_lines)[0])
+        width = _FACE_FORMATS[face_format][0]
+        corners = _parse_lines(data, starts, ends, face_lines, np.int64)
+        line_count = np.count_nonzero(face_lines)
+        if len(corners) == 3 * width * line_count:
+            # Faces have at least 3 corners, so these are all triangles:
+            counts = np.full(line_count, 3)
+        else:
+            counts = _count_tokens(_select_lines(data, starts, ends, face_lines))
+        if len(corners) != counts.sum() * width:
+            raise ValueError(f"{path}: all faces need the same {face_format} format")
+        corners = corners.reshape(-1, width)
+
+    return _ObjChunk(positions, colors, normals, corners, counts, face_format)
+
+
+def _select_lines(data: np.ndarray, starts: np.ndarray, ends: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """The bytes of all lines in `mask`. Consecutive lines are copied as one range,
+    OBJ files usually have few runs of each kind of line."""
+    lines = np.flatnonzero(mask)
+    if len(lines) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    breaks = np.flatnonzero(np.diff(lines) != 1) + 1
+    run_starts = starts[lines[np.concatenate([[0], breaks])]]
+    run_ends = ends[lines[np.concatenate([breaks - 1, [len(lines) - 1]])]]
+    return np.concatenate([data[start:end] for start, end in zip(run_starts.tolist(), run_ends.tolist())])
+
+
+def _parse_lines(data: np.ndarray, starts: np.ndarray, ends: np.ndarray, mask: np.ndarray, dtype) -> np.ndarray:
+    text = _select_lines(data, starts, ends, mask).tobytes().translate(_OBJ_TRANSLATION)
+    return np.fromstring(text, dtype=dtype, sep=" ") if text.strip() else np.zeros(0, dtype=dtype)
+
+
+def _count_tokens(lines: np.ndarray) -> np.ndarray:
+    """Number of whitespace separated tokens after the keyword, per line."""
+    separator = (lines == SPACE) | (lines == TAB) | (lines == NEWLINE) | (lines == RETURN)
+    token_starts = np.flatnonzero(~separator & np.concatenate([[True], separator[:-1]]))
+    newlines = np.flatnonzero(lines == NEWLINE)
+    # Minus one for the keyword itself:
+    return np.bincount(np.searchsorted(newlines, token_starts), minlength=len(newlines)) - 1
+
+
+def _face_format(data: np.ndarray, starts: np.ndarray, ends: np.ndarray, line: int) -> str:
+    tokens = data[starts[line]:ends[line]].tobytes().split()
+    if len(tokens) < 2:
+        return "v"
+    corner = tokens[1]
+    if b"//" in corner:
+        return "v//vn"
+    return {0: "v", 1: "v/vt", 2: "v/vt/vn"}[min(corner.count(b"/"), 2)]
+
+
+def _triangulate(counts: np.ndarray) -> np.ndarray:
+    """Fan triangulation, returns 3 corner indices per triangle."""
+    offsets = np.cumsum(counts) - counts
+    triangle_counts = np.maximum(counts - 2, 0)
+    if np.all(counts == 3):
+        return np.arange(3 * len(counts))
+
+    faces = np.repeat(np.arange(len(counts)), triangle_counts)
+    first_triangles = np.cumsum(triangle_counts) - triangle_counts
+    fan = np.arange(len(faces)) - first_triangles[faces] + 1
+    base = offsets[faces]
+    return np.stack([base, base + fan, base + fan + 1], axis=-1).ravel()
+
+
+def _resolve_indices(indices: np.ndarray, count: int, path: Path) -> np.ndarray:
+    """1-based (or negative, relative to the end) OBJ indices to 0-based ones."""
+    indices = np.where(indices < 0, indices + count, indices - 1)
+    if len(indices) and (indices.min() < 0 or indices.max() >= count):
+        raise ValueError(f"{path}: face index out of range")
+    return indices
+
+
+def _read_accessor(gltf: dict, binary: np.ndarray | None, index: int, path: Path) -> np.ndarray:
+    """An accessor as a (count, components) array, a view into the file where possible."""
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor:
+        raise ValueError(f"{path}: sparse accessors are not supported")
+
+    dtype = np.dtype(GLTF_COMPONENT_TYPES[accessor["componentType"]])
+    components = GLTF_TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, components), dtype=dtype)
+
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    if view["buffer"] != 0 or binary is None:
+        raise ValueError(f"{path}: only the embedded binary buffer is supported")
+
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or components * dtype.itemsize
+    end = offset + stride * (count - 1) + components * dtype.itemsize if count else offset
+    if end > view.get("byteOffset", 0) + view["byteLength"] or end > len(binary):
+        raise ValueError(f"{path}: accessor {index} is out of bounds")
+
+    # Interleaved or not, the accessor is a strided view into the memory map:
+    values = np.ndarray((count, components), dtype=dtype, buffer=binary, offset=offset,
+                        strides=(stride, dtype.itemsize))
+
+    if accessor.get("normalized") and dtype.kind in "iu":
+        values = np.maximum(values / np.float32(np.iinfo(dtype).max), -1.0).astype(np.float32)
+    return values
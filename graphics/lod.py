@@ -0,0 +1,285 @@
+"""Level of detail: quadric error simplification and per-frame LOD selection.
+
+`generate_lods` builds a chain of simplified versions of a mesh offline,
+`create_lod_meshes` uploads them and stores them in `Mesh.lods`. Every frame
+the renderer picks a level per entity from the screen-space size of its
+bounding sphere with `LodSelector`.
+"""
+import math
+import logging
+import wgpu
+import numpy as np
+from .mesh import Mesh, VertexLayout, STANDARD_LAYOUT, vertex_positions
+
+logger = logging.getLogger(__name__)
+
+# Triangle count of every level, relative to the full resolution mesh:
+LOD_RATIOS = (0.5, 0.25, 0.125)
+
+# A level is switched to once the bounding sphere covers less than this
+# fraction of the screen height, one threshold per level:
+LOD_THRESHOLDS = (0.25, 0.1, 0.04)
+
+# A level that removed less than this fraction of the triangles it was asked
+# to got stuck (e.g. every remaining collapse would flip a triangle), the chain
+# ends before it:
+MIN_PROGRESS = 0.5
+
+# Boundary edges are kept in place by planes this much heavier than the faces:
+BOUNDARY_WEIGHT = 100.0
+
+# Collapses may turn the normal of a triangle by at most ~75 degrees:
+MIN_NORMAL_COSINE = 0.25
+
+# Upper triangle of the symmetric 4x4 quadric, row-major:
+_UPPER = [(i, j) for i in range(4) for j in range(i, 4)]
+
+
+def _plane_quadrics(normals: np.ndarray, points: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """(N, 10) upper triangles of the quadrics weight * p p^T of the planes (n, -n.p)."""
+    planes = np.concatenate([normals, -np.einsum("ij,ij->i", normals, points)[:, None]], axis=1)
+    return np.stack([planes[:, i] * planes[:, j] for i, j in _UPPER], axis=1) * weights[:, None]
+
+
+def _quadric_errors(quadrics: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """v^T Q v of the homogeneous points (x, y, z, 1)."""
+    homogeneous = np.concatenate([points, np.ones((len(points), 1))], axis=1)
+    errors = np.zeros(len(points))
+    for k, (i, j) in enumerate(_UPPER):
+        factor = 1.0 if i == j else 2.0
+        errors += factor * quadrics[:, k] * homogeneous[:, i] * homogeneous[:, j]
+    return errors
+
+
+def _vertex_quadrics(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    corners = positions[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0.0
+    normals[valid] /= areas[valid, None]
+
+    # Area weighted face planes, summed up per vertex:
+    face_quadrics = _plane_quadrics(normals, corners[:, 0], areas * 0.5)
+    quadrics = np.zeros((len(positions), 10))
+    for corner in range(3):
+        for k in range(10):
+            quadrics[:, k] += np.bincount(triangles[:, corner], weights=face_quadrics[:, k],
+                                          minlength=len(positions))
+
+    # Boundary edges (used by one triangle) get a plane perpendicular to their face:
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    faces = np.tile(np.arange(len(triangles)), 3)
+    keys = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(keys[:, 0] * len(positions) + keys[:, 1],
+                                   return_inverse=True, return_counts=True)
+    boundary = counts[inverse.ravel()] == 1
+    if np.any(boundary):
+        edges, faces = edges[boundary], faces[boundary]
+        directions = positions[edges[:, 1]] - positions[edges[:, 0]]
+        lengths_sq = np.einsum("ij,ij->i", directions, directions)
+        boundary_normals = np.cross(directions, normals[faces])
+        norms = np.linalg.norm(boundary_normals, axis=1)
+        valid = norms > 0.0
+        boundary_normals[valid] /= norms[valid, None]
+        edge_quadrics = _plane_quadrics(boundary_normals, positions[edges[:, 0]], BOUNDARY_WEIGHT * lengths_sq)
+        for end in range(2):
+            for k in range(10):
+                quadrics[:, k] += np.bincount(edges[:, end], weights=edge_quadrics[:, k],
+                                              minlength=len(positions))
+    return quadrics
+
+
+def simplify(vertices: np.ndarray, indices: np.ndarray, target_triangles: int) -> tuple[np.ndarray, np.ndarray]:
+    """Quadric error edge collapse (Garland & Heckbert) down to about `target_triangles`.
+
+    Every pass collapses an independent set of the cheapest edges at once (no
+    two share a vertex), collapses that would flip a triangle are rejected.
+    Equal costs (e.g. 0 on flat regions) are ordered randomly, so neighbouring
+    edges don't block each other in the order of their vertex indices.
+    Vertices are only ever moved onto one of the edge endpoints, so their
+    attributes are kept as they are. Works for plain and structured vertices.
+    """
+    positions = vertex_positions(vertices).astype(np.float64)
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    vertex_count = len(positions)
+    quadrics = _vertex_quadrics(positions, triangles)
+    rng = np.random.default_rng(0)  # Tie breaks, seeded so results are reproducible
+
+    while len(triangles) > target_triangles:
+        # Unique edges and the cost of collapsing them onto the better endpoint:
+        edges = np.sort(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]]), axis=1)
+        edges = np.unique(edges[:, 0] * vertex_count + edges[:, 1])
+        a, b = edges // vertex_count, edges % vertex_count
+        combined = quadrics[a] + quadrics[b]
+        error_a, error_b = _quadric_errors(combined, positions[a]), _quadric_errors(combined, positions[b])
+        keep = np.where(error_a <= error_b, a, b)
+        remove = np.where(error_a <= error_b, b, a)
+        cost = np.minimum(error_a, error_b)
+
+        # An interior collapse removes two triangles, only look at the cheapest candidates:
+        needed = max((len(triangles) - target_triangles + 1) // 2, 1)
+        order = np.lexsort((rng.random(len(edges)), cost))[:max(needed, len(edges) // 8)]
+        selected = _greedy_independent_edges(order, a, b, vertex_count, needed)
+
+        while True:
+            remap = np.arange(vertex_count)
+            remap[remove[selected]] = keep[selected]
+            flipped = _flipped_triangles(positions, triangles, remap)
+            if not np.any(flipped):
+                break
+            # Reject every collapse that moved a corner of a flipped triangle, that
+            # can flip triangles of neighbouring collapses, so check again:
+            rejected = np.zeros(vertex_count, dtype=bool)
+            rejected[triangles[flipped].ravel()] = True
+            selected = selected[~rejected[remove[selected]]]
+        if len(selected) == 0:
+            break
+
+        np.add.at(quadrics, keep[selected], quadrics[remove[selected]])
+        triangles = remap[triangles]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1]) &
+                              (triangles[:, 1] != triangles[:, 2]) &
+                              (triangles[:, 2] != triangles[:, 0])]
+
+    # Drop the vertices that are no longer used:
+    used, new_indices = np.unique(triangles, return_inverse=True)
+    return vertices[used], new_indices.reshape(-1).astype(np.uint32)
+
+
+def _greedy_independent_edges(order: np.ndarray, a: np.ndarray, b: np.ndarray,
+                              vertex_count: int, needed: int) -> np.ndarray:
+    """Walks `order` and takes every edge whose vertices are both unclaimed, up
+    to `needed` edges (in order). Each round takes the edges that come first at
+    both of their vertices, which is the same set a sequential walk takes, in
+    few rounds since the order of equal costs is random."""
+    rank = np.full(len(a), np.iinfo(np.int64).max)
+    rank[order] = np.arange(len(order))
+    claimed = np.zeros(vertex_count, dtype=bool)
+    selected = []
+    count = 0
+    candidates = order
+    while len(candidates) and count < needed:
+        vertex_rank = np.full(vertex_count, np.iinfo(np.int64).max)
+        np.minimum.at(vertex_rank, a[candidates], rank[candidates])
+        np.minimum.at(vertex_rank, b[candidates], rank[candidates])
+        first = candidates[(vertex_rank[a[candidates]] == rank[candidates]) &
+                           (vertex_rank[b[candidates]] == rank[candidates])]
+        claimed[a[first]] = True
+        claimed[b[first]] = True
+        selected.append(first)
+        count += len(first)
+        candidates = candidates[~claimed[a[candidates]] & ~claimed[b[candidates]]]
+
+    selected = np.concatenate(selected) if selected else order[:0]
+    return selected[np.argsort(rank[selected])][:needed]
+
+
+def _flipped_triangles(positions: np.ndarray, triangles: np.ndarray, remap: np.ndarray) -> np.ndarray:
+    """Triangles whose normal turns (almost) around with `remap`, ignoring the
+    ones that collapse."""
+    moved = triangles != remap[triangles]
+    candidates = np.flatnonzero(np.any(moved, axis=1))
+    flipped = np.zeros(len(triangles), dtype=bool)
+    if len(candidates) == 0:
+        return flipped
+
+    old = positions[triangles[candidates]]
+    new_triangles = remap[triangles[candidates]]
+    new = positions[new_triangles]
+    old_normals = np.cross(old[:, 1] - old[:, 0], old[:, 2] - old[:, 0])
+    new_normals = np.cross(new[:, 1] - new[:, 0], new[:, 2] - new[:, 0])
+
+    degenerate = ((new_triangles[:, 0] == new_triangles[:, 1]) | (new_triangles[:, 1] == new_triangles[:, 2]) |
+                  (new_triangles[:, 2] == new_triangles[:, 0]))
+    # Nearly flipped counts as well, otherwise passes can turn a triangle around bit by bit:
+    lengths = np.linalg.norm(old_normals, axis=1) * np.linalg.norm(new_normals, axis=1)
+    cosines = np.einsum("ij,ij->i", old_normals, new_normals)
+    flipped[candidates] = ~degenerate & (cosines <= MIN_NORMAL_COSINE * lengths)
+    return flipped
+
+
+def generate_lods(vertices: np.ndarray,
+                  indices: np.ndarray,
+                  ratios: tuple[float, ...] = LOD_RATIOS,
+                  min_triangles: int = 8) -> list[tuple[np.ndarray, np.ndarray]]:
+    """The LOD chain (vertices, indices) of a mesh, finest first. Every level is
+    simplified from the previous one. The chain ends early once a level can't
+    be simplified any further or the simplification stalls far above its target."""
+    base_triangles = len(indices) // 3
+    lods = []
+    for ratio in ratios:
+        target = max(int(base_triangles * ratio), min_triangles)
+        previous = len(indices) // 3
+        if target >= previous:
+            break
+
+        simplified_vertices, simplified_indices = simplify(vertices, indices, target)
+        triangles = len(simplified_indices) // 3
+        if (previous - triangles) / (previous - target) < MIN_PROGRESS:
+            logger.info("LOD chain ends after %d levels: simplification stalled at %d triangles "
+                        "(target %d, previous level %d)", len(lods), triangles, target, previous)
+            break
+        vertices, indices = simplified_vertices, simplified_indices
+        lods.append((vertices, indices))
+    return lods
+
+
+def create_lod_meshes(device: wgpu.GPUDevice,
+                      mesh: Mesh,
+                      vertices: np.ndarray,
+                      indices: np.ndarray,
+                      layout: VertexLayout = STANDARD_LAYOUT,
+                      ratios: tuple[float, ...] = LOD_RATIOS,
+                      arena=None) -> list[Mesh]:
+    """Generates the LOD chain of `mesh` (created from `vertices` and `indices`)
+    and stores it in `mesh.lods`."""
+    mesh.lods = [Mesh(device, lod_vertices, lod_indices, layout, arena=arena)
+                 for lod_vertices, lod_indices in generate_lods(vertices, indices, ratios)]
+    return mesh.lods
+
+
+class LodSelector:
+    """Picks the LOD level of every transform store row.
+
+    The level follows the projected size of the bounding sphere (fraction of the
+    screen height), computed for all rows in one pass. A row only switches to a
+    coarser level once it is `hysteresis` below the threshold and back to a
+    finer one once it is `hysteresis` above it, so levels don't flicker.
+    """
+    def __init__(self, thresholds: tuple[float, ...] = LOD_THRESHOLDS, hysteresis: float = 0.15) -> None:
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.hysteresis = hysteresis
+        self.levels = np.zeros(0, dtype=np.int8)  # Per row, 0 is full resolution
+        self.generations = np.zeros(0, dtype=np.uint32)  # Of the rows the levels belong to
+        self.changed = False  # Did the last `select` change any level?
+
+    def screen_sizes(self, rows: np.ndarray, transforms, camera) -> np.ndarray:
+        offsets = transforms.world_centers[rows] - np.asarray(camera.position, dtype=np.float32)
+        distances = np.maximum(np.linalg.norm(offsets, axis=1), camera.clip_near)
+        # Diameter over the height of the view frustum at that distance:
+        return transforms.world_radii[rows] / (distances * math.tan(math.radians(camera.fovy) * 0.5))
+
+    def select(self, rows: np.ndarray, transforms, camera) -> np.ndarray:
+        """The levels of `rows`, levels beyond the LOD chain of a mesh have to be clamped."""
+        if len(self.levels) < transforms.capacity:
+            levels = np.zeros(transforms.capacity, dtype=np.int8)
+            levels[:len(self.levels)] = self.levels
+            self.levels = levels
+            generations = np.zeros(transforms.capacity, dtype=np.uint32)
+            generations[:len(self.generations)] = self.generations
+            self.generations = generations
+
+        # Recycled rows belong to another entity now, they start over:
+        recycled = rows[self.generations[rows] != transforms.generations[rows]]
+        self.levels[recycled] = 0
+        self.generations[recycled] = transforms.generations[recycled]
+
+        sizes = self.screen_sizes(rows, transforms, camera)[:, None]
+        coarsest = np.count_nonzero(sizes < self.thresholds * (1.0 - self.hysteresis), axis=1)
+        finest = np.count_nonzero(sizes < self.thresholds * (1.0 + self.hysteresis), axis=1)
+
+        current = self.levels[rows]
+        levels = np.clip(current, coarsest, finest).astype(np.int8)
+        self.changed = bool(np.any(levels != current))
+        self.levels[rows] = levels
+        return levels
@@ -1,5 +1,44 @@
+from pathlib import Path
 import wgpu
 import numpy as np
+from .resources import resources_of, CATEGORY_MESHES
+
+
+class VertexLayout:
+    """Describes how the vertices of a mesh are laid out in its vertex buffer."""
+    def __init__(self, name: str, dtype: np.dtype, formats: list[wgpu.VertexFormat]) -> None:
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.stride = self.dtype.itemsize
+        self.attributes = [
+            (vertex_format, self.dtype.fields[field][1], location)  # format, offset, shader location
+            for location, (field, vertex_format) in enumerate(zip(self.dtype.names, formats))
+        ]
+
+
+# Position + color as float32x3 (24 bytes):
+STANDARD_LAYOUT = VertexLayout(
+    "standard",
+    [("position", np.float32, 3), ("color", np.float32, 3)],
+    [wgpu.VertexFormat.float32x3, wgpu.VertexFormat.float32x3],
+)
+
+# Position as float32x3 + color as unorm8x4 (16 bytes):
+COMPACT_LAYOUT = VertexLayout(
+    "compact",
+    [("position", np.float32, 3), ("color", np.uint8, 4)],
+    [wgpu.VertexFormat.float32x3, wgpu.VertexFormat.unorm8x4],
+)
+
+
+LAYOUTS = {layout.name: layout for layout in (STANDARD_LAYOUT, COMPACT_LAYOUT)}
+
+
+def vertex_positions(vertices: np.ndarray) -> np.ndarray:
+    """Positions of plain (N, 6) float or structured vertex arrays."""
+    if vertices.dtype.names:
+        return vertices["position"]
+    return vertices[:, :3]
 
 
 def create_cube_data() -> tuple[np.ndarray, np.ndarray]:
@@ -53,23 +92,220 @@ def create_cube_data() -> tuple[np.ndarray, np.ndarray]:
     return vertices, indices
 
 
+def create_sphere_data(segments: int = 16) -> tuple[np.ndarray, np.ndarray]:
+    """UV sphere with radius 0.5, (segments + 1) * (2 * segments + 1) vertices."""
+    theta = np.linspace(0.0, np.pi, segments + 1, dtype=np.float32)
+    phi = np.linspace(0.0, 2.0 * np.pi, 2 * segments + 1, dtype=np.float32)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+
+    normals = np.stack([np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)], axis=-1)
+    vertices = np.concatenate([normals * 0.5, normals * 0.5 + 0.5], axis=-1).reshape(-1, 6)
+
+    # Two triangles per quad of the grid:
+    columns = 2 * segments + 1
+    row, column = np.meshgrid(np.arange(segments), np.arange(2 * segments), indexing="ij")
+    a = (row * columns + column).ravel()
+    b, c, d = a + columns, a + columns + 1, a + 1
+    indices = np.stack([a, d, c, c, b, a], axis=-1).ravel()  # Counter-clockwise from outside
+
+    return vertices.astype(np.float32), indices.astype(np.uint32)
+
+
+class BindState:
+    """Buffers currently bound to a render pass, to skip redundant rebinds."""
+    def __init__(self) -> None:
+        self.vertex_buffer: wgpu.GPUBuffer | None = None
+        self.index_buffer: wgpu.GPUBuffer | None = None
+
+
+class DedicatedAllocation:
+    """Vertex and index buffers owned by a single mesh."""
+    base_vertex = 0
+    first_index = 0
+
+    def __init__(self,
+                 device: wgpu.GPUDevice,
+                 vertices: np.ndarray,
+                 indices: np.ndarray | None,
+                 upload: bool = True) -> None:
+        self.device = device
+
+        # Structured vertices are uploaded as raw bytes:
+        if vertices.dtype.names:
+            vertices = np.ascontiguousarray(vertices).view(np.uint8)
+
+        self.vertex_buffer = self._create_buffer("MESH_VERTEX_BUFFER", vertices, wgpu.BufferUsage.VERTEX, upload)
+        self.index_buffer = None
+        if indices is not None:
+            # Buffer sizes have to be a multiple of 4 bytes:
+            if indices.nbytes % 4:
+                indices = np.append(indices, indices.dtype.type(0))
+
+            self.index_buffer = self._create_buffer("MESH_INDEX_BUFFER", indices, wgpu.BufferUsage.INDEX, upload)
+
+    def _create_buffer(self, label: str, data: np.ndarray, usage: int, upload: bool) -> wgpu.GPUBuffer:
+        if upload:
+            buffer = self.device.create_buffer_with_data(label=label, data=data, usage=usage)
+        else:
+            # Filled later with copies (see streaming):
+            buffer = self.device.create_buffer(label=label, size=(data.nbytes + 3) // 4 * 4,
+                                               usage=usage | wgpu.BufferUsage.COPY_DST)
+        return resources_of(self.device).track(buffer, CATEGORY_MESHES, self)
+
+    def destinations(self) -> list[tuple[wgpu.GPUBuffer, int]]:
+        """(buffer, offset) of the vertex and the index data."""
+        if self.index_buffer is None:
+            return [(self.vertex_buffer, 0)]
+        return [(self.vertex_buffer, 0), (self.index_buffer, 0)]
+
+    @property
+    def size(self) -> int:
+        return self.vertex_buffer.size + (self.index_buffer.size if self.index_buffer else 0)
+
+    def free(self) -> None:
+        resources = resources_of(self.device)
+        resources.release(self.vertex_buffer)
+        if self.index_buffer:
+            resources.release(self.index_buffer)
+
+
+def compute_bounds(positions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """Returns the AABB (min, max) and the bounding sphere (center, radius)."""
+    aabb_min = positions.min(axis=0)
+    aabb_max = positions.max(axis=0)
+
+    # Bounding sphere around the center of the box:
+    center = (aabb_min + aabb_max) * 0.5
+    radius = float(np.linalg.norm(positions - center, axis=1).max())
+    return aabb_min, aabb_max, center, radius
+
+
 class Mesh:
-    def __init__(self, device: wgpu.GPUDevice, vertices: np.ndarray, indices=None) -> None:
+    def __init__(self,
+                 device: wgpu.GPUDevice,
+                 vertices: np.ndarray,
+                 indices=None,
+                 layout: VertexLayout = STANDARD_LAYOUT,
+                 bounds: tuple | None = None,
+                 index_count: int | None = None,
+                 arena=None,
+                 upload: bool = True) -> None:
+        # NOTE: `vertices` may also be raw bytes in the given layout (e.g. memory
+        #       mapped), then the bounds have to be passed in. `index_count` is only
+        #       needed if `indices` contains padding. Without `upload` the buffers
+        #       are only allocated, the mesh is not resident until they are filled.
         self.device = device
-        self.vertex_count = len(vertices)
-        self.vertex_buffer = device.create_buffer_with_data(data=vertices, 
-                                                            usage=wgpu.BufferUsage.VERTEX)
+        self.layout = layout
+        self.vertex_count = vertices.nbytes // layout.stride
+
+        # Bounding volumes (used for culling):
+        if bounds is None:
+            bounds = compute_bounds(vertex_positions(vertices))
+        self.aabb_min, self.aabb_max, self.bounding_center, self.bounding_radius = bounds
+
+        # Before/after stats of the mesh optimization (see mesh_processing):
+        self.stats = None
+
+        # Set by the MeshCache for cached meshes:
+        self.cache_key: str | None = None
+
+        # Mesh file the mesh was loaded from, scene snapshots refer to meshes by it:
+        self.source: Path | None = None
+
+        # False while the data is still being streamed to the GPU:
+        self.resident = upload
+
+        # Simplified versions, coarsest last (see lod):
+        self.lods: list[Mesh] = []
 
         if indices is not None:
-            self.index_count = len(indices)
-            self.index_buffer = device.create_buffer_with_data(data=indices, 
-                                                               usage=wgpu.BufferUsage.INDEX)
+            self.index_count = len(indices) if index_count is None else index_count
+            self.index_format = (wgpu.IndexFormat.uint16 if indices.dtype == np.uint16
+                                 else wgpu.IndexFormat.uint32)
         else:
             self.index_count = 0
-            self.index_buffer = None
+            self.index_format = None
+
+        # Either a range of the big arena buffers or buffers of our own:
+        if arena is not None:
+            self.allocation = arena.allocate(vertices, indices, layout, upload)
+        else:
+            self.allocation = DedicatedAllocation(device, vertices, indices, upload)
+
+    @property
+    def vertex_buffer(self) -> wgpu.GPUBuffer:
+        return self.allocation.vertex_buffer
+
+    @property
+    def index_buffer(self) -> wgpu.GPUBuffer | None:
+        return self.allocation.index_buffer
+
+    @property
+    def size(self) -> int:
+        """GPU memory used by the mesh in bytes."""
+        return self.allocation.size
+
+    @property
+    def triangle_count(self) -> int:
+        return (self.index_count if self.index_format else self.vertex_count) // 3
+
+    def destroy(self) -> None:
+        """Frees the GPU memory of the mesh and its LODs once the frames in flight
+        retired, the mesh must not be drawn anymore."""
+        self.resident = False
+        resources_of(self.device).defer(self.allocation.free)
+        for lod in self.lods:
+            lod.destroy()
+
+    def draw(self,
+             render_pass,
+             instance_count: int = 1,
+             first_instance: int = 0,
+             state: BindState | None = None) -> None:
+        allocation = self.allocation
+        self._bind(render_pass, state or BindState())
+        if self.index_format is None:
+            render_pass.draw(self.vertex_count, instance_count, allocation.base_vertex, first_instance)
+        else:
+            render_pass.draw_indexed(self.index_count, instance_count,
+                                     allocation.first_index, allocation.base_vertex, first_instance)
+
+    def draw_indirect(self,
+                      render_pass,
+                      indirect_buffer: wgpu.GPUBuffer,
+                      indirect_offset: int,
+                      state: BindState | None = None) -> None:
+        """Like `draw`, but the arguments (see `indirect_args`) are read from a GPU buffer."""
+        self._bind(render_pass, state or BindState())
+        if self.index_format is None:
+            render_pass.draw_indirect(indirect_buffer, indirect_offset)
+        else:
+            render_pass.draw_indexed_indirect(indirect_buffer, indirect_offset)
+
+    def indirect_args(self, instance_count: int = 0) -> tuple[int, int, int, int, int]:
+        """The draw_indexed_indirect arguments of the mesh. Meshes without indices
+        use draw_indirect, which only reads the first four."""
+        allocation = self.allocation
+        if self.index_format is None:
+            return self.vertex_count, instance_count, allocation.base_vertex, 0, 0
+        return self.index_count, instance_count, allocation.first_index, allocation.base_vertex, 0
+
+    def _bind(self, render_pass, state: BindState) -> None:
+        allocation = self.allocation
+
+        # Arena meshes share their buffers, so most draws need no rebind:
+        if state.vertex_buffer is not allocation.vertex_buffer:
+            render_pass.set_vertex_buffer(0, allocation.vertex_buffer)
+            state.vertex_buffer = allocation.vertex_buffer
+
+        if self.index_format is not None and state.index_buffer is not allocation.index_buffer:
+            render_pass.set_index_buffer(allocation.index_buffer, self.index_format)
+            state.index_buffer = allocation.index_buffer
 
 
-def create_cube_mesh(device: wgpu.GPUDevice) -> Mesh:
+def create_cube_mesh(device: wgpu.GPUDevice, cache=None, arena=None) -> Mesh:
     vertices, indices = create_cube_data()
-    return Mesh(device, vertices, indices)
+    if cache is not None:
+        return cache.get_or_create(vertices, indices)
+    return Mesh(device, vertices, indices, arena=arena)
 
@@ -0,0 +1,122 @@
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import Executor
+import wgpu
+import numpy as np
+from .mesh import Mesh, VertexLayout, STANDARD_LAYOUT
+from .mesh_format import content_hash, read_header, read_mesh, load_mesh
+
+
+class MeshCache:
+    """Deduplicates meshes by content hash and reference-counts their GPU buffers.
+
+    Every `get_or_create`/`load` has to be paired with a `release` of the mesh.
+    Meshes nobody references anymore stay cached (a reload is free) as long as
+    the cache holds at most `budget` bytes, above it the least recently
+    released ones are destroyed. With the default budget of 0 unused meshes are
+    destroyed right away.
+    """
+    def __init__(self, device: wgpu.GPUDevice, arena=None, budget: int = 0) -> None:
+        self.device = device
+        self.arena = arena  # Optional GpuArena the meshes are suballocated from
+        self.budget = budget
+        self.meshes: dict[str, Mesh] = {}
+        self.ref_counts: dict[str, int] = {}
+        self.memory_usage = 0  # Bytes of all cached meshes
+        self.misses = 0  # Meshes created (uploaded)
+        self.evictions = 0
+
+        # Keys of the meshes without references, least recently released first:
+        self.unused: OrderedDict[str, None] = OrderedDict()
+
+        # Mesh files we already know the content hash of, and the files by hash.
+        # Only kept while the mesh is referenced, the file may change after that:
+        self._file_hashes: dict[Path, str] = {}
+        self._hash_files: dict[str, list[Path]] = {}
+
+    def get_or_create(self,
+                      vertices: np.ndarray,
+                      indices: np.ndarray | None = None,
+                      layout: VertexLayout = STANDARD_LAYOUT) -> Mesh:
+        key = content_hash(vertices, indices, layout)
+        if key not in self.meshes:
+            self._insert(key, Mesh(self.device, vertices, indices, layout, arena=self.arena))
+        return self._acquire(key)
+
+    def load(self, path: str | Path) -> Mesh:
+        """Loads a binary mesh file (see mesh_format), only reading it on a cache miss."""
+        path = Path(path).resolve()
+        key = self._file_hash(path)
+        if key not in self.meshes:
+            data = read_mesh(path)
+            mesh = Mesh(self.device, data.vertices, data.indices, data.layout,
+                        bounds=data.bounds, index_count=data.index_count, arena=self.arena)
+            mesh.source = path
+            self._insert(key, mesh)
+        return self._acquire(key)
+
+    def load_many(self, paths: list[str | Path], executor: Executor | None = None) -> list[Mesh]:
+        """Loads several mesh files. With an executor the files are read in
+        parallel, the GPU uploads still happen on the calling thread."""
+        paths = [Path(path).resolve() for path in paths]
+        missing = list({path: None for path in paths if self._file_hash(path) not in self.meshes})
+
+        reads = executor.map(load_mesh, missing) if executor else map(load_mesh, missing)
+        for path, data in zip(missing, reads):
+            key = self._file_hash(path)
+            if key not in self.meshes:
+                mesh = Mesh(self.device, data.vertices, data.indices, data.layout,
+                            bounds=data.bounds, index_count=data.index_count, arena=self.arena)
+                mesh.source = path
+                self._insert(key, mesh)
+
+        return [self.load(path) for path in paths]
+
+    def release(self, mesh: Mesh) -> None:
+        key = mesh.cache_key
+        self.ref_counts[key] -= 1
+        if self.ref_counts[key] == 0:
+            # Its files are hashed again on the next load, which also covers
+            # files that changed while the mesh was unused or evicted:
+            for path in self._hash_files.pop(key, ()):
+                del self._file_hashes[path]
+            self.unused[key] = None
+            self.trim()
+
+    def trim(self, budget: int | None = None) -> int:
+        """Destroys unused meshes, least recently released first, until the cache
+        fits into `budget` (default: `self.budget`). Returns the bytes freed."""
+        budget = self.budget if budget is None else budget
+        freed = 0
+        while self.unused and self.memory_usage > budget:
+            key, _ = self.unused.popitem(last=False)
+            mesh = self.meshes.pop(key)
+            del self.ref_counts[key]
+            self.memory_usage -= mesh.size
+            self.evictions += 1
+            freed += mesh.size
+            mesh.destroy()
+        return freed
+
+    def _file_hash(self, path: Path) -> str:
+        """Content hash of a mesh file, only its header is read."""
+        key = self._file_hashes.get(path)
+        if key is None:
+            key = self._file_hashes[path] = read_header(path)[-1].hex()
+            self._hash_files.setdefault(key, []).append(path)
+        return key
+
+    def _insert(self, key: str, mesh: Mesh) -> None:
+        mesh.cache_key = key
+        self.meshes[key] = mesh
+        self.ref_counts[key] = 0
+        self.memory_usage += mesh.size
+        self.misses += 1
+
+        # Make room, the new mesh is not unused and so is never evicted here:
+        self.trim()
+
+    def _acquire(self, key: str) -> Mesh:
+        self.ref_counts[key] += 1
+        self.unused.pop(key, None)
+        return self.meshes[key]
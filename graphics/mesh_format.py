@@ -0,0 +1,126 @@
+"""Binary mesh format (.ssm).
+
+    HEADER (128 bytes, little endian)
+    VERTEX BLOB (aligned to 64 bytes)
+    INDEX BLOB  (aligned to 64 bytes, padded to a multiple of 4 bytes)
+
+The blobs are stored exactly as they are uploaded to the GPU, so a loaded mesh
+is a memory map that goes straight into `create_buffer_with_data`.
+"""
+import struct
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+from .mesh import VertexLayout, LAYOUTS, STANDARD_LAYOUT, compute_bounds, vertex_positions
+
+MAGIC = b"SSM1"
+VERSION = 1
+ALIGNMENT = 64
+
+# magic, version, index bits, layout, vertex count, index count,
+# vertex offset, vertex bytes, index offset, index bytes, aabb min, aabb max,
+# sphere center, sphere radius, content hash
+HEADER = struct.Struct("<4sHH16sIIQQQQ3f3f3ff16s")
+HEADER_SIZE = 128
+
+
+@dataclass
+class MeshData:
+    """CPU side mesh data, the arrays may be views into a memory map."""
+    vertices: np.ndarray  # Raw bytes in the layout
+    indices: np.ndarray | None  # Including padding
+    index_count: int
+    layout: VertexLayout
+    bounds: tuple
+    content_hash: str
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def content_hash(vertices: np.ndarray, indices: np.ndarray | None, layout: VertexLayout) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(layout.name.encode())
+    digest.update(np.ascontiguousarray(vertices).view(np.uint8))
+    if indices is not None:
+        digest.update(str(indices.dtype).encode())
+        digest.update(np.ascontiguousarray(indices).view(np.uint8))
+    return digest.hexdigest()
+
+
+def write_mesh(path: str | Path,
+               vertices: np.ndarray,
+               indices: np.ndarray | None = None,
+               layout: VertexLayout = STANDARD_LAYOUT) -> None:
+    if not vertices.dtype.names:
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    aabb_min, aabb_max, center, radius = compute_bounds(vertex_positions(vertices))
+    vertex_bytes = np.ascontiguousarray(vertices).view(np.uint8).ravel()
+
+    index_count, index_bits, index_bytes = 0, 0, np.zeros(0, dtype=np.uint8)
+    if indices is not None:
+        index_count = len(indices)
+        index_bits = indices.dtype.itemsize * 8
+        index_bytes = np.ascontiguousarray(indices).view(np.uint8)
+        index_bytes = np.pad(index_bytes, (0, -len(index_bytes) % 4))
+
+    vertex_offset = _align(HEADER_SIZE)
+    index_offset = _align(vertex_offset + len(vertex_bytes))
+
+    header = HEADER.pack(MAGIC, VERSION, index_bits, layout.name.encode(),
+                         len(vertex_bytes) // layout.stride, index_count,
+                         vertex_offset, len(vertex_bytes), index_offset, len(index_bytes),
+                         *aabb_min, *aabb_max, *center, radius,
+                         bytes.fromhex(content_hash(vertices, indices, layout)))
+
+    with open(path, "wb") as file:
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+        file.seek(vertex_offset)
+        file.write(vertex_bytes.tobytes())
+        file.seek(index_offset)
+        file.write(index_bytes.tobytes())
+
+
+def read_header(path: str | Path) -> tuple:
+    with open(path, "rb") as file:
+        fields = HEADER.unpack(file.read(HEADER.size))
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} mesh file")
+    return fields
+
+
+def read_mesh(path: str | Path) -> MeshData:
+    """Memory maps the mesh file, nothing is copied."""
+    (_, _, index_bits, layout_name, _, index_count,
+     vertex_offset, vertex_size, index_offset, index_size, *rest) = read_header(path)
+    aabb_min, aabb_max, center = (np.array(rest[i:i + 3], dtype=np.float32) for i in (0, 3, 6))
+    radius, digest = rest[9], rest[10]
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    vertices = data[vertex_offset:vertex_offset + vertex_size]
+
+    indices = None
+    if index_bits:
+        index_dtype = np.uint16 if index_bits == 16 else np.uint32
+        indices = data[index_offset:index_offset + index_size].view(index_dtype)
+
+    return MeshData(
+        vertices=vertices,
+        indices=indices,
+        index_count=index_count,
+        layout=LAYOUTS[layout_name.rstrip(b"\0").decode()],
+        bounds=(aabb_min, aabb_max, center, radius),
+        content_hash=digest.hex(),
+    )
+
+
+def load_mesh(path: str | Path) -> MeshData:
+    """Like `read_mesh`, but copies the data out of the memory map, so all disk
+    reads happen on the calling thread (e.g. a loader thread)."""
+    data = read_mesh(path)
+    data.vertices = np.array(data.vertices)
+    if data.indices is not None:
+        data.indices = np.array(data.indices)
+    return data
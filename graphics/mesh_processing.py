@@ -0,0 +1,209 @@
+from collections import deque
+from dataclasses import dataclass
+import wgpu
+import numpy as np
+from .mesh import Mesh, VertexLayout, STANDARD_LAYOUT, COMPACT_LAYOUT
+
+
+@dataclass
+class MeshStats:
+    """Before/after numbers of the mesh optimization."""
+    vertex_count_before: int
+    vertex_count_after: int
+    vertex_bytes_before: int
+    vertex_bytes_after: int
+    index_bytes_before: int
+    index_bytes_after: int
+    acmr_before: float
+    acmr_after: float
+
+    def report(self) -> str:
+        return (f"vertices {self.vertex_count_before} -> {self.vertex_count_after}, "
+                f"vertex bytes {self.vertex_bytes_before} -> {self.vertex_bytes_after}, "
+                f"index bytes {self.index_bytes_before} -> {self.index_bytes_after}, "
+                f"ACMR {self.acmr_before:.3f} -> {self.acmr_after:.3f}")
+
+
+def to_structured(vertices: np.ndarray, layout: VertexLayout = STANDARD_LAYOUT) -> np.ndarray:
+    """Converts plain (N, 6) float vertices into the structured dtype of the layout."""
+    if vertices.dtype.names:
+        return vertices
+    structured = np.empty(len(vertices), dtype=layout.dtype)
+    structured["position"] = vertices[:, :3]
+    structured["color"] = vertices[:, 3:6]
+    return structured
+
+
+def deduplicate_vertices(vertices: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merges bitwise identical vertices and remaps the indices."""
+    # One opaque value per vertex, much faster to sort than rows of bytes:
+    vertices = np.ascontiguousarray(vertices)
+    rows = vertices.view(np.dtype((np.void, vertices.dtype.itemsize))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+    # Keep the unique vertices in their original order:
+    order = np.argsort(first)
+    remap = np.empty(len(order), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+
+    return vertices[first[order]], remap[inverse.ravel()][indices].astype(np.uint32)
+
+
+def compute_acmr(indices: np.ndarray, cache_size: int = 16) -> float:
+    """Average cache miss ratio (transformed vertices per triangle) of a FIFO cache."""
+    triangle_count = len(indices) // 3
+    if triangle_count == 0:
+        return 0.0
+
+    cache = deque()
+    cached = set()
+    misses = 0
+    for vertex in indices.tolist():
+        if vertex in cached:
+            continue
+        misses += 1
+        if len(cache) == cache_size:
+            cached.discard(cache.popleft())
+        cache.append(vertex)
+        cached.add(vertex)
+
+    return misses / triangle_count
+
+
+def optimize_vertex_cache(indices: np.ndarray, vertex_count: int, cache_size: int = 16) -> np.ndarray:
+    """Reorders triangles for post-transform vertex cache locality.
+
+    Sander et al. "Fast Triangle Reordering for Vertex Locality and Reduced
+    Overdraw" (Tipsify): emits all remaining triangles around a fanning vertex
+    at once, then continues with a vertex of that fan that is still in the
+    (simulated FIFO) cache and has few triangles left, or a dead end.
+    """
+    triangle_count = len(indices) // 3
+    if triangle_count == 0:
+        return indices
+
+    # Vertex -> triangle adjacency:
+    flat = indices.ravel()
+    valence = np.bincount(flat, minlength=vertex_count)
+    offsets = np.concatenate([[0], np.cumsum(valence)]).tolist()
+    adjacency = (np.argsort(flat, kind="stable") // 3).tolist()
+    triangles = indices.reshape(-1, 3).tolist()
+    remaining = valence.tolist()
+    emitted = [False] * triangle_count
+
+    # Time stamps of the cache entries, a vertex is cached while time - stamp <= cache_size:
+    stamps = [-cache_size - 1] * vertex_count
+    time = 0
+
+    output = []
+    dead_ends = []  # Vertices of emitted triangles, to continue from when a fan has no candidate
+    cursor = 0
+    fanning = int(flat[0])
+
+    while fanning >= 0:
+        fan = []
+        for k in range(offsets[fanning], offsets[fanning + 1]):
+            triangle = adjacency[k]
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            for vertex in triangles[triangle]:
+                fan.append(vertex)
+                remaining[vertex] -= 1
+                if time - stamps[vertex] > cache_size:
+                    stamps[vertex] = time
+                    time += 1
+        output += fan
+        dead_ends += fan
+
+        # The fan vertex that stays in the cache while its triangles are emitted, the oldest wins:
+        fanning, best = -1, -1
+        for vertex in fan:
+            if remaining[vertex] > 0:
+                age = time - stamps[vertex]
+                priority = age if age + 2 * remaining[vertex] <= cache_size else 0
+                if priority > best:
+                    fanning, best = vertex, priority
+
+        # Nothing left around the fan, continue with a recent or any remaining vertex:
+        if fanning < 0:
+            while dead_ends and fanning < 0:
+                vertex = dead_ends.pop()
+                if remaining[vertex] > 0:
+                    fanning = vertex
+            while fanning < 0 and cursor < vertex_count:
+                if remaining[cursor] > 0:
+                    fanning = cursor
+                cursor += 1
+
+    return np.array(output, dtype=indices.dtype)
+
+
+def optimize_vertex_fetch(vertices: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Reorders vertices in the order they are first referenced by the indices."""
+    used, first_use = np.unique(indices, return_index=True)
+    order = used[np.argsort(first_use)]
+
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return vertices[order], remap[indices].astype(np.uint32)
+
+
+def compact_indices(indices: np.ndarray, vertex_count: int) -> np.ndarray:
+    if vertex_count <= 0xFFFF:
+        return indices.astype(np.uint16)
+    return indices.astype(np.uint32)
+
+
+def pack_compact(vertices: np.ndarray) -> np.ndarray:
+    """Converts standard vertices into the compact layout (unorm8x4 colors)."""
+    packed = np.empty(len(vertices), dtype=COMPACT_LAYOUT.dtype)
+    packed["position"] = vertices["position"]
+    packed["color"][:, :3] = np.round(np.clip(vertices["color"], 0.0, 1.0) * 255.0)
+    packed["color"][:, 3] = 255
+    return packed
+
+
+def process_mesh(vertices: np.ndarray,
+                 indices: np.ndarray,
+                 compact: bool = False) -> tuple[np.ndarray, np.ndarray, VertexLayout, MeshStats]:
+    """Offline mesh optimization: dedup, cache reorder, fetch reorder, compact formats."""
+    vertices = to_structured(vertices)
+    indices = np.asarray(indices, dtype=np.uint32)
+    vertex_count_before = len(vertices)
+    vertex_bytes_before = vertices.nbytes
+    index_bytes_before = indices.nbytes
+
+    # Triangle soups always miss, the ACMR before only means something once shared vertices are merged:
+    vertices, indices = deduplicate_vertices(vertices, indices)
+    acmr_before = compute_acmr(indices)
+    indices = optimize_vertex_cache(indices, len(vertices))
+    vertices, indices = optimize_vertex_fetch(vertices, indices)
+    indices = compact_indices(indices, len(vertices))
+
+    layout = STANDARD_LAYOUT
+    if compact:
+        vertices = pack_compact(vertices)
+        layout = COMPACT_LAYOUT
+
+    stats = MeshStats(
+        vertex_count_before=vertex_count_before,
+        vertex_count_after=len(vertices),
+        vertex_bytes_before=vertex_bytes_before,
+        vertex_bytes_after=vertices.nbytes,
+        index_bytes_before=index_bytes_before,
+        index_bytes_after=indices.nbytes,
+        acmr_before=acmr_before,
+        acmr_after=compute_acmr(indices),
+    )
+    return vertices, indices, layout, stats
+
+
+def create_optimized_mesh(device: wgpu.GPUDevice,
+                          vertices: np.ndarray,
+                          indices: np.ndarray,
+                          compact: bool = False) -> Mesh:
+    vertices, indices, layout, stats = process_mesh(vertices, indices, compact)
+    mesh = Mesh(device, vertices, indices, layout)
+    mesh.stats = stats
+    return mesh
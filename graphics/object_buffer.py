@@ -0,0 +1,110 @@
+import wgpu
+import numpy as np
+from scene.transform import TransformStore
+from .resources import resources_of, CATEGORY_UNIFORMS
+
+# Bytes of per-object data (the model matrix), every slot is padded to the stride:
+OBJECT_SIZE = 64
+
+
+class ObjectUniformRing:
+    """One big uniform buffer holding the per-object data of every entity.
+
+    The buffer is split into one region per frame in flight, so the CPU never
+    writes into the region the GPU may still be reading from. Entities select
+    their slot inside the current region with a dynamic offset.
+    """
+    def __init__(self,
+                 device: wgpu.GPUDevice,
+                 layout: wgpu.GPUBindGroupLayout,
+                 frames_in_flight: int = 3,
+                 stride: int | None = None) -> None:
+        self.device = device
+        self.layout = layout
+        self.frames_in_flight = frames_in_flight
+        self.frame = 0
+
+        # Dynamic offsets must be multiples of the alignment (a power of two):
+        if stride is None:
+            stride = max(OBJECT_SIZE, device.limits["min-uniform-buffer-offset-alignment"])
+        self.stride = stride
+
+        # All regions share one buffer, which can't exceed the device limit:
+        self.max_capacity = device.limits["max-buffer-size"] // (frames_in_flight * stride)
+
+        self.capacity = 0
+        self.buffer: wgpu.GPUBuffer = None
+        self.bind_group: wgpu.GPUBindGroup = None
+
+        # CPU copy of the per-object data, packed exactly like one buffer region:
+        self.data = np.zeros((0, stride // 4), dtype=np.float32)
+
+        # Rows [start, end) each region is still missing:
+        self.pending: list[tuple[int, int] | None] = [None] * frames_in_flight
+
+    @property
+    def region_offset(self) -> int:
+        return self.frame * self.capacity * self.stride
+
+    def offset(self, row: int) -> int:
+        return self.region_offset + row * self.stride
+
+    def sync(self, transforms: TransformStore) -> None:
+        """Upload the per-object data of the current frame with one write."""
+        transforms.update_matrices()
+        changed = transforms.take_upload_range()
+
+        if transforms.count > self.max_capacity:
+            limit = self.device.limits["max-buffer-size"]
+            raise ValueError(f"{transforms.count} entities need "
+                             f"{self.frames_in_flight * transforms.count * self.stride / 2**20:.1f} MB of "
+                             f"per-object data, the device allows buffers of {limit / 2**20:.0f} MB "
+                             f"({self.max_capacity} entities)")
+
+        if transforms.capacity > self.capacity and self.capacity < self.max_capacity:
+            self._resize(min(transforms.capacity, self.max_capacity))
+            changed = (0, transforms.count) if transforms.count else None
+
+        if changed:
+            start, end = changed
+            self.data[start:end, :16] = transforms.matrices[start:end].reshape(-1, 16)
+            for region, pending in enumerate(self.pending):
+                self.pending[region] = (min(start, pending[0]), max(end, pending[1])) if pending else changed
+
+        pending = self.pending[self.frame]
+        if not pending:
+            return
+
+        start, end = pending
+        self.device.queue.write_buffer(self.buffer, self.offset(start), self.data[start:end].tobytes())
+        self.pending[self.frame] = None
+
+    def advance(self) -> None:
+        self.frame = (self.frame + 1) % self.frames_in_flight
+
+    def _resize(self, capacity: int) -> None:
+        data = np.zeros((capacity, self.stride // 4), dtype=np.float32)
+        data[:len(self.data)] = self.data
+        self.data = data
+        self.capacity = capacity
+
+        # Frames in flight still read the old buffer:
+        resources = resources_of(self.device)
+        if self.buffer:
+            resources.release_later(self.buffer)
+
+        self.buffer = resources.track(self.device.create_buffer(
+            label="OBJECT_UNIFORM_BUFFER",
+            size=self.frames_in_flight * capacity * self.stride,
+            usage=wgpu.BufferUsage.UNIFORM | wgpu.BufferUsage.COPY_DST,
+        ), CATEGORY_UNIFORMS, self)
+        self.bind_group = self.device.create_bind_group(
+            label="OBJECT_BIND_GROUP",
+            layout=self.layout,
+            entries=[
+                wgpu.BindGroupEntry(
+                    binding=0,
+                    resource=wgpu.BufferBinding(buffer=self.buffer, offset=0, size=OBJECT_SIZE),
+                ),
+            ],
+        )
@@ -0,0 +1,33 @@
+"""Overdraw debug mode: every shaded fragment adds one step of brightness.
+
+With `Renderer.debug_overdraw` the color pass draws with additive blending and
+the OVERDRAW shader variant, so the color of a pixel counts how many fragments
+were shaded for it (up to LAYERS, brighter is worse). With the depth pre-pass
+every pixel is shaded about once.
+"""
+import numpy as np
+
+# Fragments per pixel until the color saturates, 256 / LAYERS is a whole
+# number of 8-bit steps so the counts read back exactly:
+LAYERS = 32
+
+# Shader variant of the color pass (see shader.wgsl), the value is the step:
+DEFINES = (("OVERDRAW", repr(1.0 / LAYERS)),)
+
+
+def overdraw_counts(pixels: np.ndarray) -> np.ndarray:
+    """Shaded fragments per pixel from a (height, width, 4) uint8 readback of
+    a frame rendered in overdraw mode (see GraphicsContext.read_pixels)."""
+    return np.rint(pixels[..., 0].astype(np.float32) * LAYERS / 255.0).astype(np.int64)
+
+
+def overdraw_summary(pixels: np.ndarray) -> dict[str, float]:
+    """Average shaded fragments per pixel, over all pixels and over the covered ones."""
+    counts = overdraw_counts(pixels)
+    covered = counts[counts > 0]
+    return {
+        "coverage": float(len(covered) / counts.size),
+        "average": float(counts.mean()),
+        "average_covered": float(covered.mean()) if len(covered) else 0.0,
+        "max": int(counts.max(initial=0)),
+    }
@@ -0,0 +1,192 @@
+import json
+import hashlib
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import wgpu
+from .mesh import VertexLayout, LAYOUTS
+from .shader_preprocessor import ShaderPreprocessor, SHADER_DIR
+
+# Pipelines created at startup, see `PipelineCache.prewarm`:
+DEFAULT_MANIFEST = SHADER_DIR / "pipelines.json"
+
+
+@dataclass(frozen=True)
+class PipelineKey:
+    """Everything a render pipeline depends on."""
+    shader: str
+    layout: VertexLayout
+    instanced: bool = False
+    defines: tuple[tuple[str, str], ...] = ()
+    color_formats: tuple[str, ...] = ()
+    depth_format: str | None = None
+    depth_write: bool = True
+    depth_compare: str = wgpu.CompareFunction.less
+    cull_mode: str = wgpu.CullMode.none
+    additive: bool = False  # Blend the colors additively instead of replacing them
+    bind_group_layouts: tuple[wgpu.GPUBindGroupLayout, ...] = ()
+
+    @property
+    def all_defines(self) -> dict[str, str]:
+        defines = dict(self.defines)
+        if self.instanced:
+            defines["INSTANCED"] = ""
+        return defines
+
+
+class PipelineCache:
+    """Shader modules and render pipelines, created once per distinct key.
+
+    Shader modules are keyed by the hash of their preprocessed source, so
+    variants that expand to the same code share a module. Pipelines are created
+    with create_render_pipeline_async on a few threads of their own (the job
+    system has no workers on GIL builds), `get` can either wait for a pending
+    pipeline or return None until it is ready.
+    """
+    def __init__(self, device: wgpu.GPUDevice, shader_dir: Path = SHADER_DIR, threads: int = 2) -> None:
+        self.device = device
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="PIPELINES")
+        self.preprocessor = ShaderPreprocessor(shader_dir)
+
+        self.sources: dict[tuple[str, tuple], str] = {}  # (shader, defines) -> source hash
+        self.modules: dict[str, wgpu.GPUShaderModule] = {}  # source hash -> module
+        self.pipelines: dict[tuple[str, PipelineKey], wgpu.GPURenderPipeline] = {}
+        self.pending: dict[tuple[str, PipelineKey], Future] = {}
+
+    def get(self, key: PipelineKey, block: bool = True) -> wgpu.GPURenderPipeline | None:
+        cache_key = (self._source_hash(key), key)
+        pipeline = self.pipelines.get(cache_key)
+        if pipeline is not None:
+            return pipeline
+
+        future = self.pending.get(cache_key) or self._create(cache_key)
+        if not block and not future.done():
+            return None
+        self.pending.pop(cache_key, None)
+        pipeline = self.pipelines[cache_key] = future.result()  # Re-raises creation errors
+        return pipeline
+
+    def request(self, key: PipelineKey) -> None:
+        """Starts creating the pipeline in the background."""
+        cache_key = (self._source_hash(key), key)
+        if cache_key not in self.pipelines and cache_key not in self.pending:
+            self._create(cache_key)
+
+    def prewarm(self, manifest: str | Path, make_key) -> int:
+        """Requests all pipelines listed in a JSON manifest, a list of
+        {"shader", "layout", "instanced", "defines"} entries.
+
+        `make_key(shader, layout, instanced, defines)` fills in the rest of the
+        key (formats, bind group layouts, ...). Returns the number of entries.
+        """
+        entries = json.loads(Path(manifest).read_text())
+        for entry in entries:
+            self.request(make_key(entry["shader"],
+                                  LAYOUTS[entry["layout"]],
+                                  entry.get("instanced", False),
+                                  tuple(sorted(entry.get("defines", {}).items()))))
+        return len(entries)
+
+    def shutdown(self) -> None:
+        """Stops the compile threads, pipelines still pending are dropped."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_module(self, key: PipelineKey) -> wgpu.GPUShaderModule:
+        return self.modules[self._source_hash(key)]
+
+    def _source_hash(self, key: PipelineKey) -> str:
+        source_key = (key.shader, key.defines, key.instanced)
+        source_hash = self.sources.get(source_key)
+        if source_hash is None:
+            source = self.preprocessor.process(key.shader, key.all_defines)
+            source_hash = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+            if source_hash not in self.modules:
+                self.modules[source_hash] = self.device.create_shader_module(
+                    label=f"SHADER_{Path(key.shader).stem.upper()}", code=source)
+            self.sources[source_key] = source_hash
+        return source_hash
+
+    def _create(self, cache_key: tuple[str, PipelineKey]) -> Future:
+        future = self.pending[cache_key] = self.executor.submit(self._compile, cache_key)
+        return future
+
+    def _compile(self, cache_key: tuple[str, PipelineKey]) -> wgpu.GPURenderPipeline:
+        source_hash, key = cache_key
+        module = self.modules[source_hash]
+
+        # Depth-only pipelines (no color targets) have no fragment stage and only read positions:
+        depth_only = not key.color_formats
+        vertex_buffers = [_vertex_buffer_layout(key.layout, positions_only=depth_only)]
+        if key.instanced:
+            vertex_buffers.append(_instance_buffer_layout())
+
+        depth_stencil = None
+        if key.depth_format:
+            depth_stencil = wgpu.DepthStencilState(
+                format=key.depth_format,
+                depth_write_enabled=key.depth_write,
+                depth_compare=key.depth_compare,
+            )
+
+        blend = wgpu.BlendState(color={}, alpha={})
+        if key.additive:
+            add = {"src_factor": wgpu.BlendFactor.one, "dst_factor": wgpu.BlendFactor.one,
+                   "operation": wgpu.BlendOperation.add}
+            blend = wgpu.BlendState(color=add, alpha=add)
+
+        fragment = None
+        if not depth_only:
+            fragment = wgpu.FragmentState(
+                module=module,
+                entry_point="fs_main",
+                targets=[wgpu.ColorTargetState(format=color_format, blend=blend) for color_format in key.color_formats],
+            )
+
+        variant = ("_INSTANCED" if key.instanced else "") + ("_DEPTH" if depth_only else "")
+        promise = self.device.create_render_pipeline_async(
+            label=f"RENDER_PIPELINE_{key.layout.name.upper()}{variant}",
+            layout=self.device.create_pipeline_layout(
+                label="PIPELINE_LAYOUT",
+                bind_group_layouts=list(key.bind_group_layouts),
+            ),
+            vertex=wgpu.VertexState(module=module, entry_point="vs_main", buffers=vertex_buffers),
+            primitive=wgpu.PrimitiveState(cull_mode=key.cull_mode),
+            depth_stencil=depth_stencil,
+            multisample=None,
+            fragment=fragment,
+        )
+        # Waits on the compile thread, the frame only polls the future:
+        return promise.sync_wait()
+
+
+def _vertex_buffer_layout(layout: VertexLayout, positions_only: bool = False) -> wgpu.VertexBufferLayout:
+    # e.g. the standard layout: position float32x3 at 0, color float32x3 at 12
+    attribs = [
+        wgpu.VertexAttribute(format=vertex_format, offset=offset, shader_location=location)
+        for vertex_format, offset, location in layout.attributes
+        if location == 0 or not positions_only
+    ]
+
+    return wgpu.VertexBufferLayout(
+        array_stride=layout.stride,
+        step_mode=wgpu.VertexStepMode.vertex,
+        attributes=attribs,
+    )
+
+
+def _instance_buffer_layout() -> wgpu.VertexBufferLayout:
+    # The model matrix is passed as 4 column vectors (locations 2 to 5):
+    column_attribs = [
+        wgpu.VertexAttribute(
+            format=wgpu.VertexFormat.float32x4,
+            offset=16 * column,  # 4 floats (4 bytes) per column
+            shader_location=2 + column,
+        )
+        for column in range(4)
+    ]
+
+    return wgpu.VertexBufferLayout(
+        array_stride=64,  # 4x4 float32 (4 bytes) matrix
+        step_mode=wgpu.VertexStepMode.instance,
+        attributes=column_attribs,
+    )
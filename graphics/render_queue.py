@@ -0,0 +1,164 @@
+import weakref
+import wgpu
+import numpy as np
+from .mesh import BindState
+
+# Sort key layout, most significant bits first:
+#   pipeline (8 bits) | bind group (12 bits) | mesh (20 bits) | depth (24 bits)
+# Sorting by key groups draws by state first, and front-to-back within a state.
+PIPELINE_SHIFT = 56
+BIND_GROUP_SHIFT = 44
+MESH_SHIFT = 24
+DEPTH_BITS = 24
+
+# Front-to-back mode sorts by depth first, in this many buckets (state second
+# within a bucket, so nearby draws of one mesh still batch):
+FRONT_TO_BACK_BUCKET_BITS = 6
+
+
+def pack_sort_keys(pipeline_ids: np.ndarray,
+                   bind_group_ids: np.ndarray,
+                   mesh_ids: np.ndarray,
+                   depths: np.ndarray) -> np.ndarray:
+    return ((pipeline_ids.astype(np.uint64) << np.uint64(PIPELINE_SHIFT)) |
+            (bind_group_ids.astype(np.uint64) << np.uint64(BIND_GROUP_SHIFT)) |
+            (mesh_ids.astype(np.uint64) << np.uint64(MESH_SHIFT)) |
+            depths.astype(np.uint64))
+
+
+def quantize_depths(depths: np.ndarray, near: float, far: float) -> np.ndarray:
+    normalized = np.clip((depths - near) / (far - near), 0.0, 1.0)
+    return (normalized * ((1 << DEPTH_BITS) - 1)).astype(np.uint64)
+
+
+class IdRegistry:
+    """Hands out small integer ids for objects, ids are recycled once an object dies."""
+    def __init__(self, bits: int) -> None:
+        self.limit = 1 << bits
+        self._ids = weakref.WeakKeyDictionary()
+        self._free_ids: list[int] = []
+        self._next_id = 0
+
+    def id_of(self, obj) -> int:
+        object_id = self._ids.get(obj)
+        if object_id is None:
+            if self._free_ids:
+                object_id = self._free_ids.pop()
+            else:
+                object_id = self._next_id % self.limit
+                self._next_id += 1
+            self._ids[obj] = object_id
+            weakref.finalize(obj, self._free_ids.append, object_id)
+        return object_id
+
+
+class DrawList:
+    """Entities sorted by their sort keys, with the mesh (LOD) each one is drawn with."""
+    def __init__(self, entities: list, rows: np.ndarray, keys: np.ndarray, meshes: list | None = None) -> None:
+        self.entities = entities
+        self.rows = rows
+        self.keys = keys
+        self.meshes = meshes if meshes is not None else [entity.mesh for entity in entities]
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def slice(self, start: int, end: int) -> "DrawList":
+        return DrawList(self.entities[start:end], self.rows[start:end], self.keys[start:end],
+                        self.meshes[start:end])
+
+    def batches(self) -> list[tuple[int, int]]:
+        """[start, end) runs of draws sharing pipeline, bind group and mesh."""
+        if not self.entities:
+            return []
+        state_keys = self.keys >> np.uint64(DEPTH_BITS)
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(state_keys)) + 1, [len(self.entities)]])
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+class RenderQueue:
+    """Sorts draws by packed 64-bit keys and records them with minimal state changes."""
+    def __init__(self) -> None:
+        self.pipeline_ids = IdRegistry(64 - PIPELINE_SHIFT)
+        self.bind_group_ids = IdRegistry(PIPELINE_SHIFT - BIND_GROUP_SHIFT)
+        self.mesh_ids = IdRegistry(BIND_GROUP_SHIFT - MESH_SHIFT)
+
+    def build(self,
+              entities: list,
+              rows: np.ndarray,
+              camera,
+              transforms,
+              meshes: list | None = None,
+              front_to_back: bool = False) -> DrawList:
+        """`meshes` overrides the mesh of every entity, e.g. with one of its LODs.
+        With `front_to_back` near draws come first regardless of their state,
+        so the depth test rejects more of the fragments behind them."""
+        count = len(entities)
+        if count == 0:
+            return DrawList([], rows, np.zeros(0, dtype=np.uint64), [])
+
+        if meshes is None:
+            meshes = [entity.mesh for entity in entities]
+        pipeline_ids = np.fromiter((self.pipeline_ids.id_of(mesh.layout) for mesh in meshes),
+                                   dtype=np.uint64, count=count)
+        mesh_ids = np.fromiter((self.mesh_ids.id_of(mesh) for mesh in meshes), dtype=np.uint64, count=count)
+
+        # Only the camera is bound per pass right now, materials will go here:
+        bind_group_ids = np.full(count, self.bind_group_ids.id_of(camera), dtype=np.uint64)
+
+        # View depth of the bounding sphere centers:
+        offsets = transforms.world_centers[rows] - np.asarray(camera.position, dtype=np.float32)
+        depths = offsets @ np.asarray(camera.front, dtype=np.float32)
+
+        quantized = quantize_depths(depths, camera.clip_near, camera.clip_far)
+        keys = pack_sort_keys(pipeline_ids, bind_group_ids, mesh_ids, quantized)
+        if front_to_back:
+            order = np.lexsort((keys, quantized >> np.uint64(DEPTH_BITS - FRONT_TO_BACK_BUCKET_BITS)))
+        else:
+            order = np.argsort(keys, kind="stable")
+        return DrawList([entities[i] for i in order], rows[order], keys[order], [meshes[i] for i in order])
+
+    def record(self,
+               encoder: wgpu.GPURenderPassEncoder | wgpu.GPURenderBundleEncoder,
+               draw_list: DrawList,
+               camera,
+               get_pipeline,
+               instance_buffer: wgpu.GPUBuffer | None = None) -> None:
+        """Records the draws, into a render pass or a render bundle.
+
+        With an `instance_buffer` (holding the matrices of `draw_list.rows`) every
+        batch becomes one instanced draw.
+        """
+        if not draw_list.entities:
+            return
+
+        # Set Camera for ALL objects:
+        encoder.set_bind_group(0, camera.bind_group, [], 0, 99)
+
+        pipeline = None
+        state = BindState()
+
+        # get_pipeline returns None for pipelines that are still being created,
+        # their draws are skipped this frame:
+        if instance_buffer is None:
+            for entity, mesh in zip(draw_list.entities, draw_list.meshes):
+                entity_pipeline = get_pipeline(mesh.layout)
+                if entity_pipeline is not pipeline:
+                    pipeline = entity_pipeline
+                    if pipeline is not None:
+                        encoder.set_pipeline(pipeline)
+                if pipeline is not None:
+                    entity.draw(encoder, state, mesh)
+            return
+
+        # One draw per batch, first_instance selects the range in the instance buffer:
+        encoder.set_vertex_buffer(1, instance_buffer)
+        for start, end in draw_list.batches():
+            mesh = draw_list.meshes[start]
+            batch_pipeline = get_pipeline(mesh.layout, instanced=True)
+            if batch_pipeline is None:
+                continue
+            if batch_pipeline is not pipeline:
+                pipeline = batch_pipeline
+                encoder.set_pipeline(pipeline)
+            mesh.draw(encoder, end - start, start, state)
@@ -1,16 +1,116 @@
+import time
+import logging
+from functools import partial
+from dataclasses import dataclass
 import wgpu
-from pathlib import Path
+import numpy as np
 from .context import GraphicsContext
+from .object_buffer import ObjectUniformRing
+from .mesh import VertexLayout
+from .pipeline_cache import PipelineCache, PipelineKey, DEFAULT_MANIFEST
+from .arena import GpuArena
+from .render_queue import RenderQueue, DrawList, PIPELINE_SHIFT
+from .culling import CullStats, extract_frustum_planes, cull_spheres
+from .gpu_timer import GpuTimer
+from .lod import LodSelector
+from .gpu_culling import GpuCuller, DEFINES as GPU_DRIVEN_DEFINES
+from .resolution import ResolutionController, RenderTarget
+from .overdraw import DEFINES as OVERDRAW_DEFINES
+from .resources import CATEGORY_INSTANCES, CATEGORY_TARGETS
+from core.profiler import Profiler
+from core.jobs import JobSystem
 from scene.scene import Scene
+from scene.transform import TransformStore
+
+logger = logging.getLogger(__name__)
+
+# Shader variant of the depth pre-pass (see shader.wgsl):
+DEPTH_ONLY_DEFINES = (("DEPTH_ONLY", ""),)
+
+
+@dataclass
+class FrameDraws:
+    """What is drawn this frame, collected once and recorded into every pass."""
+    scene: Scene
+    draw_list: DrawList | None = None  # None in GPU-driven mode
+    static: bool = False  # Replay the static bundles
+
 
 
 class Renderer:
-    def __init__(self, ctx: GraphicsContext):
+    def __init__(self,
+                 ctx: GraphicsContext,
+                 instanced: bool = False,
+                 profiler: Profiler | None = None,
+                 jobs: JobSystem | None = None,
+                 prewarm: bool = True):
         self.ctx = ctx
 
+        # Optional worker pool for transform updates and culling:
+        self.jobs = jobs
+
+        # CPU markers and GPU pass timings, the timer is created once profiling is enabled:
+        self.profiler = profiler or Profiler()
+        self.gpu_timer: GpuTimer = None
+
+        # Instanced mode groups all entities sharing a mesh into one draw call:
+        self.instanced = instanced
+        self.instance_buffer: wgpu.GPUBuffer = None
+        self.static_instance_buffer: wgpu.GPUBuffer = None
+
+        # Draws are sorted by state and depth before they are recorded:
+        self.queue = RenderQueue()
+
+        # Static entities are recorded once into a render bundle and replayed:
+        self.static_bundles = True
+        self.static_bundle: wgpu.GPURenderBundle = None
+        self.static_depth_bundle: wgpu.GPURenderBundle = None  # For the depth pre-pass
+        self._static_bundle_signature = None
+        self._static_bundle_version = 0
+
+        # Large draw lists are recorded into one bundle per chunk on the job
+        # system workers, then executed in order (same output as serial recording):
+        self.parallel_recording = True
+        self.min_bundle_draws = 1024
+
+        # Transforms of all entities:
+        self.transforms = TransformStore(jobs=jobs)
+
+        # Big vertex/index buffers meshes are suballocated from:
+        self.arena = GpuArena(self.ctx.device)
+
+        # View-frustum culling and its counters of the last frame:
+        self.culling = True
+        self.cull_stats = CullStats()
+
+        # Entities are drawn with the LOD (Mesh.lods) matching their size on screen:
+        self.lods = True
+        self.lod_selector = LodSelector()
+
+        # GPU-driven mode culls on the GPU and draws every mesh with one indirect
+        # draw, without static bundles, LODs or instancing (see gpu_culling):
+        self.gpu_driven = False
+        self.gpu_culler: GpuCuller = None
+
+        # Dynamic resolution renders into an offscreen target at a scale picked
+        # from the frame times (GPU timestamps if available) and blits it to the
+        # screen, see resolution:
+        self.dynamic_resolution = False
+        self.resolution = ResolutionController()
+        self.render_target: RenderTarget = None
+        self._frame_start = 0.0
+
+        # Overdraw: face culling of all pipelines (meshes are wound counter-clockwise),
+        # opaque draws sorted front-to-back instead of by state, a depth-only
+        # pre-pass after which the color pass only shades the visible fragments,
+        # and a debug mode that shows the shaded fragments per pixel (see overdraw):
+        self.cull_mode = wgpu.CullMode.none
+        self.front_to_back = False
+        self.depth_prepass = False
+        self.debug_overdraw = False
+
         # Depth Texture and stencil:
         self.depth_format = wgpu.TextureFormat.depth24plus
-        self.depth_stencil = self._create_depth_stencil()
         self.depth_texture: wgpu.GPUTexture = None
         self.depth_view: wgpu.GPUTexture = None
 
@@ -18,120 +118,453 @@ class Renderer:
         self.global_bgl = self._create_global_layout()
         self.object_bgl = self._create_object_layout()
 
-        # Compile shader:
-        self.shader = self._compile_shader("shader.wgsl")
+        # Per-object data of all entities, triple-buffered (one region per frame in flight):
+        self.objects = ObjectUniformRing(self.ctx.device, self.object_bgl, frames_in_flight=3)
 
-        # Pipeline configurations:
-        self.vb_layout = self._create_vb_layout()
-        self.vertex_config = self._create_vertex_config()
-        self.primitive_config = self._create_primitive_config()
-        self.fragment_config = self._create_fragment_config()
+        # Buffers and textures of the device, released resources wait for the
+        # frames in flight (see resources):
+        self.resources = ctx.resources
+        self.resources.frames_in_flight = self.objects.frames_in_flight
 
-        self.pipeline = self._create_pipeline()
+        # Shader variants and pipelines, the ones in the manifest are created in
+        # the background right away (unless the caller prewarms them itself),
+        # everything else on first use:
+        self.shader = "shader.wgsl"
+        self.pipeline_cache = PipelineCache(self.ctx.device)
+        if prewarm:
+            self.prewarm_pipelines()
+
+        # With async pipelines, draws are skipped until their pipeline is ready
+        # instead of stalling the frame:
+        self.async_pipelines = False
+
+        # (vertex layout, instanced, depth only, pass state) -> pipeline, in front of the cache:
+        self.pipelines: dict[tuple, wgpu.GPURenderPipeline] = {}
     
     def render(self, scene: Scene) -> None:
-        current_texture: wgpu.GPUTexture = self.ctx.present_context.get_current_texture()
+        self.submit(self.encode_frame(scene))
+
+    def encode_frame(self, scene: Scene) -> wgpu.GPUCommandBuffer:
+        with self.profiler.scope("encode"):
+            return self._encode_frame(scene)
+
+    def submit(self, command_buffer: wgpu.GPUCommandBuffer) -> None:
+        with self.profiler.scope("submit"):
+            self.ctx.device.queue.submit([command_buffer])
+            self.objects.advance()
+            self.resources.end_frame()
+
+            timings = None
+            if self.gpu_timer:
+                timings = self.gpu_timer.advance()
+                if timings:
+                    self.profiler.add_gpu_times(*timings)
+
+            if self.dynamic_resolution:
+                self._update_resolution(timings)
+
+    def _encode_frame(self, scene: Scene) -> wgpu.GPUCommandBuffer:
+        self._frame_start = time.perf_counter()
+        current_texture: wgpu.GPUTexture = self.ctx.get_current_texture()
         command_encoder = self.ctx.device.create_command_encoder(label="COMMAND_ENCODER")
 
         width, height, _ = current_texture.size
-        self._update_depth_buffer(width, height)
+        target = None
+        if self.dynamic_resolution:
+            if self.render_target is None:
+                self.render_target = RenderTarget(self.ctx.device, self.ctx.render_format, self.depth_format,
+                                                  self.pipeline_cache.preprocessor)
+            target = self.render_target
+            viewport = target.update(width, height, self.resolution.scale)
+            color_view, depth_view = target.color_view, target.depth_view
+        else:
+            self._update_depth_buffer(width, height)
+            viewport = None
+            color_view, depth_view = current_texture.create_view(), self.depth_view
+        self.prepare(command_encoder, scene)
+        draws = self.collect(scene)
+
+        timed = self.profiler.enabled or self.dynamic_resolution
+        if timed and self.gpu_timer is None:
+            self.gpu_timer = GpuTimer(self.ctx.device, frames_in_flight=self.objects.frames_in_flight)
+
+        # The pre-pass fills the depth buffer, the color pass keeps it:
+        if self.depth_prepass:
+            depth_pass = self._begin_pass(command_encoder, "DEPTH_PREPASS", None, depth_view, viewport, timed)
+            self.record(depth_pass, draws, depth_only=True)
+            depth_pass.end()
+
+        render_pass = self._begin_pass(command_encoder, "RENDER_PASS", color_view, depth_view, viewport, timed,
+                                       clear_depth=not self.depth_prepass)
+        self.record(render_pass, draws)
+        render_pass.end()
+
+        if target is not None:
+            blit_timestamp_writes = self.gpu_timer.timestamp_writes("BLIT_PASS") if timed else None
+            target.blit(command_encoder, current_texture.create_view(), blit_timestamp_writes)
+
+        if timed:
+            self.gpu_timer.resolve(command_encoder, self.profiler.frame_index)
+        return command_encoder.finish(label="DRAW_COMMAND")
+
+    def _begin_pass(self,
+                    command_encoder: wgpu.GPUCommandEncoder,
+                    label: str,
+                    color_view: wgpu.GPUTextureView | None,
+                    depth_view: wgpu.GPUTextureView,
+                    viewport: tuple[int, int] | None,
+                    timed: bool,
+                    clear_depth: bool = True) -> wgpu.GPURenderPassEncoder:
+        color_attachments = []
+        if color_view is not None:
+            color_attachments.append(wgpu.RenderPassColorAttachment(
+                view=color_view,
+                load_op=wgpu.LoadOp.clear,
+                store_op=wgpu.StoreOp.store,
+                clear_value=(0.0, 0.0, 0.0, 1.0),
+            ))
 
         render_pass = command_encoder.begin_render_pass(
-            label="RENDER_PASS",
-            color_attachments=[
-                wgpu.RenderPassColorAttachment(
-                    view=current_texture.create_view(),
-                    load_op=wgpu.LoadOp.clear,
-                    store_op=wgpu.StoreOp.store,
-                    clear_value=(0.0, 0.0, 0.0, 1.0),
-                )
-            ],
+            label=label,
+            color_attachments=color_attachments,
             depth_stencil_attachment=wgpu.RenderPassDepthStencilAttachment(
-                view=self.depth_view,
+                view=depth_view,
                 depth_clear_value=1.0,
-                depth_load_op=wgpu.LoadOp.clear,
+                depth_load_op=wgpu.LoadOp.clear if clear_depth else wgpu.LoadOp.load,
                 depth_store_op=wgpu.StoreOp.store,
-            )
+            ),
+            timestamp_writes=self.gpu_timer.timestamp_writes(label) if timed else None,
         )
-        render_pass.set_pipeline(self.pipeline)
+        if viewport is not None:
+            render_pass.set_viewport(0, 0, *viewport, 0.0, 1.0)
+            render_pass.set_scissor_rect(0, 0, *viewport)
+        return render_pass
 
-        # Set Camera for ALL objects:
-        render_pass.set_bind_group(0, scene.camera.bind_group, [], 0, 99)
+    def prepare(self, command_encoder: wgpu.GPUCommandEncoder, scene: Scene) -> None:
+        """Records the work that has to run before the render pass (the GPU culling)."""
+        if not self.gpu_driven:
+            return
 
-        # Iterate over all objects of a scene and draw them.
-        for entity in scene.entities:
-            entity.draw(render_pass)
+        with self.profiler.scope("gpu_cull"):
+            if self.gpu_culler is None:
+                self.gpu_culler = GpuCuller(self.ctx.device, self.arena, self.pipeline_cache.preprocessor)
+            self.gpu_culler.update(scene, self.transforms, self.culling)
+            self.gpu_culler.dispatch(command_encoder)
 
-        render_pass.end()
-        self.ctx.device.queue.submit([command_encoder.finish(label="DRAW_COMMAND")])
+    def encode(self, render_pass: wgpu.GPURenderPassEncoder, scene: Scene) -> None:
+        """Records the draws of `scene` into one render pass (no depth pre-pass)."""
+        self.record(render_pass, self.collect(scene))
+
+    def collect(self, scene: Scene) -> FrameDraws:
+        """Culls, selects the LODs and sorts the draws of this frame."""
+        profiler = self.profiler
+        if self.gpu_driven:
+            # Only the GPU knows what is drawn, see GpuCuller.read_visible:
+            self.cull_stats = CullStats(tested=len(scene.entities))
+            return FrameDraws(scene)
+
+        with profiler.scope("upload"):
+            self.objects.sync(self.transforms)
+
+        rows = scene.rows
+        with profiler.scope("cull"):
+            ids = self._cull(scene)
+
+        # Entities whose mesh is still streaming in (without a placeholder) are skipped:
+        drawable = self.transforms.drawable[rows]
+        ids = ids[drawable[ids]]
+
+        # Static entities are not culled, they are replayed from the bundle:
+        static_ids = np.zeros(0, dtype=np.int64)
+        if self.static_bundles:
+            static_mask = self.transforms.static[rows]
+            static_ids = np.flatnonzero(static_mask & drawable)
+            ids = ids[~static_mask[ids]]
+
+        entities = [scene.entities[i] for i in ids]
+        static_entities = [scene.entities[i] for i in static_ids]
+        with profiler.scope("lod"):
+            static_meshes = self._select_lods(static_entities, rows[static_ids], scene.camera)
+            static_lods_changed = self.lods and self.lod_selector.changed
+            meshes = self._select_lods(entities, rows[ids], scene.camera)
+
+        drawn = len(ids) + len(static_ids)
+        triangles = sum(mesh.triangle_count for mesh in meshes) + sum(mesh.triangle_count for mesh in static_meshes)
+        self.cull_stats = CullStats(tested=len(rows), culled=len(rows) - drawn, drawn=drawn, triangles=triangles)
+
+        if len(static_ids):
+            with profiler.scope("static_bundle"):
+                self._update_static_bundles(scene, static_ids, static_entities, static_meshes, static_lods_changed)
+
+        with profiler.scope("sort"):
+            draw_list = self.queue.build(entities, rows[ids], scene.camera, self.transforms, meshes,
+                                         front_to_back=self.front_to_back)
+        return FrameDraws(scene, draw_list, static=len(static_ids) > 0)
+
+    def record(self, render_pass: wgpu.GPURenderPassEncoder, draws: FrameDraws, depth_only: bool = False) -> None:
+        """Records the collected draws, with the depth-only pipelines for the pre-pass."""
+        scene = draws.scene
+        with self.profiler.scope("record"):
+            if self.gpu_driven:
+                self.gpu_culler.draw(render_pass, scene.camera,
+                                     partial(self._get_gpu_driven_pipeline, depth_only=depth_only))
+                return
+
+            # Executing bundles resets the pass state, so they go first:
+            if draws.static:
+                render_pass.execute_bundles([self.static_depth_bundle if depth_only else self.static_bundle])
+
+            draw_list = draws.draw_list
+            if self._record_in_parallel(draw_list):
+                render_pass.execute_bundles(self._record_bundles(draw_list, scene, depth_only))
+            else:
+                self._record(render_pass, draw_list, scene, depth_only=depth_only)
+
+    def prewarm_pipelines(self, manifest=DEFAULT_MANIFEST) -> int:
+        return self.pipeline_cache.prewarm(manifest, self._pipeline_key)
+
+    def get_pipeline(self,
+                     layout: VertexLayout,
+                     instanced: bool = False,
+                     block: bool = True,
+                     depth_only: bool = False) -> wgpu.GPURenderPipeline | None:
+        key = (layout.name, instanced, depth_only, self.cull_mode, self.depth_prepass, self.debug_overdraw)
+        pipeline = self.pipelines.get(key)
+        if pipeline is None:
+            pipeline_key = self._pipeline_key(self.shader, layout, instanced, depth_only=depth_only)
+            pipeline = self.pipeline_cache.get(pipeline_key, block)
+            if pipeline is not None:
+                self.pipelines[key] = pipeline
+        return pipeline
+
+    def _pipeline_key(self,
+                      shader: str,
+                      layout: VertexLayout,
+                      instanced: bool,
+                      defines: tuple = (),
+                      depth_only: bool = False) -> PipelineKey:
+        # No object bind group in instanced mode, the model matrix comes from the instance buffer:
+        bind_group_layouts = (self.global_bgl,) if instanced else (self.global_bgl, self.object_bgl)
+        if GPU_DRIVEN_DEFINES[0] in defines:
+            bind_group_layouts = (self.global_bgl, self.gpu_culler.draw_layout)
+
+        # The pre-pass writes the depth only, after it the color pass only shades
+        # the fragments whose depth is equal to the stored one:
+        color_formats = (self.ctx.render_format,)
+        depth_write, depth_compare = True, wgpu.CompareFunction.less
+        if depth_only:
+            defines += DEPTH_ONLY_DEFINES
+            color_formats = ()
+        elif self.depth_prepass:
+            depth_write, depth_compare = False, wgpu.CompareFunction.equal
+        if self.debug_overdraw and not depth_only:
+            defines += OVERDRAW_DEFINES
+
+        return PipelineKey(
+            shader=shader,
+            layout=layout,
+            instanced=instanced,
+            defines=tuple(sorted(defines)),
+            color_formats=color_formats,
+            depth_format=self.depth_format,
+            depth_write=depth_write,
+            depth_compare=depth_compare,
+            cull_mode=self.cull_mode,
+            additive=self.debug_overdraw and not depth_only,
+            bind_group_layouts=bind_group_layouts,
+        )
+
+    def _get_frame_pipeline(self,
+                            layout: VertexLayout,
+                            instanced: bool = False,
+                            depth_only: bool = False) -> wgpu.GPURenderPipeline | None:
+        return self.get_pipeline(layout, instanced, block=not self.async_pipelines, depth_only=depth_only)
+
+    def _get_gpu_driven_pipeline(self, layout: VertexLayout, depth_only: bool = False) -> wgpu.GPURenderPipeline | None:
+        key = self._pipeline_key(self.shader, layout, False, GPU_DRIVEN_DEFINES, depth_only)
+        return self.pipeline_cache.get(key, block=not self.async_pipelines)
+
+    def _select_lods(self, entities: list, rows: np.ndarray, camera) -> list:
+        """The mesh every entity is drawn with this frame."""
+        meshes = [entity.mesh for entity in entities]
+        if not self.lods or len(rows) == 0:
+            return meshes
+
+        levels = self.lod_selector.select(rows, self.transforms, camera)
+        for i in np.flatnonzero(levels).tolist():
+            lods = meshes[i].lods
+            if lods:
+                meshes[i] = lods[min(int(levels[i]), len(lods)) - 1]
+        return meshes
+
+    def _cull(self, scene: Scene) -> np.ndarray:
+        """Returns the indices of the visible entities in `scene.entities`."""
+        if not self.culling or not scene.entities:
+            return np.arange(len(scene.entities))
+
+        camera = scene.camera
+        planes = extract_frustum_planes(camera.get_view_matrix(), camera.get_projection_matrix())
+
+        if scene.bvh is not None:
+            # Sub-linear, only subtrees intersecting the frustum are visited:
+            return scene.query_frustum_ids(planes)
+
+        # Test the world space bounding spheres of all entities at once:
+        rows = scene.rows
+        centers, radii = self.transforms.world_centers, self.transforms.world_radii
+        if self.jobs is None:
+            return np.flatnonzero(cull_spheres(planes, centers[rows], radii[rows]))
+
+        visible = np.empty(len(rows), dtype=bool)
+
+        def cull_range(start: int, end: int) -> None:
+            chunk = rows[start:end]
+            visible[start:end] = cull_spheres(planes, centers[chunk], radii[chunk])
+
+        self.jobs.parallel_for(len(rows), cull_range, chunk_size=16384)
+        return np.flatnonzero(visible)
+
+    def _record(self, encoder, draw_list: DrawList, scene: Scene, static: bool = False,
+                depth_only: bool = False) -> None:
+        instance_buffer = None
+        if self.instanced and draw_list.entities:
+            # Upload ALL instance data with one single write, in the first pass of the frame:
+            instance_data = self.transforms.matrices[draw_list.rows]
+            instance_buffer = self._update_instance_buffer(instance_data.nbytes, static)
+            if depth_only or not self.depth_prepass:
+                self.ctx.device.queue.write_buffer(instance_buffer, 0, instance_data.tobytes())
+
+        # Bundles are reused, so they must not miss draws of pending pipelines:
+        get_pipeline = self._get_frame_pipeline if not static else self.get_pipeline
+        self.queue.record(encoder, draw_list, scene.camera, partial(get_pipeline, depth_only=depth_only),
+                          instance_buffer)
+
+    def _update_static_bundles(self,
+                               scene: Scene,
+                               static_ids: np.ndarray,
+                               entities: list,
+                               meshes: list,
+                               lods_changed: bool) -> None:
+        """Re-records the static bundle (and its depth-only twin for the pre-pass) if needed."""
+        # Everything the recorded commands depend on:
+        signature = (id(scene), scene.version, self.transforms.static_version, self.instanced,
+                     self.lods, self.objects.bind_group, scene.camera.bind_group, self.arena.generation,
+                     self.cull_mode, self.depth_prepass, self.debug_overdraw)
+        static_rows = scene.rows[static_ids]
+        moved = np.any(self.transforms.row_versions[static_rows] > self._static_bundle_version)
+
+        if self.static_bundle and signature == self._static_bundle_signature and not moved and not lods_changed:
+            return
+
+        draw_list = self.queue.build(entities, static_rows, scene.camera, self.transforms, meshes)
+        self.static_depth_bundle = None
+        if self.depth_prepass:
+            bundle_encoder = self._create_bundle_encoder("STATIC_DEPTH_BUNDLE_ENCODER", depth_only=True)
+            self._record(bundle_encoder, draw_list, scene, static=True, depth_only=True)
+            self.static_depth_bundle = bundle_encoder.finish(label="STATIC_DEPTH_BUNDLE")
+
+        bundle_encoder = self._create_bundle_encoder("STATIC_BUNDLE_ENCODER")
+        self._record(bundle_encoder, draw_list, scene, static=True)
+
+        # NOTE: The recorded dynamic offsets point into the region of the current
+        #       frame, which stays valid until one of the static entities moves.
+        self.static_bundle = bundle_encoder.finish(label="STATIC_BUNDLE")
+        self._static_bundle_signature = signature
+        self._static_bundle_version = self.transforms.version
+
+    def _record_in_parallel(self, draw_list: DrawList) -> bool:
+        # Instanced draw lists are one draw per batch, not worth splitting:
+        return (self.parallel_recording and not self.instanced and self.jobs is not None
+                and self.jobs.workers > 0 and len(draw_list) >= 2 * self.min_bundle_draws)
+
+    def _record_bundles(self,
+                        draw_list: DrawList,
+                        scene: Scene,
+                        depth_only: bool = False) -> list[wgpu.GPURenderBundle]:
+        """Records chunks of the draw list into bundles on the job system workers."""
+        # Create missing pipelines up front, so the workers only read the cache
+        # (with async pipelines the draws of the ones still compiling are skipped):
+        pipeline_ids = draw_list.keys >> np.uint64(PIPELINE_SHIFT)
+        for i in np.unique(pipeline_ids, return_index=True)[1]:
+            self.get_pipeline(draw_list.meshes[i].layout, block=not self.async_pipelines, depth_only=depth_only)
+        get_pipeline = partial(self.get_pipeline, block=False, depth_only=depth_only)
+
+        chunk_count = min(self.jobs.workers + 1, len(draw_list) // self.min_bundle_draws)
+        bounds = np.linspace(0, len(draw_list), chunk_count + 1).astype(int).tolist()
+        bundles: list[wgpu.GPURenderBundle] = [None] * chunk_count
+
+        def record_chunks(start: int, end: int) -> None:
+            for chunk in range(start, end):
+                bundle_encoder = self._create_bundle_encoder(f"BUNDLE_ENCODER_{chunk}", depth_only)
+                self.queue.record(bundle_encoder, draw_list.slice(bounds[chunk], bounds[chunk + 1]),
+                                  scene.camera, get_pipeline)
+                bundles[chunk] = bundle_encoder.finish(label=f"BUNDLE_{chunk}")
+
+        self.jobs.parallel_for(chunk_count, record_chunks, chunk_size=1)
+        return bundles
+
+    def _create_bundle_encoder(self, label: str, depth_only: bool = False) -> wgpu.GPURenderBundleEncoder:
+        return self.ctx.device.create_render_bundle_encoder(
+            label=label,
+            color_formats=[] if depth_only else [self.ctx.render_format],
+            depth_stencil_format=self.depth_format,
+        )
+
+    def _update_instance_buffer(self, size: int, static: bool = False) -> wgpu.GPUBuffer:
+        # The static bundle keeps its own instance buffer:
+        buffer = self.static_instance_buffer if static else self.instance_buffer
+        if buffer and buffer.size >= size:
+            return buffer
+
+        # Grow in powers of two, so we don't reallocate every time an entity is added:
+        capacity = 64 * 256
+        while capacity < size:
+            capacity *= 2
+
+        if buffer:
+            self.resources.release_later(buffer)
+
+        buffer = self.resources.track(self.ctx.device.create_buffer(
+            label="STATIC_INSTANCE_BUFFER" if static else "INSTANCE_BUFFER",
+            size=capacity,
+            usage=wgpu.BufferUsage.VERTEX | wgpu.BufferUsage.COPY_DST,
+        ), CATEGORY_INSTANCES, self)
+        if static:
+            self.static_instance_buffer = buffer
+        else:
+            self.instance_buffer = buffer
+        return buffer
+
+    def _update_resolution(self, timings: tuple[int, list] | None) -> None:
+        # GPU time of the frame's passes, without timestamp queries the CPU time
+        # from acquiring the texture (which blocks while the GPU is behind) to submitting:
+        if self.gpu_timer is not None and self.gpu_timer.supported:
+            if not timings:
+                return
+            frame_ms = sum(end - start for _, start, end in timings[1]) / 1e6
+        else:
+            frame_ms = (time.perf_counter() - self._frame_start) * 1000.0
+        self.resolution.update(frame_ms)
 
     def _update_depth_buffer(self, width: int, height: int) -> None:
         # Depth buffer has to be always the size of the screen, otherwise
         # wgpu crashes...
         if self.depth_texture and self.depth_texture.size == (width, height, 1):
             return
-        
-        print(f"Recreating depth buffer: {width}x{height}")
 
-        self.depth_texture = self.ctx.device.create_texture(
+        logger.debug("Recreating depth buffer: %dx%d", width, height)
+
+        if self.depth_texture:
+            self.resources.release_later(self.depth_texture)
+
+        self.depth_texture = self.resources.track(self.ctx.device.create_texture(
             label="DEPTH_TEXTURE",
             size=(width, height, 1),
             usage=wgpu.TextureUsage.RENDER_ATTACHMENT,
             format=self.depth_format,
-        )
+        ), CATEGORY_TARGETS, self)
         self.depth_view = self.depth_texture.create_view()
 
-    def _compile_shader(self, shader_path: str) -> wgpu.GPUShaderModule:
-        code = Path(shader_path).read_text()
-        return self.ctx.device.create_shader_module(label="SHADER", code=code)
-
-    def _create_vertex_config(self) -> wgpu.VertexState:
-        return wgpu.VertexState(
-            module=self.shader,
-            entry_point="vs_main",
-            buffers=[self.vb_layout],
-        )
-
-    def _create_vb_layout(self) -> wgpu.VertexBufferLayout:
-        position_attrib = wgpu.VertexAttribute(
-            format=wgpu.VertexFormat.float32x3,
-            offset=0,
-            shader_location=0,
-        )
-        color_attrib = wgpu.VertexAttribute(
-            format=wgpu.VertexFormat.float32x3,
-            offset=12,  # 3 floats (4 bytes) offset
-            shader_location=1,
-        )
-        
-        return wgpu.VertexBufferLayout(
-            array_stride=24,  # 6 floats * 4 bytes
-            step_mode=wgpu.VertexStepMode.vertex,
-            attributes=[position_attrib, color_attrib],
-        )
-    
-    def _create_primitive_config(self):
-        # The default config is just fine :)
-        return wgpu.PrimitiveState()
-    
-    def _create_fragment_config(self):
-        color_target = wgpu.ColorTargetState(
-            format=self.ctx.render_format,
-            blend=wgpu.BlendState(color={}, alpha={}),
-        )
-        return wgpu.FragmentState(
-            module=self.shader,
-            entry_point="fs_main",
-            targets=[color_target],
-        )
-
-    def _create_depth_stencil(self) -> wgpu.DepthStencilState:
-        return wgpu.DepthStencilState(
-            format=self.depth_format,
-            depth_write_enabled=True,
-            depth_compare=wgpu.CompareFunction.less,
-        )
-    
     def _create_global_layout(self) -> wgpu.GPUBindGroupLayout:
         return self.ctx.device.create_bind_group_layout(
             label="GLOBAL_BIND_GROUP_LAYOUT",
@@ -145,29 +578,17 @@ class Renderer:
         )
 
     def _create_object_layout(self) -> wgpu.GPUBindGroupLayout:
+        # Bound once per frame, entities select their slot with a dynamic offset:
         return self.ctx.device.create_bind_group_layout(
             label="OBJECT_BIND_GROUP_LAYOUT",
             entries=[
                 wgpu.BindGroupLayoutEntry(
                     binding=0,
                     visibility=wgpu.ShaderStage.VERTEX,
-                    buffer=wgpu.BufferBindingLayout(),
+                    buffer=wgpu.BufferBindingLayout(
+                        type=wgpu.BufferBindingType.uniform,
+                        has_dynamic_offset=True,
+                    ),
                 ),
             ],
         )
-    
-    def _create_pipeline(self) -> wgpu.GPURenderPipeline:
-        pipeline_layout = self.ctx.device.create_pipeline_layout(
-            label="PIPELINE_LAYOUT",
-            bind_group_layouts=[self.global_bgl, self.object_bgl],
-        )
-        
-        return self.ctx.device.create_render_pipeline(
-            label="RENDER_PIPELINE",
-            layout=pipeline_layout,
-            vertex=self.vertex_config,
-            primitive=self.primitive_config,
-            depth_stencil=self.depth_stencil,
-            multisample=None,
-            fragment=self.fragment_config,
-        )
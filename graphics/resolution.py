@@ -0,0 +1,223 @@
+"""Dynamic resolution: the scene is rendered into an offscreen target at a
+fraction of the window size and stretched onto the presentation texture.
+
+The fraction (render scale) is picked by a `ResolutionController` from the
+measured frame times. It only moves in steps, one at a time and with
+hysteresis, so it settles instead of oscillating around the budget. The
+offscreen textures are as large as the window, a lower scale only renders into
+(and samples) their top left part, so changing the scale never reallocates.
+"""
+import time
+import logging
+from collections import deque
+import wgpu
+import numpy as np
+from .shader_preprocessor import ShaderPreprocessor
+from .resources import resources_of, CATEGORY_TARGETS
+
+logger = logging.getLogger(__name__)
+
+# Render scales the controller chooses from (per axis):
+SCALE_STEPS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+PARAMS_SIZE = 16  # uv scale + uv max, see blit.wgsl
+
+
+class ResolutionController:
+    """Picks the render scale that keeps the frame time within `target_ms`.
+
+    Every decision averages `window` frames measured at the current scale:
+    above the budget (plus `tolerance`) the scale drops one step. It rises one
+    step only if the average, grown by the pixel count of the next step, still
+    fits into the budget, which overestimates (not everything scales with the
+    pixels) and so keeps it from bouncing between two steps. Frame times arrive
+    a few frames late (GPU timestamps), so `latency` samples after every change
+    are still from the old scale and are skipped.
+    """
+    def __init__(self,
+                 target_ms: float = 1000.0 / 60.0,
+                 steps: tuple[float, ...] = SCALE_STEPS,
+                 window: int = 15,
+                 tolerance: float = 0.05,
+                 latency: int = 3) -> None:
+        self.target_ms = target_ms
+        self.steps = tuple(sorted(steps))
+        self.tolerance = tolerance
+        self.latency = latency
+        self.level = len(self.steps) - 1  # Start at the highest scale
+        self.changes = 0  # Number of scale changes so far
+
+        self._samples: deque[float] = deque(maxlen=window)
+        self._skip = 0
+
+    @property
+    def scale(self) -> float:
+        return self.steps[self.level]
+
+    def update(self, frame_ms: float) -> bool:
+        """Adds the time of one frame, returns True if the scale changed."""
+        if self._skip > 0:
+            self._skip -= 1
+            return False
+
+        samples = self._samples
+        samples.append(frame_ms)
+        if len(samples) < samples.maxlen:
+            return False
+
+        average = sum(samples) / len(samples)
+        if average > self.target_ms * (1.0 + self.tolerance) and self.level > 0:
+            self.level -= 1
+        elif self.level < len(self.steps) - 1 and average * self._pixel_ratio() <= self.target_ms:
+            self.level += 1
+        else:
+            return False
+
+        self.changes += 1
+        self.reset()
+        return True
+
+    def _pixel_ratio(self) -> float:
+        """Pixels at the next higher step / pixels at the current one."""
+        return (self.steps[self.level + 1] / self.steps[self.level]) ** 2
+
+    def reset(self) -> None:
+        """Forgets the measured frames, e.g. after a pause."""
+        self._samples.clear()
+        self._skip = self.latency
+
+
+class RenderTarget:
+    """Offscreen color and depth textures and the pass that blits them onto the
+    presentation texture.
+
+    Window size changes are debounced: while the window is being resized the
+    textures keep their size (the blit stretches them) and are only reallocated
+    once the size did not change for `debounce` seconds.
+    """
+    def __init__(self,
+                 device: wgpu.GPUDevice,
+                 color_format: wgpu.TextureFormat,
+                 depth_format: wgpu.TextureFormat,
+                 preprocessor: ShaderPreprocessor | None = None,
+                 debounce: float = 0.15) -> None:
+        self.device = device
+        self.color_format = color_format
+        self.depth_format = depth_format
+        self.debounce = debounce
+
+        self.size: tuple[int, int] | None = None  # Size of the textures
+        self.viewport = (0, 0)  # Part of the textures rendered into
+        self.reallocations = 0
+        self.textures: list[wgpu.GPUTexture] = []
+        self.color_view: wgpu.GPUTextureView = None
+        self.depth_view: wgpu.GPUTextureView = None
+        self._pending: tuple[tuple[int, int], float] | None = None  # New window size and when it was first seen
+
+        preprocessor = preprocessor or ShaderPreprocessor()
+        module = device.create_shader_module(label="SHADER_BLIT", code=preprocessor.process("blit.wgsl"))
+        self.pipeline = device.create_render_pipeline(
+            label="BLIT_PIPELINE",
+            layout=wgpu.AutoLayoutMode.auto,
+            vertex=wgpu.VertexState(module=module, entry_point="vs_main", buffers=[]),
+            primitive=wgpu.PrimitiveState(topology=wgpu.PrimitiveTopology.triangle_list),
+            depth_stencil=None,
+            multisample=None,
+            fragment=wgpu.FragmentState(
+                module=module,
+                entry_point="fs_main",
+                targets=[wgpu.ColorTargetState(format=color_format)],
+            ),
+        )
+        self.sampler = device.create_sampler(label="BLIT_SAMPLER",
+                                             mag_filter=wgpu.FilterMode.linear,
+                                             min_filter=wgpu.FilterMode.linear)
+        self.params = resources_of(device).track(
+            device.create_buffer(label="BLIT_PARAMS_BUFFER", size=PARAMS_SIZE,
+                                 usage=wgpu.BufferUsage.UNIFORM | wgpu.BufferUsage.COPY_DST),
+            CATEGORY_TARGETS, self)
+        self.bind_group: wgpu.GPUBindGroup = None
+
+    def update(self, width: int, height: int, scale: float, now: float | None = None) -> tuple[int, int]:
+        """Follows the window size (debounced) and returns the viewport to render
+        into at `scale`."""
+        now = time.perf_counter() if now is None else now
+        size = (width, height)
+        if self.size is None:
+            self._allocate(size)
+        elif size == self.size:
+            self._pending = None
+        elif self._pending is None or self._pending[0] != size:
+            self._pending = (size, now)
+        elif now - self._pending[1] >= self.debounce:
+            self._allocate(size)
+
+        texture_width, texture_height = self.size
+        viewport = (max(1, round(texture_width * scale)), max(1, round(texture_height * scale)))
+        if viewport != self.viewport:
+            self.viewport = viewport
+            size = np.array(self.size, dtype=np.float32)
+            uv_scale = np.array(viewport, dtype=np.float32) / size
+            uv_max = (np.array(viewport, dtype=np.float32) - 0.5) / size
+            self.device.queue.write_buffer(self.params, 0, np.concatenate([uv_scale, uv_max]).tobytes())
+        return viewport
+
+    def blit(self,
+             command_encoder: wgpu.GPUCommandEncoder,
+             view: wgpu.GPUTextureView,
+             timestamp_writes: wgpu.RenderPassTimestampWrites | None = None) -> None:
+        """Records the pass that stretches the viewport over all of `view`."""
+        render_pass = command_encoder.begin_render_pass(
+            label="BLIT_PASS",
+            color_attachments=[
+                wgpu.RenderPassColorAttachment(
+                    view=view,
+                    load_op=wgpu.LoadOp.clear,
+                    store_op=wgpu.StoreOp.store,
+                    clear_value=(0.0, 0.0, 0.0, 1.0),
+                )
+            ],
+            timestamp_writes=timestamp_writes,
+        )
+        render_pass.set_pipeline(self.pipeline)
+        render_pass.set_bind_group(0, self.bind_group, [], 0, 99)
+        render_pass.draw(3, 1, 0, 0)
+        render_pass.end()
+
+    def _allocate(self, size: tuple[int, int]) -> None:
+        logger.debug("Recreating render target: %dx%d", *size)
+
+        self.size = size
+        self.viewport = (0, 0)  # Rewrites the blit parameters
+        self.reallocations += 1
+        self._pending = None
+
+        # Frames in flight still render into the old textures:
+        resources = resources_of(self.device)
+        for texture in self.textures:
+            resources.release_later(texture)
+
+        color = self.device.create_texture(
+            label="RENDER_TARGET_COLOR",
+            size=(*size, 1),
+            usage=wgpu.TextureUsage.RENDER_ATTACHMENT | wgpu.TextureUsage.TEXTURE_BINDING,
+            format=self.color_format,
+        )
+        depth = self.device.create_texture(
+            label="RENDER_TARGET_DEPTH",
+            size=(*size, 1),
+            usage=wgpu.TextureUsage.RENDER_ATTACHMENT,
+            format=self.depth_format,
+        )
+        self.textures = [resources.track(texture, CATEGORY_TARGETS, self) for texture in (color, depth)]
+        self.color_view = color.create_view()
+        self.depth_view = depth.create_view()
+        self.bind_group = self.device.create_bind_group(
+            label="BLIT_BIND_GROUP",
+            layout=self.pipeline.get_bind_group_layout(0),
+            entries=[
+                wgpu.BindGroupEntry(binding=0, resource=self.color_view),
+                wgpu.BindGroupEntry(binding=1, resource=self.sampler),
+                wgpu.BindGroupEntry(binding=2, resource=wgpu.BufferBinding(buffer=self.params)),
+            ],
+        )
@@ -0,0 +1,171 @@
+"""Bookkeeping of the GPU memory: every buffer and texture the engine creates is
+recorded with its label, size, category and owner, so a live report shows where
+the memory goes (see `ResourceRegistry.report`).
+
+Resources that frames in flight may still use are not destroyed right away:
+`release_later` and `defer` wait until the frames submitted so far retired,
+which the renderer signals with `end_frame` after every submit. There is one
+registry per device, `resources_of` returns it.
+"""
+import threading
+import weakref
+from dataclasses import dataclass
+import wgpu
+
+# Categories of the memory report:
+CATEGORY_MESHES = "meshes"  # Vertex and index buffers
+CATEGORY_INSTANCES = "instances"  # Per-draw matrices
+CATEGORY_UNIFORMS = "uniforms"  # Camera and per-object data
+CATEGORY_TARGETS = "render targets"  # Depth and offscreen color textures
+CATEGORY_STREAMING = "streaming"  # Staging buffers
+CATEGORY_CULLING = "culling"  # GPU-driven mode
+CATEGORY_PROFILING = "profiling"  # Timestamp readback
+
+# Bytes per texel of the texture formats, everything else is counted as 4:
+TEXEL_SIZES = {
+    wgpu.TextureFormat.rgba16float: 8,
+    wgpu.TextureFormat.rgba32float: 16,
+    wgpu.TextureFormat.r8unorm: 1,
+    wgpu.TextureFormat.rg8unorm: 2,
+}
+
+
+@dataclass
+class ResourceInfo:
+    label: str
+    category: str
+    size: int  # Bytes
+    owner: str  # Class name of the object that created it
+
+
+def resource_size(resource: wgpu.GPUBuffer | wgpu.GPUTexture) -> int:
+    if isinstance(resource, wgpu.GPUTexture):
+        width, height, layers = resource.size
+        texel_size = TEXEL_SIZES.get(resource.format, 4)
+        # A full mip chain adds a third:
+        mips = 4 / 3 if resource.mip_level_count > 1 else 1
+        return int(width * height * layers * texel_size * resource.sample_count * mips)
+    return resource.size
+
+
+class ResourceRegistry:
+    """The buffers and textures of one device, and their deferred destruction.
+
+    Resources leave the registry when they are released or garbage collected.
+    `budgets` (bytes per category) are only reported, the owners of the memory
+    enforce them (e.g. `MeshCache.budget`).
+    """
+    def __init__(self, frames_in_flight: int = 3) -> None:
+        self.frames_in_flight = frames_in_flight
+        self.frame = 0  # Frames ended so far
+        self.budgets: dict[str, int] = {}
+        self.resources: dict[int, ResourceInfo] = {}
+
+        # (frame from which on it is safe, callback), in order:
+        self._deferred: list[tuple[int, object]] = []
+        self._lock = threading.Lock()
+
+    def track(self, resource, category: str, owner) -> wgpu.GPUBuffer | wgpu.GPUTexture:
+        """Records a resource created by `owner`, returns the resource."""
+        key = id(resource)
+        info = ResourceInfo(resource.label, category, resource_size(resource), type(owner).__name__)
+        with self._lock:
+            self.resources[key] = info
+        weakref.finalize(resource, self._forget, key, info)
+        return resource
+
+    def release(self, resource) -> None:
+        """Destroys a resource now, only for resources no submitted frame uses."""
+        self._forget(id(resource))
+        resource.destroy()
+
+    def release_later(self, resource) -> None:
+        """Destroys a resource once the frames in flight retired."""
+        self.defer(lambda: self.release(resource))
+
+    def defer(self, callback) -> None:
+        """Calls `callback` once the frames in flight retired, e.g. to free memory
+        the GPU may still read."""
+        with self._lock:
+            self._deferred.append((self.frame + self.frames_in_flight, callback))
+
+    def end_frame(self) -> int:
+        """Call after submitting a frame. Runs the callbacks whose frames retired
+        and returns how many ran."""
+        with self._lock:
+            self.frame += 1
+            count = 0
+            while count < len(self._deferred) and self._deferred[count][0] <= self.frame:
+                count += 1
+            ready, self._deferred = self._deferred[:count], self._deferred[count:]
+        for _, callback in ready:
+            callback()
+        return count
+
+    def flush(self) -> int:
+        """Runs all deferred callbacks, only once the GPU is idle (e.g. on shutdown)."""
+        with self._lock:
+            ready, self._deferred = self._deferred, []
+        for _, callback in ready:
+            callback()
+        return len(ready)
+
+    @property
+    def pending(self) -> int:
+        """Deferred callbacks that did not run yet."""
+        return len(self._deferred)
+
+    def usage(self) -> dict[str, tuple[int, int]]:
+        """Category -> (resource count, bytes), largest first."""
+        usage: dict[str, list[int]] = {}
+        with self._lock:
+            for info in self.resources.values():
+                entry = usage.setdefault(info.category, [0, 0])
+                entry[0] += 1
+                entry[1] += info.size
+        return {category: (count, size)
+                for category, (count, size) in sorted(usage.items(), key=lambda item: -item[1][1])}
+
+    @property
+    def total(self) -> int:
+        return sum(size for _, size in self.usage().values())
+
+    def over_budget(self) -> dict[str, int]:
+        """Category -> bytes above its budget."""
+        usage = self.usage()
+        return {category: usage[category][1] - budget for category, budget in self.budgets.items()
+                if category in usage and usage[category][1] > budget}
+
+    def largest(self, count: int = 10) -> list[ResourceInfo]:
+        with self._lock:
+            return sorted(self.resources.values(), key=lambda info: -info.size)[:count]
+
+    def report(self) -> str:
+        lines = [f"{'category':<16}{'count':>8}{'MB':>10}{'budget':>10}"]
+        over = self.over_budget()
+        for category, (count, size) in self.usage().items():
+            budget = self.budgets.get(category)
+            budget = f"{budget / 2**20:>10.1f}" if budget is not None else f"{'-':>10}"
+            lines.append(f"{category:<16}{count:>8}{size / 2**20:>10.2f}{budget}"
+                         + ("  over budget" if category in over else ""))
+        lines.append(f"{'total':<16}{len(self.resources):>8}{self.total / 2**20:>10.2f}")
+        if self._deferred:
+            lines.append(f"{self.pending} deferred releases pending")
+        return "\n".join(lines)
+
+    def _forget(self, key: int, info: ResourceInfo | None = None) -> None:
+        with self._lock:
+            # The id may already belong to a newer resource if this one was released before:
+            if info is None or self.resources.get(key) is info:
+                self.resources.pop(key, None)
+
+
+_registries: "weakref.WeakKeyDictionary[wgpu.GPUDevice, ResourceRegistry]" = weakref.WeakKeyDictionary()
+
+
+def resources_of(device: wgpu.GPUDevice) -> ResourceRegistry:
+    """The registry of a device, created on first use."""
+    registry = _registries.get(device)
+    if registry is None:
+        registry = _registries[device] = ResourceRegistry()
+    return registry
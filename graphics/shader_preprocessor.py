@@ -0,0 +1,96 @@
+import re
+from pathlib import Path
+
+# Directory all shaders (and includes) are resolved against:
+SHADER_DIR = Path(__file__).parent / "shaders"
+
+DIRECTIVE = re.compile(r"^\s*#(\w+)\s*(.*?)\s*$")
+INCLUDE = re.compile(r'^"([^"]+)"$')
+
+
+class ShaderPreprocessor:
+    """Tiny WGSL preprocessor for shader variants.
+
+    Supports `#include "file"` (relative to the including file, every file is
+    included once), `#define NAME [value]`, `#undef NAME`, `#ifdef NAME`,
+    `#ifndef NAME`, `#else` and `#endif`. Defines with a value are substituted
+    as whole words in the code.
+    """
+    def __init__(self, root: Path = SHADER_DIR) -> None:
+        self.root = Path(root)
+
+    def process(self, path: str | Path, defines: dict[str, str] | None = None) -> str:
+        defines = dict(defines or {})
+        lines: list[str] = []
+        self._process_file(self._resolve(path, self.root), defines, lines, included=set(), stack=[])
+        return "\n".join(lines) + "\n"
+
+    def _resolve(self, path: str | Path, directory: Path) -> Path:
+        candidate = directory / path
+        if not candidate.exists():
+            candidate = self.root / path
+        return candidate.resolve()
+
+    def _process_file(self, path: Path, defines: dict, lines: list, included: set, stack: list) -> None:
+        if path in stack:
+            raise ValueError(f"{path}: circular #include ({' -> '.join(p.name for p in stack)})")
+        if path in included:
+            return
+        included.add(path)
+        stack.append(path)
+
+        # One entry per open #if block: is the block active, was its #else seen?
+        conditions: list[list[bool]] = []
+        active = True
+
+        for number, line in enumerate(path.read_text().splitlines(), start=1):
+            match = DIRECTIVE.match(line)
+            if match is None:
+                if active:
+                    lines.append(self._substitute(line, defines))
+                continue
+
+            directive, argument = match.groups()
+            location = f"{path.name}:{number}"
+
+            if directive in ("ifdef", "ifndef"):
+                defined = argument in defines
+                conditions.append([active, False])
+                active = active and (defined if directive == "ifdef" else not defined)
+            elif directive == "else":
+                if not conditions or conditions[-1][1]:
+                    raise ValueError(f"{location}: unexpected #else")
+                conditions[-1][1] = True
+                parent_active = conditions[-1][0]
+                active = parent_active and not active
+            elif directive == "endif":
+                if not conditions:
+                    raise ValueError(f"{location}: unexpected #endif")
+                active = conditions.pop()[0]
+            elif not active:
+                continue
+            elif directive == "include":
+                include = INCLUDE.match(argument)
+                if include is None:
+                    raise ValueError(f'{location}: expected #include "file"')
+                included_path = self._resolve(include.group(1), path.parent)
+                if not included_path.exists():
+                    raise ValueError(f"{location}: include {include.group(1)} not found")
+                self._process_file(included_path, defines, lines, included, stack)
+            elif directive == "define":
+                name, _, value = argument.partition(" ")
+                defines[name] = value.strip()
+            elif directive == "undef":
+                defines.pop(argument, None)
+            else:
+                raise ValueError(f"{location}: unknown directive #{directive}")
+
+        if conditions:
+            raise ValueError(f"{path.name}: missing #endif")
+        stack.pop()
+
+    def _substitute(self, line: str, defines: dict) -> str:
+        for name, value in defines.items():
+            if value and name in line:
+                line = re.sub(rf"\b{re.escape(name)}\b", value, line)
+        return line
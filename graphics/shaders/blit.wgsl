@@ -0,0 +1,33 @@
+//***** BLIT ***************************************************************************************
+// Stretches the rendered part (the viewport) of the offscreen target onto the
+// presentation texture, with bilinear filtering (see resolution.py).
+
+struct BlitParams {
+    uv_scale: vec2<f32>,  // Viewport size / texture size
+    uv_max: vec2<f32>,  // Center of the last texel inside the viewport, nothing outside is sampled
+};
+
+@group(0) @binding(0) var source: texture_2d<f32>;
+@group(0) @binding(1) var source_sampler: sampler;
+@group(0) @binding(2) var<uniform> params: BlitParams;
+
+struct VertexOutput {
+    @builtin(position) position: vec4<f32>,
+    @location(0) uv: vec2<f32>,
+};
+
+@vertex
+fn vs_main(@builtin(vertex_index) index: u32) -> VertexOutput {
+    // One triangle covering the whole screen, uv (0, 0) is the top left corner:
+    let uv = vec2<f32>(f32((index << 1u) & 2u), f32(index & 2u));
+    var out: VertexOutput;
+    out.position = vec4<f32>(uv.x * 2.0 - 1.0, 1.0 - uv.y * 2.0, 0.0, 1.0);
+    out.uv = uv * params.uv_scale;
+    return out;
+}
+
+@fragment
+fn fs_main(in: VertexOutput) -> @location(0) vec4<f32> {
+    return textureSample(source, source_sampler, min(in.uv, params.uv_max));
+}
+//***** BLIT ***************************************************************************************
@@ -0,0 +1,26 @@
+//***** COMMON *************************************************************************************
+// Shared by all shaders, include with: #include "common.wgsl"
+
+// GROUP 0: Global Data (Camera)
+struct CameraUniform {
+    view: mat4x4<f32>,
+    proj: mat4x4<f32>,
+};
+
+@group(0) @binding(0)
+var<uniform> camera: CameraUniform;
+
+struct VertexInput {
+    @location(0) position: vec3<f32>,
+#ifndef DEPTH_ONLY
+    @location(1) color: vec3<f32>,
+#endif
+};
+
+// Invariant, so the depth pre-pass and the color pass (depth_compare equal)
+// compute bit-identical depths:
+struct VertexOutput {
+    @builtin(position) @invariant pos: vec4<f32>,
+    @location(0) color: vec3<f32>,
+};
+//***** COMMON *************************************************************************************
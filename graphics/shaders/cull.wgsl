@@ -0,0 +1,57 @@
+//***** FRUSTUM CULLING ****************************************************************************
+// One invocation per transform store row. Rows inside the frustum are appended
+// to the visible list of their draw, counted in the instance_count of the draw
+// arguments (reset by the CPU every frame).
+
+#include "instances.wgsl"
+
+// Rows that are not drawn (not in the scene, no mesh):
+const NO_DRAW: u32 = 0xffffffffu;
+
+struct CullParams {
+    planes: array<vec4<f32>, 6>,  // (a, b, c, d), inside is a*x + b*y + c*z + d >= 0
+    count: u32,  // Rows to test
+};
+
+// draw_indexed_indirect arguments, draw_indirect reads the first four fields as
+// (vertex_count, instance_count, first_vertex, first_instance):
+struct DrawArgs {
+    index_count: u32,
+    instance_count: atomic<u32>,
+    first_index: u32,
+    base_vertex: i32,
+    first_instance: u32,
+};
+
+@group(0) @binding(0) var<uniform> params: CullParams;
+@group(0) @binding(1) var<storage, read> instances: array<Instance>;
+@group(0) @binding(2) var<storage, read> draw_ids: array<u32>;  // Per row
+@group(0) @binding(3) var<storage, read> draw_bases: array<u32>;  // First slot of every draw in `visible`
+@group(0) @binding(4) var<storage, read_write> draws: array<DrawArgs>;
+@group(0) @binding(5) var<storage, read_write> visible: array<u32>;
+
+@compute @workgroup_size(64)
+fn cs_main(@builtin(global_invocation_id) id: vec3<u32>) {
+    let row = id.x;
+    if (row >= params.count) {
+        return;
+    }
+
+    let draw = draw_ids[row];
+    if (draw == NO_DRAW) {
+        return;
+    }
+
+    // Same test as cull_spheres on the CPU:
+    let sphere = instances[row].sphere;
+    for (var i = 0u; i < 6u; i++) {
+        let plane = params.planes[i];
+        if (dot(plane.xyz, sphere.xyz) + plane.w < -sphere.w) {
+            return;
+        }
+    }
+
+    let slot = atomicAdd(&draws[draw].instance_count, 1u);
+    visible[draw_bases[draw] + slot] = row;
+}
+//***** FRUSTUM CULLING ****************************************************************************
@@ -0,0 +1,9 @@
+//***** INSTANCES **********************************************************************************
+// Per-row data of the GPU-driven path (see gpu_culling.py), include with: #include "instances.wgsl"
+
+// Model matrix and world space bounding sphere (center, radius) of one transform store row:
+struct Instance {
+    model: mat4x4<f32>,
+    sphere: vec4<f32>,
+};
+//***** INSTANCES **********************************************************************************
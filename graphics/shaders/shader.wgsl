@@ -0,0 +1,87 @@
+// Variants (defines):
+//   INSTANCED: the model matrix comes from the instance buffer instead of group 1
+//   GPU_DRIVEN: the model matrix of the visible row selected by the instance index (see cull.wgsl)
+//   DEPTH_ONLY: only reads positions, for the depth pre-pass (the pipeline has no fragment stage)
+//   OVERDRAW: every fragment outputs the value of the define, blended additively (see overdraw.py)
+
+#include "common.wgsl"
+
+//***** UNIFORMS ***********************************************************************************
+#ifdef GPU_DRIVEN
+#include "instances.wgsl"
+
+// GROUP 1: All rows, and the visible rows of the current draw (the dynamic offset selects the draw)
+@group(1) @binding(0)
+var<storage, read> instances: array<Instance>;
+
+@group(1) @binding(1)
+var<storage, read> visible: array<u32>;
+#else
+#ifndef INSTANCED
+// GROUP 1: Object Data (position and rotation of an object)
+struct ModelUniform {
+    matrix: mat4x4<f32>,
+};
+
+@group(1) @binding(0)
+var<uniform> model: ModelUniform;
+#endif
+#endif
+//***** UNIFORMS ***********************************************************************************
+
+//***** STRUCTURES *********************************************************************************
+#ifdef INSTANCED
+// Per-instance model matrix:
+struct InstanceInput {
+    @location(2) model_0: vec4<f32>,
+    @location(3) model_1: vec4<f32>,
+    @location(4) model_2: vec4<f32>,
+    @location(5) model_3: vec4<f32>,
+};
+#endif
+//***** STRUCTURES *********************************************************************************
+
+
+//***** VERTEX SHADER ******************************************************************************
+#ifdef INSTANCED
+@vertex
+fn vs_main(in: VertexInput, instance: InstanceInput) -> VertexOutput {
+    let model_matrix = mat4x4<f32>(instance.model_0, instance.model_1, instance.model_2, instance.model_3);
+#else
+#ifdef GPU_DRIVEN
+@vertex
+fn vs_main(in: VertexInput, @builtin(instance_index) instance: u32) -> VertexOutput {
+    let model_matrix = instances[visible[instance]].model;
+#else
+@vertex
+fn vs_main(in: VertexInput) -> VertexOutput {
+    let model_matrix = model.matrix;
+#endif
+#endif
+    var out: VertexOutput;
+
+    // MVP * pos = PROJ * VIEW * MODEL * POSITION
+    out.pos = camera.proj * camera.view * model_matrix * vec4<f32>(in.position, 1.0);
+#ifdef DEPTH_ONLY
+    out.color = vec3<f32>(0.0);
+#else
+    out.color = in.color;
+#endif
+
+    return out;
+}
+//***** VERTEX SHADER ******************************************************************************
+
+
+//***** FRAGMENT SHADER ****************************************************************************
+@fragment
+fn fs_main(in: VertexOutput) -> @location(0) vec4<f32> {
+#ifdef OVERDRAW
+    return vec4<f32>(vec3<f32>(OVERDRAW), 1.0);
+#else
+    // Gamma correction:
+    let physical_color = pow(in.color, vec3<f32>(2.2));
+    return vec4<f32>(physical_color, 1.0);
+#endif
+}
+//***** FRAGMENT SHADER ****************************************************************************
@@ -0,0 +1,341 @@
+import time
+import heapq
+import itertools
+from queue import SimpleQueue
+from dataclasses import dataclass
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+import wgpu
+import numpy as np
+from .mesh import Mesh
+from .resources import resources_of, CATEGORY_STREAMING
+from .mesh_format import MeshData, load_mesh
+from .importers import load_obj, load_glb
+
+# States of a StreamHandle, in order:
+STREAM_PENDING = "pending"  # Queued for (or being) decoded on a loader thread
+STREAM_UPLOADING = "uploading"  # GPU memory allocated, the data is copied over the next frames
+STREAM_RESIDENT = "resident"
+STREAM_FAILED = "failed"
+STREAM_RELEASED = "released"  # See AssetStreamer.release
+
+# File suffix -> function decoding a file into MeshData, runs on the loader threads:
+DECODERS = {
+    ".ssm": load_mesh,
+    ".obj": load_obj,
+    ".glb": load_glb,
+}
+
+
+@dataclass
+class StreamStats:
+    """Counters of the last `AssetStreamer.update`."""
+    pending: int = 0
+    uploading: int = 0
+    resident: int = 0
+    failed: int = 0
+    bytes_uploaded: int = 0  # This frame
+    copies: int = 0  # copy_buffer_to_buffer commands this frame
+    upload_ms: float = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Meshes that are not resident yet."""
+        return self.pending + self.uploading
+
+
+class StreamHandle:
+    """A mesh that is being streamed in.
+
+    `mesh` is set once the upload starts, but it must not be drawn before the
+    handle is resident. Callbacks run on the thread calling `AssetStreamer.update`.
+    """
+    def __init__(self, path: Path, priority: float) -> None:
+        self.path = path
+        self.priority = priority  # Lower is uploaded first
+        self.state = STREAM_PENDING
+        self.mesh: Mesh | None = None
+        self.error: Exception | None = None
+        self.bytes_total = 0
+        self.bytes_uploaded = 0
+
+        self._data: MeshData | None = None
+        self._segments: list[np.ndarray] = []  # Vertex and index bytes
+        self._segment = 0
+        self._cursor = 0
+        self._callbacks = []
+
+    @property
+    def resident(self) -> bool:
+        return self.state == STREAM_RESIDENT
+
+    def add_callback(self, callback) -> None:
+        """Calls `callback(handle)` once the mesh is resident or failed, right
+        away if it already is."""
+        if self.state in (STREAM_RESIDENT, STREAM_FAILED):
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _finish(self, state: str) -> None:
+        self.state = state
+        self._data = None
+        self._segments = []
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class StagingRing:
+    """Mappable buffers uploads are staged in, one per frame in flight.
+
+    A WebGPU buffer can't be used by the GPU while any part of it is mapped, so
+    instead of one buffer with a wrapping offset every frame gets its own buffer.
+    Its mapping is requested right after its copies were submitted and waited
+    for on a thread, so a frame never blocks on it: `begin` returns False while
+    the buffer of the frame is still busy.
+    """
+    def __init__(self, device: wgpu.GPUDevice, frames_in_flight: int = 3, capacity: int = 4 * 1024 * 1024) -> None:
+        self.device = device
+        self.capacity = capacity
+        self.frame = 0
+        self.offset = 0
+        self._waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="STAGING")
+        self._mappings: list[Future | None] = [None] * frames_in_flight  # None once mapped
+        self.buffers = [
+            resources_of(device).track(device.create_buffer(
+                label=f"STAGING_BUFFER_{frame}",
+                size=capacity,
+                usage=wgpu.BufferUsage.MAP_WRITE | wgpu.BufferUsage.COPY_SRC,
+                mapped_at_creation=True,
+            ), CATEGORY_STREAMING, self)
+            for frame in range(frames_in_flight)
+        ]
+
+    @property
+    def buffer(self) -> wgpu.GPUBuffer:
+        return self.buffers[self.frame]
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.offset
+
+    def begin(self) -> bool:
+        """Returns False if the buffer of this frame is not mapped yet, nothing
+        can be staged then."""
+        mapping = self._mappings[self.frame]
+        if mapping is not None:
+            if not mapping.done():
+                return False
+            self._mappings[self.frame] = None
+            mapping.result()  # Raises if the mapping failed
+        self.offset = 0
+        return True
+
+    def write(self, data: np.ndarray) -> int:
+        """Copies `data` (a multiple of 4 bytes) into the current buffer, returns its offset."""
+        offset = self.offset
+        self.buffer.write_mapped(data, offset)
+        self.offset += data.nbytes
+        return offset
+
+    def end(self) -> None:
+        """Unmaps the current buffer, its copies have to be submitted next."""
+        self.buffer.unmap()
+
+    def submitted(self) -> None:
+        """Call once the copies of the current buffer were submitted: maps it
+        again (when the GPU is done with it) and moves on to the next buffer."""
+        self._mappings[self.frame] = self._waiter.submit(self.buffer.map_async(wgpu.MapMode.WRITE).sync_wait)
+        self.frame = (self.frame + 1) % len(self.buffers)
+
+    def destroy(self) -> None:
+        self._waiter.shutdown(wait=False, cancel_futures=True)
+        resources = resources_of(self.device)
+        for buffer in self.buffers:
+            resources.release(buffer)
+
+
+class AssetStreamer:
+    """Streams meshes in without frame hitches.
+
+    Files are decoded into numpy arrays on loader threads. `update`, called once
+    per frame before rendering, allocates the GPU memory of the decoded meshes
+    and copies their data through the staging ring, at most `budget_bytes` and
+    about `budget_ms` per frame. Large meshes are spread over several frames.
+    """
+    def __init__(self,
+                 device: wgpu.GPUDevice,
+                 arena=None,
+                 threads: int = 2,
+                 budget_bytes: int = 2 * 1024 * 1024,
+                 budget_ms: float = 2.0,
+                 staging_size: int = 4 * 1024 * 1024,
+                 frames_in_flight: int = 3) -> None:
+        self.device = device
+        self.arena = arena  # Optional GpuArena the meshes are suballocated from
+        self.budget_bytes = budget_bytes
+        self.budget_ms = budget_ms
+        self.staging = StagingRing(device, frames_in_flight, staging_size)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="STREAMING")
+
+        self.handles: dict[Path, StreamHandle] = {}
+        self.stats = StreamStats()
+
+        # Handles finished by the loader threads, and a heap of (priority, sequence, handle) to upload:
+        self._decoded: SimpleQueue[StreamHandle] = SimpleQueue()
+        self._uploads: list[tuple[float, int, StreamHandle]] = []
+        self._sequence = itertools.count()
+
+    def request(self, path: str | Path, priority: float = 0.0) -> StreamHandle:
+        """Starts streaming a mesh file, every file is only streamed once."""
+        path = Path(path).resolve()
+        handle = self.handles.get(path)
+        if handle is not None and handle.state != STREAM_FAILED:
+            return handle
+        if handle is not None:
+            # Retrying a failed mesh, the new handle replaces the failed one:
+            self.stats.failed -= 1
+
+        decoder = DECODERS.get(path.suffix.lower())
+        if decoder is None:
+            raise ValueError(f"{path}: no decoder for {path.suffix} files")
+
+        handle = self.handles[path] = StreamHandle(path, priority)
+        self.stats.pending += 1
+        self.executor.submit(self._decode, handle, decoder)
+        return handle
+
+    def update(self) -> StreamStats:
+        """Uploads the next part of the queue, call once per frame before rendering."""
+        start = time.perf_counter()
+        stats = self.stats
+        stats.bytes_uploaded, stats.copies = 0, 0
+
+        # Allocate everything decoded since the last frame before recording any
+        # copies, allocating may replace the arena buffers:
+        while not self._decoded.empty():
+            handle = self._decoded.get()
+            stats.pending -= 1
+            if handle.state == STREAM_RELEASED:
+                # Released while it was being decoded:
+                handle._data = None
+            elif handle.error is not None:
+                stats.failed += 1
+                handle._finish(STREAM_FAILED)
+            else:
+                self._allocate(handle)
+                stats.uploading += 1
+
+        if self._uploads:
+            self._upload(start)
+
+        stats.upload_ms = (time.perf_counter() - start) * 1000.0
+        return stats
+
+    def release(self, handle: StreamHandle) -> None:
+        """Stops streaming a mesh or unloads it. Its GPU memory is freed once the
+        frames in flight retired, no entity may draw it anymore."""
+        if self.handles.get(handle.path) is handle:
+            del self.handles[handle.path]
+
+        stats = self.stats
+        if handle.state == STREAM_PENDING:
+            # The loader thread still has it, `update` drops it:
+            pass
+        elif handle.state == STREAM_UPLOADING:
+            self._uploads = [entry for entry in self._uploads if entry[2] is not handle]
+            heapq.heapify(self._uploads)
+            stats.uploading -= 1
+        elif handle.state == STREAM_RESIDENT:
+            stats.resident -= 1
+        elif handle.state == STREAM_FAILED:
+            stats.failed -= 1
+        else:
+            return
+
+        if handle.mesh is not None:
+            handle.mesh.destroy()
+            handle.mesh = None
+        handle._finish(STREAM_RELEASED)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.staging.destroy()
+
+    def _decode(self, handle: StreamHandle, decoder) -> None:
+        # Runs on a loader thread:
+        try:
+            handle._data = decoder(handle.path)
+        except Exception as error:
+            handle.error = error
+        self._decoded.put(handle)
+
+    def _allocate(self, handle: StreamHandle) -> None:
+        data = handle._data
+        handle.mesh = Mesh(self.device, data.vertices, data.indices, data.layout,
+                           bounds=data.bounds, index_count=data.index_count, arena=self.arena, upload=False)
+        handle.mesh.source = handle.path
+
+        handle._segments = [_padded_bytes(data.vertices)]
+        if data.indices is not None:
+            handle._segments.append(_padded_bytes(data.indices))
+        handle.bytes_total = sum(len(segment) for segment in handle._segments)
+        handle.state = STREAM_UPLOADING
+        heapq.heappush(self._uploads, (handle.priority, next(self._sequence), handle))
+
+    def _upload(self, start: float) -> None:
+        stats = self.stats
+        staging = self.staging
+        if not staging.begin():
+            # The GPU still copies from the staging buffer of this frame:
+            return
+        command_encoder = self.device.create_command_encoder(label="STREAMING_COMMAND_ENCODER")
+
+        budget = self.budget_bytes
+        completed: list[StreamHandle] = []
+        while self._uploads:
+            handle = self._uploads[0][2]
+            segment = handle._segments[handle._segment]
+
+            # Copies have to be a multiple of 4 bytes, the segments are padded:
+            size = min(len(segment) - handle._cursor, budget, staging.free) & ~3
+            if size == 0 and handle._cursor < len(segment):
+                break
+
+            if size:
+                offset = staging.write(segment[handle._cursor:handle._cursor + size])
+                buffer, destination = handle.mesh.allocation.destinations()[handle._segment]
+                command_encoder.copy_buffer_to_buffer(staging.buffer, offset,
+                                                      buffer, destination + handle._cursor, size)
+                handle._cursor += size
+                handle.bytes_uploaded += size
+                budget -= size
+                stats.bytes_uploaded += size
+                stats.copies += 1
+
+            if handle._cursor == len(segment):
+                handle._segment += 1
+                handle._cursor = 0
+                if handle._segment == len(handle._segments):
+                    heapq.heappop(self._uploads)
+                    completed.append(handle)
+
+            if (time.perf_counter() - start) * 1000.0 >= self.budget_ms:
+                break
+
+        staging.end()
+        self.device.queue.submit([command_encoder.finish()])
+        staging.submitted()
+
+        # The copies are executed before anything submitted later, e.g. this frame:
+        for handle in completed:
+            handle.mesh.resident = True
+            stats.uploading -= 1
+            stats.resident += 1
+            handle._finish(STREAM_RESIDENT)
+
+
+def _padded_bytes(array: np.ndarray) -> np.ndarray:
+    data = np.ascontiguousarray(array).view(np.uint8).ravel()
+    return np.pad(data, (0, -len(data) % 4)) if len(data) % 4 else data
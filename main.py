@@ -1,5 +1,13 @@
-from core.engine import GameEngine
+import logging
+from core.startup import StartupProfile
 
 if __name__ == "__main__":
-    game = GameEngine()
+    # The engine logs the startup report at the info level:
+    logging.basicConfig(level=logging.INFO, format="{message}", style="{")
+
+    # Created first, so the report includes importing the engine:
+    startup = StartupProfile()
+    from core.engine import GameEngine
+
+    game = GameEngine(startup=startup, startup_report=True)
     game.run()
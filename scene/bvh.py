@@ -0,0 +1,299 @@
+import numpy as np
+
+# Results of the node tests:
+OUTSIDE = 0
+INTERSECTS = 1
+INSIDE = 2
+
+# Inserts overfill leaves, a tree whose largest leaf holds this many times
+# `leaf_size` primitives counts as degraded:
+LEAF_OVERFLOW = 4
+
+
+def _concat_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for all ranges, without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+def _surface_area(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    extent = np.maximum(hi - lo, 0.0)
+    return 2.0 * (extent[:, 0] * extent[:, 1] + extent[:, 1] * extent[:, 2] + extent[:, 2] * extent[:, 0])
+
+
+def frustum_test(planes: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    normals, distances = planes[:, :3], planes[:, 3]
+    positive = normals >= 0.0
+
+    # Box corner farthest along (p-vertex) and against (n-vertex) every plane normal:
+    p_vertex = np.where(positive[None], hi[:, None], lo[:, None])
+    n_vertex = np.where(positive[None], lo[:, None], hi[:, None])
+    p_dist = np.einsum("npk,pk->np", p_vertex, normals) + distances
+    n_dist = np.einsum("npk,pk->np", n_vertex, normals) + distances
+
+    result = np.full(len(lo), INTERSECTS, dtype=np.int8)
+    result[np.all(n_dist >= 0.0, axis=1)] = INSIDE
+    result[np.any(p_dist < 0.0, axis=1)] = OUTSIDE
+    return result
+
+
+def aabb_test(query_lo: np.ndarray, query_hi: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    result = np.full(len(lo), INTERSECTS, dtype=np.int8)
+    result[np.all((lo >= query_lo) & (hi <= query_hi), axis=1)] = INSIDE
+    result[np.any((lo > query_hi) | (hi < query_lo), axis=1)] = OUTSIDE
+    return result
+
+
+def sphere_test(center: np.ndarray, radius: float, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    nearest = np.clip(center, lo, hi)
+    farthest = np.where(np.abs(lo - center) > np.abs(hi - center), lo, hi)
+    radius_sq = radius * radius
+
+    result = np.full(len(lo), INTERSECTS, dtype=np.int8)
+    result[np.sum((farthest - center) ** 2, axis=1) <= radius_sq] = INSIDE
+    result[np.sum((nearest - center) ** 2, axis=1) > radius_sq] = OUTSIDE
+    return result
+
+
+def ray_test(origin: np.ndarray, inv_direction: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> tuple:
+    """Slab test. Returns the entry and exit distances of the ray for every box."""
+    with np.errstate(invalid="ignore"):
+        t0 = (lo - origin) * inv_direction
+        t1 = (hi - origin) * inv_direction
+    t_near = np.nan_to_num(np.minimum(t0, t1), nan=-np.inf).max(axis=1)
+    t_far = np.nan_to_num(np.maximum(t0, t1), nan=np.inf).min(axis=1)
+    return t_near, t_far
+
+
+class BVH:
+    """Bounding volume hierarchy over axis aligned boxes.
+
+    Nodes are stored breadth first, so every level is a contiguous slice of the
+    node arrays and every node covers a contiguous range of `order`. This lets
+    refits and queries process one whole level per NumPy call.
+
+    `insert` and `remove` edit the tree without rebuilding it: the topology
+    stays, only the leaf ranges change (leaves may overfill or become empty).
+    Call `refit` after them and `build` once the tree is `degraded`.
+    """
+    def __init__(self, leaf_size: int = 32, rebuild_ratio: float = 1.5) -> None:
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio  # Rebuild when the tree got this much worse
+
+        self.order = np.zeros(0, dtype=np.int64)  # Primitive ids sorted by node
+        self.node_start = np.zeros(0, dtype=np.int64)
+        self.node_end = np.zeros(0, dtype=np.int64)
+        self.node_left = np.zeros(0, dtype=np.int64)  # Right child is left + 1, -1 for leaves
+        self.node_lo = np.zeros((0, 3), dtype=np.float32)
+        self.node_hi = np.zeros((0, 3), dtype=np.float32)
+        self.levels: list[tuple[int, int]] = []
+        self.leaves = np.zeros(0, dtype=np.int64)  # In the order of their ranges
+
+        self.build_cost = 0.0
+        self.cost = 0.0
+        self.largest_leaf = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.order)
+
+    @property
+    def degraded(self) -> bool:
+        return (self.cost > self.build_cost * self.rebuild_ratio or
+                self.largest_leaf > self.leaf_size * LEAF_OVERFLOW)
+
+    def build(self, lo: np.ndarray, hi: np.ndarray) -> None:
+        count = len(lo)
+        centroids = (lo + hi) * 0.5
+        order = np.arange(count, dtype=np.int64)
+
+        starts, ends, lefts = [0], [count], [-1]
+        self.levels = []
+        level = [0] if count else []
+
+        # Top-down median split along the longest axis, one level at a time:
+        while level:
+            self.levels.append((level[0], level[-1] + 1))
+            next_level = []
+            for node in level:
+                start, end = starts[node], ends[node]
+                if end - start <= self.leaf_size:
+                    continue
+
+                ids = order[start:end]
+                points = centroids[ids]
+                axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+                middle = (end - start) // 2
+                order[start:end] = ids[np.argpartition(points[:, axis], middle)]
+
+                lefts[node] = len(starts)
+                next_level += [len(starts), len(starts) + 1]
+                starts += [start, start + middle]
+                ends += [start + middle, end]
+                lefts += [-1, -1]
+            level = next_level
+
+        self.order = order
+        self.node_start = np.array(starts, dtype=np.int64)
+        self.node_end = np.array(ends, dtype=np.int64)
+        self.node_left = np.array(lefts, dtype=np.int64)
+        self.node_lo = np.zeros((len(starts), 3), dtype=np.float32)
+        self.node_hi = np.zeros((len(starts), 3), dtype=np.float32)
+        leaves = np.flatnonzero(self.node_left < 0)
+        self.leaves = leaves[np.argsort(self.node_start[leaves])]
+
+        self.refit(lo, hi)
+        self.build_cost = self.cost
+
+    def insert(self, ids: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> None:
+        """Adds the primitives `ids` with the boxes [lo, hi], each into the leaf
+        reached by descending into the child whose surface area grows least."""
+        if len(self.leaves) == 0:
+            raise ValueError("Build the BVH before inserting into it")
+
+        nodes = np.zeros(len(ids), dtype=np.int64)
+        inner = np.flatnonzero(self.node_left[nodes] >= 0)
+        while len(inner):
+            left = self.node_left[nodes[inner]]
+            growth = [
+                _surface_area(np.minimum(self.node_lo[child], lo[inner]), np.maximum(self.node_hi[child], hi[inner]))
+                - _surface_area(self.node_lo[child], self.node_hi[child])
+                for child in (left, left + 1)
+            ]
+            nodes[inner] = np.where(growth[1] < growth[0], left + 1, left)
+            inner = inner[self.node_left[nodes[inner]] >= 0]
+
+        leaf_ranks = np.zeros(len(self.node_left), dtype=np.int64)
+        leaf_ranks[self.leaves] = np.arange(len(self.leaves))
+        ranks = np.concatenate([self._slot_ranks(), leaf_ranks[nodes]])
+        permutation = np.argsort(ranks, kind="stable")
+        self._set_ranges(np.concatenate([self.order, ids])[permutation], ranks[permutation])
+
+    def remove(self, remap: np.ndarray) -> None:
+        """Drops primitives and renumbers the others: `remap[id]` is the new id
+        of a primitive, or -1 to remove it."""
+        ids = remap[self.order]
+        keep = ids >= 0
+        self._set_ranges(ids[keep], self._slot_ranks()[keep])
+
+    def _slot_ranks(self) -> np.ndarray:
+        """Leaf rank (index into `leaves`) of every slot of `order`."""
+        leaves = self.leaves
+        return np.repeat(np.arange(len(leaves)), self.node_end[leaves] - self.node_start[leaves])
+
+    def _set_ranges(self, order: np.ndarray, ranks: np.ndarray) -> None:
+        """Takes a new `order`, sorted by the leaf ranks of its slots, and
+        recomputes the ranges of all nodes."""
+        counts = np.bincount(ranks, minlength=len(self.leaves))
+        self.order = order
+        self.node_end[self.leaves] = np.cumsum(counts)
+        self.node_start[self.leaves] = self.node_end[self.leaves] - counts
+
+        # Inner nodes bottom up, they span the ranges of their children:
+        for begin, end in reversed(self.levels):
+            nodes = np.arange(begin, end)
+            nodes = nodes[self.node_left[nodes] >= 0]
+            left = self.node_left[nodes]
+            self.node_start[nodes] = self.node_start[left]
+            self.node_end[nodes] = self.node_end[left + 1]
+
+    def refit(self, lo: np.ndarray, hi: np.ndarray) -> None:
+        """Updates the node bounds for moved primitives, keeping the topology."""
+        if self.size == 0:
+            self.cost = 0.0
+            self.largest_leaf = 0
+            return
+
+        # The non-empty leaves partition `order`, so they can be reduced in one call:
+        sizes = self.node_end - self.node_start
+        leaves = self.leaves[sizes[self.leaves] > 0]
+        self.node_lo[leaves] = np.minimum.reduceat(lo[self.order], self.node_start[leaves])
+        self.node_hi[leaves] = np.maximum.reduceat(hi[self.order], self.node_start[leaves])
+        self.largest_leaf = int(sizes[leaves].max())
+
+        # Inner nodes bottom up, one level at a time. The box of an empty node
+        # is stale and left out:
+        for begin, end in reversed(self.levels):
+            nodes = np.arange(begin, end)
+            nodes = nodes[self.node_left[nodes] >= 0]
+            left = self.node_left[nodes]
+            right = left + 1
+            lo_left, lo_right = self.node_lo[left], self.node_lo[right]
+            hi_left, hi_right = self.node_hi[left], self.node_hi[right]
+            empty_left, empty_right = (sizes[left] == 0)[:, None], (sizes[right] == 0)[:, None]
+            self.node_lo[nodes] = np.where(empty_left, lo_right, np.where(empty_right, lo_left,
+                                                                          np.minimum(lo_left, lo_right)))
+            self.node_hi[nodes] = np.where(empty_left, hi_right, np.where(empty_right, hi_left,
+                                                                          np.maximum(hi_left, hi_right)))
+
+        # Surface area heuristic of the inner nodes, relative to the root:
+        inner = (self.node_left >= 0) & (sizes > 0)
+        root_area = max(float(_surface_area(self.node_lo[:1], self.node_hi[:1])[0]), 1e-12)
+        self.cost = float(_surface_area(self.node_lo[inner], self.node_hi[inner]).sum()) / root_area
+
+    def query(self, node_test, prim_lo: np.ndarray, prim_hi: np.ndarray) -> np.ndarray:
+        """Returns the ids of all primitives whose box passes `node_test`.
+
+        `node_test(lo, hi)` classifies boxes as OUTSIDE, INTERSECTS or INSIDE.
+        Subtrees fully inside are accepted without testing their primitives.
+        """
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        hits = []
+        frontier = np.zeros(1, dtype=np.int64)
+        while len(frontier):
+            result = node_test(self.node_lo[frontier], self.node_hi[frontier])
+
+            inside = frontier[result == INSIDE]
+            hits.append(self.order[_concat_ranges(self.node_start[inside], self.node_end[inside])])
+
+            partial = frontier[result == INTERSECTS]
+            leaves = partial[self.node_left[partial] < 0]
+            candidates = self.order[_concat_ranges(self.node_start[leaves], self.node_end[leaves])]
+            hits.append(candidates[node_test(prim_lo[candidates], prim_hi[candidates]) != OUTSIDE])
+
+            left = self.node_left[partial]
+            left = left[left >= 0]
+            frontier = np.concatenate([left, left + 1])
+
+        return np.concatenate(hits)
+
+    def query_ray(self,
+                  origin: np.ndarray,
+                  direction: np.ndarray,
+                  max_distance: float,
+                  prim_lo: np.ndarray,
+                  prim_hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the ids and entry distances of all primitive boxes hit by the ray."""
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        with np.errstate(divide="ignore"):
+            inv_direction = 1.0 / direction
+
+        def hit(t_near: np.ndarray, t_far: np.ndarray) -> np.ndarray:
+            return (t_far >= np.maximum(t_near, 0.0)) & (t_near <= max_distance)
+
+        ids, distances = [], []
+        frontier = np.zeros(1, dtype=np.int64)
+        while len(frontier):
+            t_near, t_far = ray_test(origin, inv_direction, self.node_lo[frontier], self.node_hi[frontier])
+            frontier = frontier[hit(t_near, t_far)]
+
+            leaves = frontier[self.node_left[frontier] < 0]
+            candidates = self.order[_concat_ranges(self.node_start[leaves], self.node_end[leaves])]
+            t_near, t_far = ray_test(origin, inv_direction, prim_lo[candidates], prim_hi[candidates])
+            mask = hit(t_near, t_far)
+            ids.append(candidates[mask])
+            distances.append(np.maximum(t_near[mask], 0.0))
+
+            left = self.node_left[frontier]
+            left = left[left >= 0]
+            frontier = np.concatenate([left, left + 1])
+
+        return np.concatenate(ids), np.concatenate(distances)
@@ -1,6 +1,7 @@
 import glm
 import wgpu
 import numpy as np
+from graphics.resources import resources_of, CATEGORY_UNIFORMS
 #from graphics.renderer import Renderer
 
 class Camera:
@@ -47,11 +48,12 @@ class Camera:
         self.device.queue.write_buffer(self.uniform_buffer, 0, view_proj_data.tobytes())
 
     def _create_uniform_buffer(self) -> wgpu.GPUBuffer:
-        return self.device.create_buffer(
+        buffer = self.device.create_buffer(
             label="CAMERA_UNIFORM_BUFFER",
             size=(4 * 4 * 4) * 2,  # 2x 4x4 matrices (view + proj)
             usage=wgpu.BufferUsage.UNIFORM | wgpu.BufferUsage.COPY_DST,
         )
+        return resources_of(self.device).track(buffer, CATEGORY_UNIFORMS, self)
     
     def _create_bind_group(self) -> wgpu.GPUBindGroup:
         return self.device.create_bind_group(
@@ -1,67 +1,184 @@
 #import glm  #deprecated!
+from functools import partial
 from pyglm import glm
 import wgpu
 import numpy as np
 from graphics.renderer import Renderer
+from graphics.streaming import StreamHandle
 
 
 class Entity:
-    def __init__(self, 
-                 renderer: Renderer, 
-                 mesh, 
-                 position: glm.vec3 | None = None, 
-                 rotation: glm.vec3 | None = None, 
-                 scale: glm.vec3 | None = None) -> None:
+    def __init__(self,
+                 renderer: Renderer,
+                 mesh,
+                 position: glm.vec3 | None = None,
+                 rotation: glm.vec3 | None = None,
+                 scale: glm.vec3 | None = None,
+                 static: bool = False,
+                 placeholder=None,
+                 parent: "Entity | None" = None) -> None:
         self.renderer = renderer
-        self.mesh = mesh
 
-        # Transform data:
+        # Transform data lives in one row of the renderers transform store:
+        self.transforms = renderer.transforms
+        self.index = self.transforms.allocate()
+
+        # With a parent, position, rotation and scale are relative to it:
+        self._parent: Entity | None = None
+        self.children: list[Entity] = []
+        self.parent = parent
+
+        # `mesh` may be a StreamHandle, until it is resident the placeholder mesh
+        # is drawn instead (nothing without a placeholder):
+        self.placeholder = placeholder
+        self.stream: StreamHandle | None = None
+        self.mesh = mesh
         self.position = position or glm.vec3(0, 0, 0)
         self.rotation = rotation or glm.vec3(0, 0, 0)
         self.scale = scale or glm.vec3(1, 1, 1)
 
-        # GROUP 1 wgpu resources:
-        self.uniform_buffer = self._create_uniform_buffer()
-        self.bind_group = self._create_bind_group()
+        # Static entities are drawn from a cached render bundle:
+        self.static = static
+
+    @classmethod
+    def from_rows(cls, renderer: Renderer, rows: np.ndarray, meshes: list) -> list["Entity"]:
+        """Entities for transform store rows that were allocated and filled in
+        bulk (e.g. by a scene snapshot), skipping the per-entity setup."""
+        entities = []
+        transforms = renderer.transforms
+        for row, mesh in zip(rows.tolist(), meshes):
+            entity = cls.__new__(cls)
+            entity.renderer = renderer
+            entity.transforms = transforms
+            entity.index = row
+            entity._parent = None
+            entity.children = []
+            entity.placeholder = None
+            entity.stream = None
+            entity._mesh = mesh
+            entities.append(entity)
+        return entities
+
+    @property
+    def mesh(self):
+        return self._mesh
+
+    @mesh.setter
+    def mesh(self, mesh) -> None:
+        self.stream = None
+        if isinstance(mesh, StreamHandle):
+            if mesh.resident:
+                mesh = mesh.mesh
+            else:
+                self.stream = mesh
+                mesh.add_callback(self._on_streamed)
+                mesh = self.placeholder
+
+        self._mesh = mesh
+        self.transforms.set_drawable(self.index, mesh is not None)
+        self.transforms.mesh_version += 1
+
+        # The culling needs the bounding sphere of the mesh:
+        if mesh is not None:
+            self.transforms.set_bounds(self.index, mesh.bounding_center, mesh.bounding_radius)
+
+    @property
+    def parent(self) -> "Entity | None":
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent: "Entity | None") -> None:
+        # Raises ValueError before anything changed if the entity would become its own ancestor:
+        self.transforms.set_parent(self.index, parent.index if parent is not None else -1)
+        if self._parent is not None:
+            self._parent.children.remove(self)
+        self._parent = parent
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def resident(self) -> bool:
+        """False while the mesh is still streaming (or failed to)."""
+        return self.stream is None and self._mesh is not None
+
+    def _on_streamed(self, stream: StreamHandle) -> None:
+        # Ignore streams the entity no longer waits for:
+        if stream is self.stream and stream.resident:
+            self.mesh = stream
 
-        # Calculate initial matrix:
-        self.update_matrix()
+    # NOTE: The getters return copies, so always assign the whole vector
+    #       (entity.position = ...) instead of modifying a component in place.
+    @property
+    def position(self) -> glm.vec3:
+        return glm.vec3(*self.transforms.positions[self.index])
+
+    @position.setter
+    def position(self, value: glm.vec3) -> None:
+        self.transforms.positions[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def rotation(self) -> glm.vec3:
+        return glm.vec3(*self.transforms.rotations[self.index])
+
+    @rotation.setter
+    def rotation(self, value: glm.vec3) -> None:
+        self.transforms.rotations[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def scale(self) -> glm.vec3:
+        return glm.vec3(*self.transforms.scales[self.index])
+
+    @scale.setter
+    def scale(self, value: glm.vec3) -> None:
+        self.transforms.scales[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def static(self) -> bool:
+        return bool(self.transforms.static[self.index])
+
+    @static.setter
+    def static(self, value: bool) -> None:
+        self.transforms.set_static(self.index, value)
+
+    @property
+    def model_matrix(self) -> np.ndarray:
+        """World matrix, including the transforms of all parents."""
+        return self.transforms.matrices[self.index]
+
+    @property
+    def local_matrix(self) -> np.ndarray:
+        return self.transforms.local_matrices[self.index]
+
+    def destroy(self) -> None:
+        """Stops drawing the entity right away, its transform row is recycled once
+        the frames in flight retired. Children become roots. The mesh is not
+        released, it may be shared (see MeshCache.release). Use Scene.remove."""
+        for child in list(self.children):
+            child.parent = None
+        self.parent = None
+        self.stream = None
+        self._mesh = None
+
+        transforms = self.transforms
+        transforms.set_drawable(self.index, False)
+        transforms.set_static(self.index, False)
+        transforms.mesh_version += 1
+        self.renderer.resources.defer(partial(transforms.free, self.index))
 
     def update(self, dt: float):
         """Update logic every frame."""
 
     def update_matrix(self) -> None:
-        matrix = glm.mat4(1.0)
-        matrix = glm.translate(matrix, self.position)
-        matrix = glm.rotate(matrix, glm.radians(self.rotation.x), glm.vec3(1, 0, 0))
-        matrix = glm.rotate(matrix, glm.radians(self.rotation.y), glm.vec3(0, 1, 0))
-        matrix = glm.rotate(matrix, glm.radians(self.rotation.z), glm.vec3(0, 0, 1))
-        matrix = glm.scale(matrix, self.scale)
-
-        # Transfer data to GPU:
-        data = np.array(matrix, dtype=np.float32).tobytes()
-        self.renderer.ctx.device.queue.write_buffer(self.uniform_buffer, 0, data)
-
-    def _create_uniform_buffer(self) -> wgpu.GPUBuffer:
-        return self.renderer.ctx.device.create_buffer(
-            label="ENTITY_MODEL_BUFFER",
-            size=64,  # 4x4 float32 (4 bytes) matrix
-            usage=wgpu.BufferUsage.UNIFORM | wgpu.BufferUsage.COPY_DST,
-        )
-
-    def _create_bind_group(self) -> wgpu.GPUBindGroup:
-        return self.renderer.ctx.device.create_bind_group(
-            label="ENTITY_BIND_GROUP",
-            layout=self.renderer.object_bgl,
-            entries=[
-                wgpu.BindGroupEntry(
-                    binding=0,
-                    resource=wgpu.BufferBinding(buffer=self.uniform_buffer)
-                ),
-            ],
-        )
-
-    def draw(self, render_pass: wgpu.GPURenderPassEncoder) -> None:
-        render_pass.set_bind_group(1, self.bind_group, [], 0, 99)
-        render_pass.set_vertex_buffer(0, self.mesh.vertex_buffer)
-        render_pass.draw(self.mesh.vertex_count)
+        # The matrices of all dirty entities are computed (and uploaded) in one
+        # batch by the renderer, so flagging the row is all we have to do.
+        self.transforms.mark_dirty(self.index)
+
+    def draw(self, render_pass: wgpu.GPURenderPassEncoder, state=None, mesh=None) -> None:
+        """Draws the entity with its mesh, or `mesh` (e.g. one of its LODs)."""
+        # GROUP 1 is shared by all entities, the dynamic offset selects our slot:
+        objects = self.renderer.objects
+        render_pass.set_bind_group(1, objects.bind_group, [objects.offset(self.index)], 0, 1)
+        (mesh or self.mesh).draw(render_pass, state=state)
@@ -0,0 +1,246 @@
+import numpy as np
+
+# Costs in rows copied: moving a subtree costs the sizes of the levels it
+# touches plus LEVEL_MOVE_COST per level, rebuilding the levels (sorting them)
+# REBUILD_COST per row. Subtrees move until that would cost more than a rebuild:
+LEVEL_MOVE_COST = 4096
+REBUILD_COST = 16
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of the index ranges [start, end)."""
+    counts = ends - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def compute_depths(parents: np.ndarray) -> np.ndarray:
+    """Depth of every node of a forest given by parent indices (-1 for roots),
+    by pointer jumping: O(n log depth) instead of walking up from every node.
+    Raises ValueError if the links contain a cycle."""
+    depths = (parents >= 0).astype(np.int64)
+    ancestors = parents.copy()
+    linked = np.flatnonzero(ancestors >= 0)
+
+    # Every jump doubles the distance, so anything still linked after that is a cycle:
+    for _ in range(max(len(parents), 1).bit_length() + 1):
+        if len(linked) == 0:
+            break
+        next_ancestors = ancestors[linked]
+        next_depths = depths[next_ancestors]
+        next_ancestors = ancestors[next_ancestors]
+        depths[linked] += next_depths
+        ancestors[linked] = next_ancestors
+        linked = linked[next_ancestors >= 0]
+    if len(linked):
+        raise ValueError("the parent links contain a cycle")
+    return depths
+
+
+class Hierarchy:
+    """Parent links between the rows of a transform store.
+
+    Rows are sorted breadth-first into levels (all rows of one depth, grouped by
+    parent), so world matrices are computed one level at a time with one
+    batched matrix multiply per level, parents always before their children.
+    A reparented row moves with its subtree to the levels of its new depth, a
+    few levels change instead of rebuilding and sorting all of them. Once the
+    moves since the last propagation would cost more than a rebuild (and after
+    `set_parents`, the batched way to relink many rows) the levels are rebuilt
+    on the next propagation.
+    """
+    def __init__(self, capacity: int) -> None:
+        self.parents = np.full(capacity, -1, dtype=np.int64)
+        self.child_counts = np.zeros(capacity, dtype=np.int64)
+        self.linked = 0  # Rows with a parent, without any the world matrices are the local ones
+        self.version = 0  # Bumped whenever a link changes
+
+        # Depth of every row, and per depth the rows (sorted by parent) and their parents:
+        self.depths = np.zeros(capacity, dtype=np.int64)
+        self._level_rows: list[np.ndarray] = []
+        self._level_parents: list[np.ndarray] = []
+        self._levels_version = -1
+        self._move_budget = 0  # What moving subtrees may still cost until the next propagation
+
+    def set_parent(self, row: int, parent: int) -> None:
+        """Links `row` to `parent`, -1 makes it a root."""
+        previous = int(self.parents[row])
+        if parent == previous:
+            return
+        if parent == row:
+            raise ValueError(f"row {row} can't be its own parent")
+        if parent >= 0 and self._is_ancestor(row, parent):
+            raise ValueError(f"row {row} can't become a child of its descendant {parent}")
+
+        # Move the subtree while the levels are current, otherwise they are rebuilt anyway:
+        current = self._levels_version == self.version and self._move_subtree(row, previous, parent)
+
+        if previous >= 0:
+            self.child_counts[previous] -= 1
+            self.linked -= 1
+        if parent >= 0:
+            self.child_counts[parent] += 1
+            self.linked += 1
+        self.parents[row] = parent
+        self.version += 1
+        if current:
+            self._levels_version = self.version
+
+    def set_parents(self, rows: np.ndarray, parents: np.ndarray, count: int) -> None:
+        """Links many rows at once (rows below `count` only), raises ValueError
+        without changing anything if that would create a cycle."""
+        links = self.parents[:count].copy()
+        links[rows] = parents
+        compute_depths(links)
+
+        np.subtract.at(self.child_counts, self.parents[rows][self.parents[rows] >= 0], 1)
+        np.add.at(self.child_counts, parents[parents >= 0], 1)
+        self.parents[:count] = links
+        self.linked = int(np.count_nonzero(links >= 0))
+        self.version += 1
+
+    def children(self, row: int, count: int) -> np.ndarray:
+        if self.child_counts[row] == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.parents[:count] == row)
+
+    def propagate(self, rows: np.ndarray, local: np.ndarray, world: np.ndarray, count: int) -> np.ndarray:
+        """Computes the world matrices of `rows` (sorted, their local matrices
+        changed) and of all of their descendants. Returns every row whose world
+        matrix changed, sorted."""
+        if self.linked == 0:
+            world[rows] = local[rows]
+            return rows
+
+        self._update_levels(count)
+        self._move_budget = REBUILD_COST * count
+
+        # The changed rows per depth, in the same order as the levels:
+        depths = self.depths[rows]
+        order = np.argsort(depths, kind="stable")
+        rows_by_depth = rows[order]
+        bounds = np.searchsorted(depths[order], np.arange(len(self._level_rows) + 1)).tolist()
+
+        roots = rows_by_depth[bounds[0]:bounds[1]]
+        world[roots] = local[roots]
+        changed = [roots]
+
+        # Matrices are stored transposed (column-major), so parent @ child becomes child @ parent:
+        frontier = roots
+        for depth in range(1, len(self._level_rows)):
+            level = rows_by_depth[bounds[depth]:bounds[depth + 1]]
+            if len(frontier):
+                children = self._children_of(depth, frontier)
+                level = np.union1d(level, children) if len(level) else children
+            elif bounds[depth] == len(rows):
+                break  # Nothing changed below this level
+
+            if len(level):
+                world[level] = local[level] @ world[self.parents[level]]
+                changed.append(level)
+            frontier = level
+
+        return np.sort(np.concatenate(changed))
+
+    def grow(self, capacity: int) -> None:
+        def grow(array: np.ndarray, fill: int) -> np.ndarray:
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        self.parents = grow(self.parents, -1)
+        self.child_counts = grow(self.child_counts, 0)
+        self.depths = grow(self.depths, 0)
+
+    def _is_ancestor(self, row: int, node: int) -> bool:
+        """Is `row` the node itself or one of its ancestors?"""
+        if self.child_counts[row] == 0:
+            return row == node  # Leaves are nobody's ancestor, no need to walk up
+        while node >= 0:
+            if node == row:
+                return True
+            node = int(self.parents[node])
+        return False
+
+    def _children_of(self, depth: int, parents: np.ndarray) -> np.ndarray:
+        """The rows at `depth` whose parent is one of `parents`."""
+        level_parents = self._level_parents[depth]
+        starts = np.searchsorted(level_parents, parents, side="left")
+        ends = np.searchsorted(level_parents, parents, side="right")
+        return self._level_rows[depth][_ranges(starts, ends)]
+
+    def _move_subtree(self, row: int, previous: int, parent: int) -> bool:
+        """Moves `row` and its descendants from their levels to the ones below
+        `parent`. Returns False, without changing anything, if that exceeds the budget."""
+        levels, level_parents = self._level_rows, self._level_parents
+        old_depth = int(self.depths[row])
+        new_depth = int(self.depths[parent]) + 1 if parent >= 0 else 0
+
+        def cost(offset: int) -> int:
+            sizes = [len(levels[depth]) for depth in (old_depth + offset, new_depth + offset) if depth < len(levels)]
+            return sum(sizes) + 2 * LEVEL_MOVE_COST
+
+        # The subtree one level at a time, with the positions in the old levels:
+        subtree = [np.array([row])]
+        positions = [np.zeros(0, dtype=np.int64)]  # Not in the levels if allocated since the last rebuild
+        if old_depth < len(levels):
+            start = np.searchsorted(level_parents[old_depth], previous, side="left")
+            end = np.searchsorted(level_parents[old_depth], previous, side="right")
+            positions[0] = start + np.flatnonzero(levels[old_depth][start:end] == row)
+        budget = self._move_budget - cost(0)
+        for depth in range(old_depth + 1, len(levels)):
+            starts = np.searchsorted(level_parents[depth], subtree[-1], side="left")
+            ends = np.searchsorted(level_parents[depth], subtree[-1], side="right")
+            if not np.any(ends > starts):
+                break
+            budget -= cost(len(subtree))
+            if budget < 0:
+                return False
+            positions.append(_ranges(starts, ends))
+            subtree.append(levels[depth][positions[-1]])
+        if budget < 0:
+            return False
+        self._move_budget = budget
+
+        for offset, level_positions in enumerate(positions):
+            depth = old_depth + offset
+            if len(level_positions):
+                levels[depth] = np.delete(levels[depth], level_positions)
+                level_parents[depth] = np.delete(level_parents[depth], level_positions)
+
+        # Inserted in the order of their parents, like the rebuild sorts them:
+        while len(levels) < new_depth + len(subtree):
+            levels.append(np.zeros(0, dtype=np.int64))
+            level_parents.append(np.zeros(0, dtype=np.int64))
+        for offset, rows in enumerate(subtree):
+            depth = new_depth + offset
+            parents = np.array([parent]) if offset == 0 else self.parents[rows]
+            order = np.argsort(parents, kind="stable")
+            at = np.searchsorted(level_parents[depth], parents[order], side="right")
+            levels[depth] = np.insert(levels[depth], at, rows[order])
+            level_parents[depth] = np.insert(level_parents[depth], at, parents[order])
+            self.depths[rows] = depth
+
+        while len(levels) > 1 and len(levels[-1]) == 0:
+            levels.pop()
+            level_parents.pop()
+        return True
+
+    def _update_levels(self, count: int) -> None:
+        # Rows allocated since the last rebuild are roots, they don't need a rebuild:
+        if self._levels_version == self.version:
+            return
+
+        parents = self.parents[:count]
+        depths = compute_depths(parents)
+        self.depths[:count] = depths
+        self.depths[count:] = 0
+
+        order = np.lexsort((parents, depths))
+        bounds = np.searchsorted(depths[order], np.arange(int(depths.max(initial=0)) + 2))
+        self._level_rows = [order[bounds[depth]:bounds[depth + 1]] for depth in range(len(bounds) - 1)]
+        self._level_parents = [parents[level] for level in self._level_rows]
+        self._levels_version = self.version
@@ -1,15 +1,202 @@
+import numpy as np
 from .camera import Camera
+from .bvh import BVH, frustum_test, aabb_test, sphere_test
+
+
+def ray_sphere_distances(origin: np.ndarray,
+                         direction: np.ndarray,
+                         centers: np.ndarray,
+                         radii: np.ndarray) -> np.ndarray:
+    """Distance along a normalized ray to every sphere, inf for misses."""
+    offset = centers - origin
+    along = offset @ direction
+    dist_sq = np.sum(offset * offset, axis=1) - along * along
+    radii_sq = radii * radii
+    half_chord = np.sqrt(np.maximum(radii_sq - dist_sq, 0.0))
+
+    distances = np.where(along - half_chord >= 0.0, along - half_chord, along + half_chord)
+    return np.where((dist_sq <= radii_sq) & (distances >= 0.0), distances, np.inf)
+
 
 class Scene:
-    def __init__(self, camera: Camera) -> None:
+    def __init__(self, camera: Camera, spatial_index: bool = True) -> None:
         self.camera = camera
+        self.transforms = camera.renderer.transforms
         self.entities = []
+        self._rows: np.ndarray | None = None
+
+        # Bumped whenever entities are added or removed:
+        self.version = 0
+
+        # Spatial index over the world space bounds of all entities:
+        self.bvh = BVH() if spatial_index else None
+        self._bvh_version = -1  # -1 forces a full rebuild
+        self._bvh_count = 0  # The first entities in `entities` that the tree holds
+        self._bvh_edited = False  # Entities were added or removed since the last sync
+        self._bounds_lo: np.ndarray | None = None
+        self._bounds_hi: np.ndarray | None = None
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Transform store rows of all entities (same order as `entities`)."""
+        if self._rows is None:
+            self._rows = np.fromiter((entity.index for entity in self.entities),
+                                     dtype=np.int64, count=len(self.entities))
+        return self._rows
 
     def add(self, entity) -> None:
         self.entities.append(entity)
+        self._rows = None
+        self.version += 1
+        self._bvh_edited = True
+
+    def add_many(self, entities: list) -> None:
+        self.entities.extend(entities)
+        self._rows = None
+        self.version += 1
+        self._bvh_edited = True
+
+    def remove(self, entity) -> None:
+        """Removes and destroys an entity (see Entity.destroy), its children stay
+        in the scene as roots."""
+        self.remove_many([entity])
+
+    def remove_many(self, entities: list) -> None:
+        removed = {id(entity) for entity in entities}
+        keep = np.fromiter((id(entity) not in removed for entity in self.entities),
+                           dtype=bool, count=len(self.entities))
+        remaining = [entity for entity, kept in zip(self.entities, keep) if kept]
+        if len(self.entities) - len(remaining) != len(removed):
+            raise ValueError("Entity is not part of the scene")
+
+        # The tree drops the removed entities and renumbers the others:
+        if self.bvh is not None and self._bvh_version >= 0:
+            remap = np.where(keep, np.cumsum(keep) - 1, -1)
+            self.bvh.remove(remap[:self._bvh_count])
+            self._bvh_count = int(keep[:self._bvh_count].sum())
+
+        self.entities = remaining
+        self._rows = None
+        self.version += 1
+        self._bvh_edited = True
+        for entity in entities:
+            entity.destroy()
 
     def update(self, dt: float) -> None:
+        """Updates all entities, spread across the job system of the transform store
+        if it has one. Entity.update may only modify its own entity then."""
         self.camera.update()
-        for entity in self.entities:
-            entity.update()
-    
+
+        entities = self.entities
+        jobs = self.transforms.jobs
+        if jobs is None:
+            for entity in entities:
+                entity.update(dt)
+            return
+
+        def update_range(start: int, end: int) -> None:
+            for entity in entities[start:end]:
+                entity.update(dt)
+
+        jobs.parallel_for(len(entities), update_range)
+
+    def query_frustum(self, planes: np.ndarray) -> list:
+        """All entities whose bounding sphere intersects the frustum planes."""
+        return [self.entities[i] for i in self.query_frustum_ids(planes)]
+
+    def query_frustum_ids(self, planes: np.ndarray) -> np.ndarray:
+        """Like `query_frustum`, but returns the (sorted) indices into `entities`."""
+        ids = self._query(lambda lo, hi: frustum_test(planes, lo, hi))
+
+        # Refine the box hits with the tighter bounding spheres:
+        rows = self.rows[ids]
+        distances = self.transforms.world_centers[rows] @ planes[:, :3].T + planes[:, 3]
+        return ids[np.all(distances >= -self.transforms.world_radii[rows][:, None], axis=1)]
+
+    def query_aabb(self, lo, hi) -> list:
+        """All entities whose bounds overlap the box [lo, hi]."""
+        lo, hi = np.asarray(lo, dtype=np.float32), np.asarray(hi, dtype=np.float32)
+        ids = self._query(lambda node_lo, node_hi: aabb_test(lo, hi, node_lo, node_hi))
+        return [self.entities[i] for i in ids]
+
+    def query_sphere(self, center, radius: float) -> list:
+        """All entities whose bounding sphere overlaps the sphere."""
+        center = np.asarray(center, dtype=np.float32)
+        ids = self._query(lambda lo, hi: sphere_test(center, radius, lo, hi))
+
+        rows = self.rows[ids]
+        distances = np.linalg.norm(self.transforms.world_centers[rows] - center, axis=1)
+        ids = ids[distances <= self.transforms.world_radii[rows] + radius]
+        return [self.entities[i] for i in ids]
+
+    def raycast(self, origin, direction, max_distance: float = np.inf, all_hits: bool = False):
+        """Casts a ray against the bounding spheres of all entities.
+
+        Returns the nearest (entity, distance) or None. With `all_hits` a list of
+        all hits sorted by distance is returned instead.
+        """
+        origin = np.asarray(origin, dtype=np.float32)
+        direction = np.asarray(direction, dtype=np.float32)
+        direction = direction / np.linalg.norm(direction)
+
+        if self._sync_index():
+            ids, _ = self.bvh.query_ray(origin, direction, max_distance, self._bounds_lo, self._bounds_hi)
+        else:
+            ids = np.arange(len(self.entities))
+
+        rows = self.rows[ids]
+        distances = ray_sphere_distances(origin, direction,
+                                         self.transforms.world_centers[rows],
+                                         self.transforms.world_radii[rows])
+        mask = distances <= max_distance
+        ids, distances = ids[mask], distances[mask]
+        order = np.argsort(distances)
+
+        if all_hits:
+            return [(self.entities[ids[i]], float(distances[i])) for i in order]
+        if len(order) == 0:
+            return None
+        return self.entities[ids[order[0]]], float(distances[order[0]])
+
+    def _query(self, node_test) -> np.ndarray:
+        if self._sync_index():
+            return np.sort(self.bvh.query(node_test, self._bounds_lo, self._bounds_hi))
+
+        # No spatial index, test everything:
+        self._update_bounds()
+        ids = np.arange(len(self.entities))
+        return ids[node_test(self._bounds_lo, self._bounds_hi) != 0]
+
+    def _update_bounds(self) -> None:
+        self.transforms.update_matrices()
+        rows = self.rows
+        centers, radii = self.transforms.world_centers[rows], self.transforms.world_radii[rows, None]
+        self._bounds_lo, self._bounds_hi = centers - radii, centers + radii
+
+    def _sync_index(self) -> bool:
+        """Brings the spatial index up to date. Returns False without an index."""
+        if self.bvh is None:
+            return False
+
+        self.transforms.update_matrices()
+        if self._bvh_version == self.transforms.version and not self._bvh_edited:
+            return True
+
+        if self._bvh_version < 0 or self.bvh.size == 0:
+            self._update_bounds()
+            self.bvh.build(self._bounds_lo, self._bounds_hi)
+        elif self._bvh_edited or np.any(self.transforms.row_versions[self.rows] > self._bvh_version):
+            # Insert the added entities (removed ones already left the tree in
+            # remove_many), refit for the moved ones and rebuild once it degraded:
+            self._update_bounds()
+            added = np.arange(self._bvh_count, len(self.entities))
+            if len(added):
+                self.bvh.insert(added, self._bounds_lo[added], self._bounds_hi[added])
+            self.bvh.refit(self._bounds_lo, self._bounds_hi)
+            if self.bvh.degraded:
+                self.bvh.build(self._bounds_lo, self._bounds_hi)
+
+        self._bvh_count = len(self.entities)
+        self._bvh_edited = False
+        self._bvh_version = self.transforms.version
+        return True
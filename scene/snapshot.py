@@ -0,0 +1,165 @@
+"""Binary scene snapshot format (.sss).
+
+    HEADER     (64 bytes, little endian)
+    MESH TABLE (aligned to 64 bytes) mesh file paths relative to the snapshot,
+               utf-8, separated by "\\0"
+    ENTITIES   (aligned to 64 bytes) one ENTITY_DTYPE record per entity
+
+Loading memory maps the file and builds the scene in bulk: the transform store
+rows of all entities are allocated and filled with a few array assignments, the
+meshes are loaded through the MeshCache (every file once) and the transforms
+go to the GPU with the next frame, in one write.
+"""
+import os
+import struct
+from concurrent.futures import Executor
+from pathlib import Path
+import numpy as np
+from graphics.mesh_cache import MeshCache
+from .entity import Entity
+from .hierarchy import compute_depths
+from .scene import Scene
+
+MAGIC = b"SSS1"
+VERSION = 1
+ALIGNMENT = 64
+
+# magic, version, reserved, entity count, mesh count, mesh table offset,
+# mesh table bytes, entity offset
+HEADER = struct.Struct("<4sHHIIQQQ")
+HEADER_SIZE = 64
+
+# Entity flags:
+FLAG_STATIC = 1
+
+ENTITY_DTYPE = np.dtype([
+    ("position", "<f4", 3),
+    ("rotation", "<f4", 3),  # Euler angles (degrees)
+    ("scale", "<f4", 3),
+    ("mesh", "<i4"),  # Index into the mesh table, -1 for none
+    ("parent", "<i4"),  # Index of the parent entity, -1 for none
+    ("flags", "<u4"),
+])
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_scene(path: str | Path, scene: Scene) -> None:
+    """Writes the entities of `scene` (not the camera). Meshes are referenced by
+    the .ssm file they were loaded from (Mesh.source), entities that are still
+    streaming by the file they wait for."""
+    path = Path(path)
+    transforms = scene.transforms
+    rows = scene.rows
+
+    mesh_ids: dict[Path, int] = {}
+    entity_meshes = np.full(len(rows), -1, dtype=np.int32)
+    for i, entity in enumerate(scene.entities):
+        source = entity.stream.path if entity.stream is not None else getattr(entity.mesh, "source", None)
+        if source is None:
+            if entity.mesh is None:
+                continue
+            raise ValueError(f"entity {i}: its mesh was not loaded from a file, save it with write_mesh first")
+        if Path(source).suffix.lower() != ".ssm":
+            raise ValueError(f"entity {i}: {source} is not a .ssm file, convert it with write_mesh first")
+        entity_meshes[i] = mesh_ids.setdefault(Path(source).resolve(), len(mesh_ids))
+
+    names = []
+    for source in mesh_ids:
+        try:
+            names.append(os.path.relpath(source, path.parent.resolve()))
+        except ValueError:
+            names.append(str(source))  # Different drive (Windows)
+    table = "\0".join(names).encode()
+
+    # Parents outside of the scene are dropped:
+    row_ids = np.full(transforms.capacity, -1, dtype=np.int64)
+    row_ids[rows] = np.arange(len(rows))
+    parents = transforms.hierarchy.parents[rows]
+
+    records = np.zeros(len(rows), dtype=ENTITY_DTYPE)
+    records["position"] = transforms.positions[rows]
+    records["rotation"] = transforms.rotations[rows]
+    records["scale"] = transforms.scales[rows]
+    records["mesh"] = entity_meshes
+    records["parent"] = np.where(parents >= 0, row_ids[np.maximum(parents, 0)], -1)
+    records["flags"] = np.where(transforms.static[rows], FLAG_STATIC, 0)
+
+    table_offset = _align(HEADER_SIZE)
+    entity_offset = _align(table_offset + len(table))
+    header = HEADER.pack(MAGIC, VERSION, 0, len(records), len(mesh_ids),
+                         table_offset, len(table), entity_offset)
+
+    with open(path, "wb") as file:
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+        file.seek(table_offset)
+        file.write(table)
+        file.seek(entity_offset)
+        file.write(records.tobytes())
+
+
+def load_scene(path: str | Path, camera, mesh_cache: MeshCache, executor: Executor | None = None) -> Scene:
+    """Builds a new scene (viewed through `camera`) from a snapshot. With an
+    executor the mesh files are read in parallel."""
+    path = Path(path)
+    with open(path, "rb") as file:
+        fields = HEADER.unpack(file.read(HEADER.size))
+    magic, version, _, entity_count, mesh_count, table_offset, table_size, entity_offset = fields
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} scene snapshot")
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    entity_end = entity_offset + entity_count * ENTITY_DTYPE.itemsize
+    if len(data) < max(table_offset + table_size, entity_end):
+        raise ValueError(f"{path} is truncated")
+    table = bytes(data[table_offset:table_offset + table_size]).decode()
+    mesh_paths = [path.parent / name for name in table.split("\0")] if mesh_count else []
+    records = data[entity_offset:entity_end].view(ENTITY_DTYPE)
+
+    # Validate everything before the first row is allocated:
+    mesh_ids = records["mesh"].astype(np.int64)
+    parents = records["parent"].astype(np.int64)
+    if len(mesh_paths) != mesh_count:
+        raise ValueError(f"{path}: broken mesh table")
+    if np.any((mesh_ids < -1) | (mesh_ids >= mesh_count)) or np.any((parents < -1) | (parents >= entity_count)):
+        raise ValueError(f"{path}: mesh or parent index out of range")
+    compute_depths(parents)
+
+    meshes = mesh_cache.load_many(mesh_paths, executor)
+
+    renderer = camera.renderer
+    transforms = renderer.transforms
+    rows = transforms.allocate_many(entity_count)
+    transforms.positions[rows] = records["position"]
+    transforms.rotations[rows] = records["rotation"]
+    transforms.scales[rows] = records["scale"]
+
+    # Bounding spheres of the meshes, by mesh index:
+    drawable = mesh_ids >= 0
+    transforms.drawable[rows] = drawable
+    if meshes:
+        centers = np.array([mesh.bounding_center for mesh in meshes], dtype=np.float32)
+        radii = np.array([mesh.bounding_radius for mesh in meshes], dtype=np.float32)
+        transforms.bounds_centers[rows[drawable]] = centers[mesh_ids[drawable]]
+        transforms.bounds_radii[rows[drawable]] = radii[mesh_ids[drawable]]
+    transforms.mesh_version += 1
+
+    static = (records["flags"] & FLAG_STATIC) != 0
+    if np.any(static):
+        transforms.static[rows] = static
+        transforms.static_version += 1
+
+    linked = np.flatnonzero(parents >= 0)
+    if len(linked):
+        transforms.hierarchy.set_parents(rows[linked], rows[parents[linked]], transforms.count)
+
+    entities = Entity.from_rows(renderer, rows, [meshes[i] if i >= 0 else None for i in mesh_ids.tolist()])
+    for child, parent in zip(linked.tolist(), parents[linked].tolist()):
+        entities[child]._parent = entities[parent]
+        entities[parent].children.append(entities[child])
+
+    scene = Scene(camera)
+    scene.add_many(entities)
+    return scene
@@ -0,0 +1,314 @@
+import numpy as np
+from .hierarchy import Hierarchy
+
+# Fewer dirty rows than this are not worth splitting into jobs:
+PARALLEL_ROWS = 4096
+
+
+def compute_model_matrices(positions: np.ndarray,
+                           rotations: np.ndarray,
+                           scales: np.ndarray) -> np.ndarray:
+    """Vectorized version of translate * rotate_x * rotate_y * rotate_z * scale.
+
+    Rotations are euler angles in degrees. The result is column-major (N, 4, 4),
+    exactly the memory layout wgsl expects for a mat4x4<f32>.
+    """
+    radians = np.radians(rotations)
+    cos_x, cos_y, cos_z = np.cos(radians).T
+    sin_x, sin_y, sin_z = np.sin(radians).T
+    scale_x, scale_y, scale_z = scales.T
+
+    matrices = np.zeros((len(positions), 4, 4), dtype=np.float32)
+
+    # Column 0:
+    matrices[:, 0, 0] = cos_y * cos_z * scale_x
+    matrices[:, 0, 1] = (cos_x * sin_z + sin_x * sin_y * cos_z) * scale_x
+    matrices[:, 0, 2] = (sin_x * sin_z - cos_x * sin_y * cos_z) * scale_x
+
+    # Column 1:
+    matrices[:, 1, 0] = -cos_y * sin_z * scale_y
+    matrices[:, 1, 1] = (cos_x * cos_z - sin_x * sin_y * sin_z) * scale_y
+    matrices[:, 1, 2] = (sin_x * cos_z + cos_x * sin_y * sin_z) * scale_y
+
+    # Column 2:
+    matrices[:, 2, 0] = sin_y * scale_z
+    matrices[:, 2, 1] = -sin_x * cos_y * scale_z
+    matrices[:, 2, 2] = cos_x * cos_y * scale_z
+
+    # Column 3 (translation):
+    matrices[:, 3, :3] = positions
+    matrices[:, 3, 3] = 1.0
+
+    return matrices
+
+
+class TransformStore:
+    """Structure-of-arrays storage for the transforms of all entities.
+
+    Every entity owns one row. Changed rows are flagged dirty and their model
+    matrices are recomputed in one vectorized pass by `update_matrices`. Rows
+    may have a parent row, their transform is relative to it then: `matrices`
+    holds the world matrices, `local_matrices` the ones relative to the parent.
+    """
+    def __init__(self, capacity: int = 1024, jobs=None) -> None:
+        self.capacity = capacity
+        self.jobs = jobs  # Optional JobSystem, large updates are split across its workers
+        self.count = 0  # High-water mark, rows >= count were never used
+        self.free_rows: list[int] = []
+
+        # Transform data:
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.rotations = np.zeros((capacity, 3), dtype=np.float32)  # Euler angles (degrees)
+        self.scales = np.ones((capacity, 3), dtype=np.float32)
+        self.local_matrices = np.zeros((capacity, 4, 4), dtype=np.float32)
+        self.matrices = np.zeros((capacity, 4, 4), dtype=np.float32)
+
+        # Parent links, moving a row moves all of its descendants:
+        self.hierarchy = Hierarchy(capacity)
+
+        # State at the start of the current simulation tick, for interpolation:
+        self.previous_positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.previous_rotations = np.zeros((capacity, 3), dtype=np.float32)
+        self.previous_scales = np.ones((capacity, 3), dtype=np.float32)
+        self.moved = np.zeros(capacity, dtype=bool)  # Changed during the current tick
+        self.interpolated = np.zeros(capacity, dtype=bool)  # Matrix holds a blended state
+
+        # Bounding spheres in local and (cached) world space:
+        self.bounds_centers = np.zeros((capacity, 3), dtype=np.float32)
+        self.bounds_radii = np.zeros(capacity, dtype=np.float32)
+        self.world_centers = np.zeros((capacity, 3), dtype=np.float32)
+        self.world_radii = np.zeros(capacity, dtype=np.float32)
+
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+        # Bumped whenever a row is (re)allocated, per-row state kept elsewhere
+        # (e.g. LOD levels) compares it to notice recycled rows:
+        self.generations = np.zeros(capacity, dtype=np.uint32)
+
+        # Rows without a mesh to draw (still streaming, no placeholder) are skipped:
+        self.drawable = np.zeros(capacity, dtype=bool)
+        self.mesh_version = 0  # Bumped whenever an entity gets another mesh
+
+        # Static rows are recorded once into a render bundle:
+        self.static = np.zeros(capacity, dtype=bool)
+        self.static_version = 0
+
+        # Bumped by every update, consumers compare row_versions against the
+        # version they saw last to find moved rows:
+        self.version = 0
+        self.row_versions = np.zeros(capacity, dtype=np.int64)
+
+        # Rows [start, end) whose matrices changed since the last upload:
+        self.upload_range: tuple[int, int] | None = None
+
+    def allocate(self) -> int:
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow(self.capacity * 2)
+            row = self.count
+            self.count += 1
+
+        self._reset(row)
+        return row
+
+    def allocate_many(self, count: int) -> np.ndarray:
+        """Allocates `count` rows at once, free rows first."""
+        reused = [self.free_rows.pop() for _ in range(min(count, len(self.free_rows)))]
+        fresh = count - len(reused)
+
+        capacity = self.capacity
+        while self.count + fresh > capacity:
+            capacity *= 2
+        if capacity > self.capacity:
+            self._grow(capacity)
+
+        rows = np.concatenate([np.array(reused, dtype=np.int64), np.arange(self.count, self.count + fresh)])
+        self.count += fresh
+        self._reset(rows)
+        return rows
+
+    def _reset(self, row: int | np.ndarray) -> None:
+        self.positions[row] = 0.0
+        self.rotations[row] = 0.0
+        self.scales[row] = 1.0
+        self.previous_positions[row] = 0.0
+        self.previous_rotations[row] = 0.0
+        self.previous_scales[row] = 1.0
+        self.moved[row] = False
+        self.interpolated[row] = False
+        self.row_versions[row] = 0
+        self.generations[row] += 1
+        self.alive[row] = True
+        self.dirty[row] = True
+        self.drawable[row] = True
+
+    def free(self, row: int) -> None:
+        # Children become roots, their transform is taken as a world transform from now on:
+        for child in self.hierarchy.children(row, self.count).tolist():
+            self.set_parent(child, -1)
+        self.hierarchy.set_parent(row, -1)
+
+        self.alive[row] = False
+        self.dirty[row] = False
+        self.moved[row] = False
+        self.interpolated[row] = False
+        self.drawable[row] = False
+        self.set_static(row, False)
+        self.free_rows.append(row)
+
+    def mark_dirty(self, row: int) -> None:
+        self.dirty[row] = True
+
+    def set_parent(self, row: int, parent: int) -> None:
+        """Attaches `row` to `parent` (-1 detaches it), its transform is relative to the parent then."""
+        self.hierarchy.set_parent(row, parent)
+        self.dirty[row] = True
+
+    def set_static(self, row: int, static: bool) -> None:
+        if self.static[row] != static:
+            self.static[row] = static
+            self.static_version += 1
+
+    def set_drawable(self, row: int, drawable: bool) -> None:
+        if self.drawable[row] != drawable:
+            self.drawable[row] = drawable
+            self.dirty[row] = True  # New row version, e.g. to re-record the static bundle
+
+    def set_bounds(self, row: int, center: np.ndarray, radius: float) -> None:
+        self.bounds_centers[row] = center
+        self.bounds_radii[row] = radius
+        self.dirty[row] = True
+
+    def update_matrices(self) -> None:
+        rows = np.flatnonzero(self.dirty[:self.count])
+        if len(rows) == 0:
+            return
+
+        self._for_rows(rows, self._compute_matrices)
+        self.dirty[rows] = False
+
+        # New rows start at their current state, instead of blending in from the origin:
+        new_rows = rows[self.row_versions[rows] == 0]
+        self.previous_positions[new_rows] = self.positions[new_rows]
+        self.previous_rotations[new_rows] = self.rotations[new_rows]
+        self.previous_scales[new_rows] = self.scales[new_rows]
+
+        self.moved[rows] = True
+        self._commit(self._propagate(rows))
+
+    def begin_tick(self) -> None:
+        """Call before every simulation tick, the current state becomes the previous one."""
+        rows = np.flatnonzero(self.moved[:self.count])
+        if len(rows) == 0:
+            return
+
+        self.previous_positions[rows] = self.positions[rows]
+        self.previous_rotations[rows] = self.rotations[rows]
+        self.previous_scales[rows] = self.scales[rows]
+        self.moved[rows] = False
+
+    def interpolate(self, alpha: float) -> None:
+        """Blends the matrices of the rows moved in the last tick between their
+        previous and current state, alpha = 0 is the previous state."""
+        self.update_matrices()
+
+        # Rows that stopped moving get their exact matrices back:
+        stale = np.flatnonzero(self.interpolated[:self.count] & ~self.moved[:self.count])
+        if len(stale):
+            self._for_rows(stale, self._compute_matrices)
+            self.interpolated[stale] = False
+
+        rows = np.flatnonzero(self.moved[:self.count])
+        if len(rows) == 0:
+            if len(stale):
+                self._commit(self._propagate(stale))
+            return
+
+        def blend(rows: np.ndarray) -> None:
+            previous_rotations = self.previous_rotations[rows]
+            # Shortest way around, e.g. 350° to 10° turns by 20° instead of -340°:
+            rotation_delta = (self.rotations[rows] - previous_rotations + 180.0) % 360.0 - 180.0
+
+            self.local_matrices[rows] = compute_model_matrices(
+                self.previous_positions[rows] + (self.positions[rows] - self.previous_positions[rows]) * alpha,
+                previous_rotations + rotation_delta * alpha,
+                self.previous_scales[rows] + (self.scales[rows] - self.previous_scales[rows]) * alpha,
+            )
+
+        self._for_rows(rows, blend)
+        self.interpolated[rows] = True
+        self._commit(self._propagate(np.union1d(stale, rows)))
+
+    def _propagate(self, rows: np.ndarray) -> np.ndarray:
+        """The local matrices of `rows` changed, updates the world matrices of
+        them and their descendants. Returns all rows whose world matrix changed."""
+        return self.hierarchy.propagate(rows, self.local_matrices, self.matrices, self.count)
+
+    def _commit(self, rows: np.ndarray) -> None:
+        """The matrices of `rows` changed, update everything derived from them."""
+        self._for_rows(rows, self._update_world_bounds)
+        self.version += 1
+        self.row_versions[rows] = self.version
+
+        # Dirty rows are uploaded as one contiguous range:
+        start, end = int(rows[0]), int(rows[-1]) + 1
+        if self.upload_range:
+            start, end = min(start, self.upload_range[0]), max(end, self.upload_range[1])
+        self.upload_range = (start, end)
+
+    def _for_rows(self, rows: np.ndarray, function) -> None:
+        """Calls `function(rows)`, in parallel chunks when there are many rows."""
+        if self.jobs is None or len(rows) < PARALLEL_ROWS:
+            function(rows)
+            return
+        self.jobs.parallel_for(len(rows), lambda start, end: function(rows[start:end]))
+
+    def _compute_matrices(self, rows: np.ndarray) -> None:
+        self.local_matrices[rows] = compute_model_matrices(self.positions[rows],
+                                                     self.rotations[rows],
+                                                     self.scales[rows])
+
+    def _update_world_bounds(self, rows: np.ndarray) -> None:
+        matrices = self.matrices[rows]
+        linear = matrices[:, :3, :3]  # [column][row]
+
+        # Transform the sphere center and scale the radius by the largest axis scale:
+        self.world_centers[rows] = np.einsum("ncr,nc->nr", linear, self.bounds_centers[rows]) + matrices[:, 3, :3]
+        self.world_radii[rows] = self.bounds_radii[rows] * np.linalg.norm(linear, axis=2).max(axis=1)
+
+    def take_upload_range(self) -> tuple[int, int] | None:
+        upload_range = self.upload_range
+        self.upload_range = None
+        return upload_range
+
+    def _grow(self, capacity: int) -> None:
+        def grow(array: np.ndarray, fill: float) -> np.ndarray:
+            grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            grown[:self.capacity] = array
+            return grown
+
+        self.positions = grow(self.positions, 0.0)
+        self.rotations = grow(self.rotations, 0.0)
+        self.scales = grow(self.scales, 1.0)
+        self.local_matrices = grow(self.local_matrices, 0.0)
+        self.matrices = grow(self.matrices, 0.0)
+        self.previous_positions = grow(self.previous_positions, 0.0)
+        self.previous_rotations = grow(self.previous_rotations, 0.0)
+        self.previous_scales = grow(self.previous_scales, 1.0)
+        self.moved = grow(self.moved, False)
+        self.interpolated = grow(self.interpolated, False)
+        self.bounds_centers = grow(self.bounds_centers, 0.0)
+        self.bounds_radii = grow(self.bounds_radii, 0.0)
+        self.world_centers = grow(self.world_centers, 0.0)
+        self.world_radii = grow(self.world_radii, 0.0)
+        self.alive = grow(self.alive, False)
+        self.dirty = grow(self.dirty, False)
+        self.drawable = grow(self.drawable, False)
+        self.static = grow(self.static, False)
+        self.row_versions = grow(self.row_versions, 0)
+        self.generations = grow(self.generations, 0)
+        self.hierarchy.grow(capacity)
+        self.capacity = capacity
@@ -0,0 +1,13 @@
+import pytest
+from graphics.context import request_device
+
+
+@pytest.fixture(scope="session")
+def gpu_device():
+    """(adapter, device) of a real GPU, else the fallback adapter, else the test is skipped."""
+    for force_fallback_adapter in (False, True):
+        try:
+            return request_device(force_fallback_adapter)
+        except RuntimeError:
+            pass
+    pytest.skip("no graphics adapter, not even the fallback adapter")
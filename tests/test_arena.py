@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from graphics.arena import Block, RangeAllocator
+
+STEPS = 2000
+
+
+def check(allocator: RangeAllocator, blocks: list[Block], alignment: int) -> None:
+    """Blocks and free ranges tile [0, capacity) exactly."""
+    ranges = sorted([(block.offset, block.size, "used") for block in blocks] +
+                    [(offset, size, "free") for offset, size in allocator.free_ranges])
+
+    # No overlaps or lost bytes, free neighbours are coalesced:
+    cursor, previous = 0, None
+    for offset, size, kind in ranges:
+        assert offset == cursor, f"{'overlap' if offset < cursor else 'gap'} at {offset}"
+        assert size > 0
+        assert not kind == previous == "free", f"uncoalesced free range at {offset}"
+        cursor, previous = offset + size, kind
+    assert cursor == allocator.capacity
+    assert allocator.used == sum(block.size for block in blocks)
+    assert all(block.offset % alignment == 0 for block in blocks)
+
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("alignment", [4, 24, 256])
+def test_random_allocations_and_frees(seed: int, alignment: int):
+    # One alignment per allocator like the arena buffers, sizes are multiples of 4 only:
+    rng = np.random.default_rng(seed)
+    allocator = RangeAllocator(64 * 1024)
+    blocks: list[Block] = []
+    resized = set()
+
+    for step in range(STEPS):
+        # Waves of mostly allocating and mostly freeing:
+        free_probability = 0.3 if step // 250 % 2 == 0 else 0.7
+        if blocks and rng.random() < free_probability:
+            block = blocks.pop(rng.integers(len(blocks)))
+            allocator.free(block.offset, block.size)
+        else:
+            size = 4 * int(rng.integers(1, 1024))
+            offset = allocator.allocate(size, alignment)
+            if offset is None:
+                # Full or too fragmented: compact (a defragmentation), grow if that is not enough:
+                allocator.compact(blocks, alignment)
+                resized.add("compact")
+                offset = allocator.allocate(size, alignment)
+                if offset is None:
+                    allocator.grow(allocator.capacity * 2)
+                    resized.add("grow")
+                    offset = allocator.allocate(size, alignment)
+            blocks.append(Block(offset, size))
+        check(allocator, blocks, alignment)
+    assert resized == {"grow", "compact"}
+
+
+def test_compaction_moves_blocks_to_the_front():
+    allocator = RangeAllocator(1024)
+    blocks = [Block(allocator.allocate(size, 16), size) for size in (100, 40, 64, 12)]
+    allocator.free(blocks[0].offset, blocks[0].size)
+    allocator.free(blocks[2].offset, blocks[2].size)
+    live = [blocks[1], blocks[3]]
+    sources = [block.offset for block in live]
+
+    moves = allocator.compact(live, 16)
+    assert moves == [(sources[0], 0, 40), (sources[1], 48, 12)]
+    assert [block.offset for block in live] == [0, 48]
+    check(allocator, live, 16)
+    assert allocator.free_ranges == [[40, 8], [60, 1024 - 60]]
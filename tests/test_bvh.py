@@ -0,0 +1,67 @@
+import numpy as np
+from scene.bvh import BVH, aabb_test
+
+
+def random_boxes(rng: np.random.Generator, count: int) -> tuple[np.ndarray, np.ndarray]:
+    centers = rng.uniform(-100.0, 100.0, (count, 3)).astype(np.float32)
+    radii = rng.uniform(0.1, 2.0, (count, 1)).astype(np.float32)
+    return centers - radii, centers + radii
+
+
+def query_box(bvh: BVH, lo: np.ndarray, hi: np.ndarray, query_lo, query_hi) -> list:
+    return sorted(bvh.query(lambda a, b: aabb_test(query_lo, query_hi, a, b), lo, hi).tolist())
+
+
+def brute_force(lo: np.ndarray, hi: np.ndarray, query_lo, query_hi) -> list:
+    return np.flatnonzero(aabb_test(query_lo, query_hi, lo, hi) != 0).tolist()
+
+
+def test_insert_and_remove_match_brute_force():
+    rng = np.random.default_rng(3)
+    lo, hi = random_boxes(rng, 500)
+    bvh = BVH(leaf_size=8)
+    bvh.build(lo, hi)
+
+    for _ in range(20):
+        # Remove a random tenth, renumbering the others like Scene.remove_many:
+        keep = rng.random(len(lo)) > 0.1
+        bvh.remove(np.where(keep, np.cumsum(keep) - 1, -1))
+        lo, hi = lo[keep], hi[keep]
+
+        added_lo, added_hi = random_boxes(rng, 60)
+        ids = np.arange(len(lo), len(lo) + len(added_lo))
+        lo, hi = np.concatenate([lo, added_lo]), np.concatenate([hi, added_hi])
+        bvh.insert(ids, added_lo, added_hi)
+        bvh.refit(lo, hi)
+
+        assert sorted(bvh.order.tolist()) == list(range(len(lo)))
+        for _ in range(5):
+            query_lo = rng.uniform(-100.0, 60.0, 3)
+            query_hi = query_lo + rng.uniform(5.0, 40.0, 3)
+            assert query_box(bvh, lo, hi, query_lo, query_hi) == brute_force(lo, hi, query_lo, query_hi)
+
+
+def test_overfilled_leaves_degrade_the_tree():
+    rng = np.random.default_rng(5)
+    lo, hi = random_boxes(rng, 64)
+    bvh = BVH(leaf_size=8)
+    bvh.build(lo, hi)
+    assert not bvh.degraded
+
+    # Everything lands in the same corner, so one leaf takes all of it:
+    added_lo = np.full((200, 3), 99.0, dtype=np.float32)
+    bvh.insert(np.arange(64, 264), added_lo, added_lo + 0.5)
+    bvh.refit(np.concatenate([lo, added_lo]), np.concatenate([hi, added_lo + 0.5]))
+    assert bvh.degraded
+
+
+def test_removing_everything_leaves_an_empty_tree():
+    rng = np.random.default_rng(7)
+    lo, hi = random_boxes(rng, 100)
+    bvh = BVH(leaf_size=8)
+    bvh.build(lo, hi)
+
+    bvh.remove(np.full(100, -1))
+    bvh.refit(lo[:0], hi[:0])
+    assert bvh.size == 0
+    assert bvh.query(lambda a, b: aabb_test(lo.min(axis=0), hi.max(axis=0), a, b), lo[:0], hi[:0]).size == 0
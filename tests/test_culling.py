@@ -0,0 +1,37 @@
+import numpy as np
+from pyglm import glm
+from graphics.culling import extract_frustum_planes, cull_spheres
+
+
+def camera_planes() -> np.ndarray:
+    # At (0, 0, 5) looking down -z, 60° vertical fov, near 0.1, far 100:
+    view = glm.lookAt(glm.vec3(0, 0, 5), glm.vec3(0, 0, 4), glm.vec3(0, 1, 0))
+    proj = glm.perspective(glm.radians(60.0), 16 / 9, 0.1, 100.0)
+    return extract_frustum_planes(view, proj)
+
+
+def test_spheres_inside_and_outside_the_frustum():
+    centers = np.array([
+        [0.0, 0.0, 0.0],  # In front of the camera
+        [0.0, 0.0, -50.0],  # Deep inside
+        [0.0, 0.0, 10.0],  # Behind the camera
+        [0.0, 0.0, -200.0],  # Beyond the far plane
+        [100.0, 0.0, -5.0],  # Right of the frustum
+        [0.0, -100.0, -5.0],  # Below the frustum
+        [0.0, 0.0, 5.3],  # Behind the camera, but overlapping the near plane
+    ], dtype=np.float32)
+    radii = np.full(len(centers), 0.5, dtype=np.float32)
+
+    visible = cull_spheres(camera_planes(), centers, radii)
+    assert visible.tolist() == [True, True, False, False, False, False, True]
+
+
+def test_planes_point_inwards_and_are_normalized():
+    planes = camera_planes()
+    assert np.allclose(np.linalg.norm(planes[:, :3], axis=1), 1.0)
+
+    # A point on the view axis between near and far is inside all planes:
+    assert np.all(planes[:, :3] @ np.array([0.0, 0.0, -20.0]) + planes[:, 3] > 0.0)
+
+    # The near and far planes face along the view direction:
+    assert planes[4, 2] < 0.0 and planes[5, 2] > 0.0
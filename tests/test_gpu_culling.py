@@ -0,0 +1,11 @@
+import pytest
+from benchmarks.bench_gpu_culling import verify
+from graphics.context import GraphicsContext
+
+
+@pytest.mark.parametrize("entity_count", [1_000, 10_000])
+def test_gpu_culling_matches_the_cpu_and_the_frustum(gpu_device, entity_count: int):
+    # The visible rows read back from the GPU, cull_spheres and the analytic
+    # frustum agree, apart from spheres on a plane (see verify):
+    ctx = GraphicsContext(None, size=(640, 480), device=gpu_device)
+    assert verify(ctx, entity_count)
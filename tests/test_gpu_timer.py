@@ -0,0 +1,87 @@
+import threading
+import numpy as np
+import pytest
+from graphics.gpu_timer import GpuTimer, TIMESTAMP_FEATURE
+
+
+class FakePromise:
+    def __init__(self, buffer) -> None:
+        self.buffer = buffer
+
+    def sync_wait(self) -> None:
+        self.buffer.gpu_done.wait(timeout=10)
+        self.buffer.mapped = True
+
+
+class FakeBuffer:
+    """Maps once the GPU is done with it (`gpu_done` is set)."""
+    def __init__(self, label: str, size: int, usage: int) -> None:
+        self.label = label
+        self.size = size
+        self.gpu_done = threading.Event()
+        self.mapped = False
+        self.data = np.zeros(size // 8, dtype=np.uint64)
+
+    def map_async(self, mode: int, offset: int = 0, size: int | None = None) -> FakePromise:
+        return FakePromise(self)
+
+    def read_mapped(self, offset: int, size: int) -> memoryview:
+        assert self.mapped, "read before the buffer was mapped"
+        return memoryview(self.data.view(np.uint8)[offset:offset + size])
+
+    def unmap(self) -> None:
+        self.mapped = False
+        self.gpu_done.clear()
+
+
+class FakeDevice:
+    features = {TIMESTAMP_FEATURE}
+
+    def create_query_set(self, label: str, type: str, count: int) -> str:
+        return label
+
+    def create_buffer(self, label: str, size: int, usage: int) -> FakeBuffer:
+        return FakeBuffer(label, size, usage)
+
+
+class FakeEncoder:
+    def resolve_query_set(self, *args) -> None:
+        pass
+
+    def copy_buffer_to_buffer(self, *args) -> None:
+        pass
+
+
+def time_frame(timer: GpuTimer, frame_index: int):
+    writes = timer.timestamp_writes("RENDER_PASS")
+    timer.resolve(FakeEncoder(), frame_index)
+    return writes, timer.advance()
+
+
+@pytest.fixture
+def timer():
+    timer = GpuTimer(FakeDevice(), frames_in_flight=2)
+    yield timer
+    for buffer in timer.readback_buffers:
+        buffer.gpu_done.set()
+
+
+def test_unmapped_readbacks_skip_frames_instead_of_stalling(timer: GpuTimer):
+    first, second = timer.readback_buffers
+    first.data[:2] = [100, 250]
+    for frame_index in (0, 1):
+        writes, timings = time_frame(timer, frame_index)
+        assert writes is not None and timings is None
+
+    # The GPU is still busy with frame 0: its slot is not reused and nothing is read:
+    writes, timings = time_frame(timer, 2)
+    assert writes is None and timings is None
+    assert not first.mapped
+
+    first.gpu_done.set()
+    second.gpu_done.set()
+    for mapping in timer._mappings:
+        mapping.result(timeout=10)
+    _, timings = time_frame(timer, 3)
+    assert timings == (0, [("RENDER_PASS", 100, 250)])
+    assert time_frame(timer, 4)[1] == (1, [("RENDER_PASS", 0, 0)])
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from scene.hierarchy import Hierarchy, compute_depths
+from scene.transform import TransformStore
+
+COUNT = 2000
+
+
+def random_tree(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Every row below one with a smaller index (so no cycles), a few roots."""
+    parents = np.array([int(rng.integers(-1, row)) if row else -1 for row in range(count)])
+    parents[rng.random(count) < 0.05] = -1
+    return parents
+
+
+def check_levels(hierarchy: Hierarchy, count: int) -> None:
+    parents = hierarchy.parents[:count]
+    depths = compute_depths(parents)
+    assert np.array_equal(hierarchy.depths[:count], depths)
+
+    # Every linked row at its depth, once, sorted by parent:
+    levels = hierarchy._level_rows
+    for depth in range(1, int(depths.max()) + 1):
+        level = levels[depth]
+        assert np.array_equal(np.sort(level), np.flatnonzero(depths == depth))
+        assert np.array_equal(hierarchy._level_parents[depth], parents[level])
+        assert np.all(np.diff(hierarchy._level_parents[depth]) >= 0)
+    assert all(len(level) == 0 for level in levels[int(depths.max()) + 1:])
+
+
+def test_reparented_subtrees_move_between_levels():
+    rng = np.random.default_rng(5)
+    hierarchy = Hierarchy(COUNT)
+    hierarchy.set_parents(np.arange(COUNT), random_tree(rng, COUNT), COUNT)
+    local, world = np.zeros((COUNT, 4, 4)), np.zeros((COUNT, 4, 4))
+    hierarchy.propagate(np.arange(COUNT), local, world, COUNT)
+
+    moved = rebuilt = 0
+    for _ in range(300):
+        row, parent = int(rng.integers(0, COUNT)), int(rng.integers(-1, COUNT))
+        if parent == hierarchy.parents[row] or parent >= 0 and hierarchy._is_ancestor(row, parent):
+            continue
+        hierarchy.set_parent(row, parent)
+
+        # Moved right away while within the budget, else rebuilt by the next propagation:
+        if hierarchy._levels_version == hierarchy.version:
+            moved += 1
+        else:
+            rebuilt += 1
+            hierarchy.propagate(np.zeros(0, dtype=np.int64), local, world, COUNT)
+        check_levels(hierarchy, COUNT)
+    assert moved > 100 and rebuilt > 0
+
+
+def test_world_matrices_follow_reparented_subtrees():
+    rng = np.random.default_rng(9)
+    parents = random_tree(rng, COUNT)
+    positions = rng.uniform(-1.0, 1.0, (COUNT, 3))
+
+    def create_store(parents: np.ndarray) -> TransformStore:
+        store = TransformStore(capacity=COUNT)
+        store.allocate_many(COUNT)
+        store.positions[:COUNT] = positions
+        store.hierarchy.set_parents(np.arange(COUNT), parents, COUNT)
+        store.update_matrices()
+        return store
+
+    store = create_store(parents)
+    for row, parent in ((10, 1500), (3, -1), (700, 4)):
+        if not store.hierarchy._is_ancestor(row, parent):
+            store.set_parent(row, parent)
+    store.update_matrices()
+
+    expected = create_store(store.hierarchy.parents[:COUNT])
+    assert np.allclose(store.matrices[:COUNT], expected.matrices[:COUNT])
+
+
+def test_cycles_are_rejected():
+    hierarchy = Hierarchy(4)
+    hierarchy.set_parent(1, 0)
+    hierarchy.set_parent(2, 1)
+    with pytest.raises(ValueError, match="descendant"):
+        hierarchy.set_parent(0, 2)
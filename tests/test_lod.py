@@ -0,0 +1,70 @@
+import numpy as np
+import graphics.lod
+from graphics.lod import LodSelector, generate_lods, simplify, MIN_PROGRESS
+from graphics.mesh import create_sphere_data
+from scene.transform import TransformStore
+
+
+class FakeCamera:
+    position = (0.0, 0.0, 0.0)
+    clip_near = 0.1
+    fovy = 60.0
+
+
+def test_chain_ends_when_simplification_stalls():
+    vertices, indices = create_sphere_data(64)
+    chain = [len(indices) // 3] + [len(lod_indices) // 3 for _, lod_indices in generate_lods(vertices, indices)]
+
+    # Every level removed at least half of what it was asked to:
+    targets = [int(chain[0] * ratio) for ratio in (0.5, 0.25, 0.125)]
+    for previous, triangles, target in zip(chain, chain[1:], targets):
+        assert (previous - triangles) / (previous - target) >= MIN_PROGRESS
+
+
+def flat_grid(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """size x size vertices in the xz plane, every quadric error is 0."""
+    x, z = np.meshgrid(np.arange(size, dtype=np.float32), np.arange(size, dtype=np.float32), indexing="ij")
+    vertices = np.zeros((size * size, 6), dtype=np.float32)
+    vertices[:, 0], vertices[:, 2] = x.ravel(), z.ravel()
+    corners = (np.arange(size - 1)[:, None] * size + np.arange(size - 1)[None]).ravel()
+    quads = np.stack([corners, corners + 1, corners + size,
+                      corners + 1, corners + size + 1, corners + size], axis=-1)
+    return vertices, quads.ravel().astype(np.uint32)
+
+
+def test_flat_regions_simplify_in_few_passes(monkeypatch):
+    passes = []
+    compute_errors = graphics.lod._quadric_errors
+    monkeypatch.setattr(graphics.lod, "_quadric_errors",
+                        lambda quadrics, points: passes.append(1) or compute_errors(quadrics, points))
+
+    vertices, indices = flat_grid(60)
+    triangles = len(indices) // 3
+    _, simplified = simplify(vertices, indices, triangles // 4)
+
+    # Two error evaluations per pass, ties between the zero costs must not
+    # serialize the collapses to about one per pass:
+    assert len(simplified) // 3 <= triangles // 4 * 1.1
+    assert len(passes) // 2 < 40
+
+
+def test_recycled_rows_start_at_full_resolution():
+    transforms = TransformStore(capacity=4)
+    rows = transforms.allocate_many(2)
+    transforms.bounds_radii[rows] = 1.0
+    transforms.positions[rows] = [[0.0, 0.0, -1000.0], [0.0, 0.0, -1000.0]]
+    transforms.update_matrices()
+
+    selector = LodSelector()
+    camera = FakeCamera()
+    assert selector.select(rows, transforms, camera).tolist() == [3, 3]
+
+    # The row of a far away entity goes to a closer one, right inside the
+    # hysteresis band of the first level, which must not inherit the old level:
+    transforms.free(int(rows[0]))
+    row = transforms.allocate()
+    assert row == rows[0]
+    transforms.bounds_radii[row] = 1.0
+    transforms.positions[row] = [0.0, 0.0, -7.2]
+    transforms.update_matrices()
+    assert selector.select(np.array([row]), transforms, camera).tolist() == [0]
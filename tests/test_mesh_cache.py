@@ -0,0 +1,55 @@
+from pathlib import Path
+import pytest
+from graphics.mesh import create_cube_data, create_sphere_data
+from graphics.mesh_cache import MeshCache
+from graphics.mesh_format import write_mesh
+
+
+class FakeBuffer:
+    def __init__(self, label: str, size: int) -> None:
+        self.label = label
+        self.size = size
+
+    def destroy(self) -> None:
+        pass
+
+
+class FakeDevice:
+    """Creates buffers that only know their size, enough for meshes outside an arena."""
+    def create_buffer_with_data(self, label: str, data, usage: int) -> FakeBuffer:
+        return FakeBuffer(label, data.nbytes)
+
+
+@pytest.fixture
+def cache() -> MeshCache:
+    return MeshCache(FakeDevice(), budget=2**30)
+
+
+def test_unchanged_files_are_served_from_the_cache(tmp_path: Path, cache: MeshCache):
+    path = tmp_path / "mesh.ssm"
+    write_mesh(path, *create_cube_data())
+
+    mesh = cache.load(path)
+    assert cache.load(path) is mesh
+    cache.release(mesh)
+    cache.release(mesh)
+
+    # Unused but still cached, a reload is free:
+    assert cache.load(path) is mesh
+    assert cache.misses == 1
+
+
+@pytest.mark.parametrize("budget", [2**30, 0])
+def test_files_changed_after_release_are_reloaded(tmp_path: Path, cache: MeshCache, budget: int):
+    path = tmp_path / "mesh.ssm"
+    write_mesh(path, *create_cube_data())
+    cube = cache.load(path)
+    cache.budget = budget  # 0 evicts the cube on release
+    cache.release(cube)
+
+    write_mesh(path, *create_sphere_data(8))
+    sphere = cache.load(path)
+    assert sphere is not cube
+    assert sphere.cache_key != cube.cache_key
+    assert sphere.vertex_count == len(create_sphere_data(8)[0])
+    assert cache.load_many([path]) == [sphere]
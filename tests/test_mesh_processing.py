@@ -0,0 +1,30 @@
+import numpy as np
+from benchmarks.bench_mesh_processing import create_grid_soup
+from graphics.mesh import create_sphere_data
+from graphics.mesh_processing import compute_acmr, deduplicate_vertices, optimize_vertex_cache, process_mesh, to_structured
+
+
+def sorted_triangles(indices: np.ndarray) -> list:
+    """The triangles with their winding, independent of order and first vertex."""
+    triangles = indices.reshape(-1, 3)
+    rolled = np.stack([np.roll(triangles, -shift, axis=1) for shift in range(3)])
+    first = np.argmin(rolled[:, :, 0], axis=0)
+    return sorted(map(tuple, rolled[first, np.arange(len(triangles))].tolist()))
+
+
+def test_cache_order_keeps_every_triangle():
+    vertices, indices = create_sphere_data(32)
+    vertices, indices = deduplicate_vertices(to_structured(vertices), np.asarray(indices, dtype=np.uint32))
+    ordered = optimize_vertex_cache(indices, len(vertices))
+    assert ordered.dtype == indices.dtype
+    assert sorted_triangles(ordered) == sorted_triangles(indices)
+    assert compute_acmr(ordered) < 0.7 < compute_acmr(indices)
+
+
+def test_acmr_before_is_measured_on_shared_vertices():
+    vertices, indices = create_grid_soup(32)
+    _, processed, _, stats = process_mesh(vertices, indices)
+
+    _, shared = deduplicate_vertices(to_structured(vertices), indices)
+    assert stats.acmr_before == compute_acmr(shared) < 3.0
+    assert stats.acmr_after == compute_acmr(processed) < 0.7
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from benchmarks.bench_parallel_recording import create_scene, render
+from core.jobs import JobSystem
+from graphics.context import GraphicsContext
+from graphics.mesh import STANDARD_LAYOUT, COMPACT_LAYOUT
+from graphics.render_queue import RenderQueue
+from graphics.renderer import Renderer
+from scene.transform import TransformStore
+
+MIN_BUNDLE_DRAWS = 64
+
+
+class RecordingEncoder:
+    """Stands in for render passes and bundle encoders, records the commands."""
+    def __init__(self) -> None:
+        self.commands = []
+
+    def set_bind_group(self, index: int, bind_group, *args) -> None:
+        self.commands.append(("bind_group", index, bind_group))
+
+    def set_pipeline(self, pipeline) -> None:
+        self.commands.append(("pipeline", pipeline))
+
+    def finish(self, label: str | None = None) -> list:
+        return self.commands
+
+
+class FakeMesh:
+    def __init__(self, name: str, layout) -> None:
+        self.name = name
+        self.layout = layout
+
+
+class FakeEntity:
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+    def draw(self, encoder: RecordingEncoder, state=None, mesh=None) -> None:
+        encoder.commands.append(("draw", self.index, mesh.name))
+
+
+class FakeCamera:
+    position = (0.0, 0.0, 0.0)
+    front = (0.0, 0.0, -1.0)
+    clip_near = 0.1
+    clip_far = 100.0
+    bind_group = "camera"
+
+
+class FakeScene:
+    camera = FakeCamera()
+
+
+def get_pipeline(layout, instanced: bool = False, block: bool = True, depth_only: bool = False) -> str:
+    return f"{layout.name}_depth" if depth_only else layout.name
+
+
+@pytest.fixture
+def renderer():
+    """Just the state the recording uses, no device."""
+    renderer = Renderer.__new__(Renderer)
+    renderer.parallel_recording = True
+    renderer.instanced = False
+    renderer.async_pipelines = False
+    renderer.min_bundle_draws = MIN_BUNDLE_DRAWS
+    renderer.jobs = JobSystem(workers=3)
+    renderer.queue = RenderQueue()
+    renderer.get_pipeline = get_pipeline
+    renderer._create_bundle_encoder = lambda label, depth_only=False: RecordingEncoder()
+    yield renderer
+    renderer.jobs.shutdown()
+
+
+def build_draw_list(queue: RenderQueue, count: int):
+    """Draws of a few meshes in both layouts, at random depths."""
+    rng = np.random.default_rng(11)
+    transforms = TransformStore()
+    rows = transforms.allocate_many(count)
+    transforms.positions[rows] = rng.uniform(-50.0, 50.0, (count, 3))
+    transforms.update_matrices()
+
+    meshes = [FakeMesh(f"mesh{i}", (STANDARD_LAYOUT, COMPACT_LAYOUT)[i % 2]) for i in range(5)]
+    entities = [FakeEntity(i) for i in range(count)]
+    entity_meshes = [meshes[i] for i in rng.integers(0, len(meshes), count)]
+    return queue.build(entities, rows, FakeCamera(), transforms, entity_meshes)
+
+
+def replay(commands: list) -> list:
+    """(pipeline, entity, mesh) of every draw, as the GPU would see them."""
+    draws, pipeline, camera = [], None, None
+    for command in commands:
+        if command[0] == "bind_group":
+            camera = command[2]
+        elif command[0] == "pipeline":
+            pipeline = command[1]
+        else:
+            assert pipeline is not None and camera == "camera", "draw before the state was set"
+            draws.append((pipeline, *command[1:]))
+    return draws
+
+
+@pytest.mark.parametrize("depth_only", [False, True])
+def test_bundles_partition_the_serial_draws(renderer, depth_only: bool):
+    draw_list = build_draw_list(renderer.queue, 1000)
+    assert renderer._record_in_parallel(draw_list)
+
+    serial = RecordingEncoder()
+    pipeline = lambda layout: get_pipeline(layout, depth_only=depth_only)
+    renderer.queue.record(serial, draw_list, FakeCamera(), pipeline)
+
+    bundles = renderer._record_bundles(draw_list, FakeScene(), depth_only)
+    assert 1 < len(bundles) <= renderer.jobs.workers + 1
+
+    # Every bundle sets its own state (bundles start with none) and holds a
+    # contiguous chunk, executed in order they draw exactly what serial does:
+    chunks = [replay(bundle) for bundle in bundles]
+    assert all(len(chunk) >= MIN_BUNDLE_DRAWS for chunk in chunks)
+    assert [draw for chunk in chunks for draw in chunk] == replay(serial.commands)
+    assert len(replay(serial.commands)) == len(draw_list)
+
+
+def test_small_or_serial_draw_lists_are_not_split(renderer):
+    assert not renderer._record_in_parallel(build_draw_list(renderer.queue, 2 * MIN_BUNDLE_DRAWS - 1))
+
+    draw_list = build_draw_list(renderer.queue, 1000)
+    renderer.instanced = True
+    assert not renderer._record_in_parallel(draw_list)
+    renderer.instanced = False
+    renderer.async_pipelines = False
+    renderer.parallel_recording = False
+    assert not renderer._record_in_parallel(draw_list)
+
+
+def test_parallel_recording_renders_the_same_pixels(gpu_device):
+    # Enough visible cubes for several bundles:
+    ctx = GraphicsContext(None, size=(640, 480), device=gpu_device)
+    renderer, scene = create_scene(ctx, threads=4, entity_count=10_000)
+    try:
+        renderer.parallel_recording = False
+        serial = render(ctx, renderer, scene)
+        renderer.parallel_recording = True
+        parallel = render(ctx, renderer, scene)
+    finally:
+        renderer.jobs.shutdown()
+
+    assert np.count_nonzero(np.any(serial != parallel, axis=2)) == 0
@@ -0,0 +1,71 @@
+import threading
+import pytest
+from graphics.mesh import STANDARD_LAYOUT
+from graphics.pipeline_cache import PipelineCache, PipelineKey
+
+
+class FakePromise:
+    """Resolves once the device lets the compilation finish."""
+    def __init__(self, device, label: str) -> None:
+        self.device = device
+        self.label = label
+
+    def sync_wait(self) -> str:
+        self.device.compiled.wait(timeout=10)
+        if self.device.error:
+            raise ValueError(self.device.error)
+        return self.label
+
+
+class FakeDevice:
+    """Compiles pipelines only after `compiled` is set, like a slow driver."""
+    def __init__(self) -> None:
+        self.compiled = threading.Event()
+        self.error = None
+
+    def create_shader_module(self, label: str, code: str) -> str:
+        return label
+
+    def create_pipeline_layout(self, label: str, bind_group_layouts: list) -> str:
+        return label
+
+    def create_render_pipeline_async(self, label: str, **descriptors) -> FakePromise:
+        return FakePromise(self, label)
+
+
+@pytest.fixture
+def device():
+    device = FakeDevice()
+    yield device
+    device.compiled.set()
+
+
+@pytest.fixture
+def cache(device):
+    cache = PipelineCache(device)
+    yield cache
+    cache.shutdown()
+
+
+KEY = PipelineKey(shader="shader.wgsl", layout=STANDARD_LAYOUT, color_formats=("bgra8unorm",))
+
+
+def test_pending_pipelines_do_not_block(device, cache):
+    # Without job system workers (GIL builds) the frame must not wait either:
+    assert cache.get(KEY, block=False) is None
+    assert cache.get(KEY, block=False) is None
+    assert len(cache.pending) == 1
+
+    device.compiled.set()
+    pipeline = cache.get(KEY)
+    assert pipeline == "RENDER_PIPELINE_STANDARD"
+    assert cache.get(KEY, block=False) is pipeline
+    assert not cache.pending
+
+
+def test_creation_errors_are_raised_by_get(device, cache):
+    device.error = "invalid pipeline"
+    cache.request(KEY)
+    device.compiled.set()
+    with pytest.raises(ValueError, match="invalid pipeline"):
+        cache.get(KEY)
@@ -0,0 +1,130 @@
+from pathlib import Path
+import numpy as np
+import pytest
+from pyglm import glm
+from graphics.resources import ResourceRegistry
+from scene.entity import Entity
+from scene.scene import Scene
+from scene.snapshot import save_scene, load_scene
+from scene.transform import TransformStore
+
+
+class FakeRenderer:
+    """The parts of the Renderer that entities and snapshots use, without a GPU."""
+    def __init__(self) -> None:
+        self.transforms = TransformStore()
+        self.resources = ResourceRegistry()
+
+
+class FakeCamera:
+    def __init__(self) -> None:
+        self.renderer = FakeRenderer()
+
+
+class FakeMesh:
+    def __init__(self, source: Path, radius: float = 1.0) -> None:
+        self.source = source
+        self.bounding_center = np.array([0.0, radius, 0.0], dtype=np.float32)
+        self.bounding_radius = radius
+
+
+class FakeMeshCache:
+    """Loads every path as a FakeMesh, remembers what was requested."""
+    def __init__(self) -> None:
+        self.requested: list[Path] = []
+
+    def load_many(self, paths: list, executor=None) -> list:
+        self.requested += paths
+        return [FakeMesh(path, radius=2.0) for path in paths]
+
+
+@pytest.fixture
+def scene(tmp_path: Path) -> Scene:
+    cube = FakeMesh(tmp_path / "meshes" / "cube.ssm", radius=2.0)
+    sphere = FakeMesh(tmp_path / "meshes" / "sphere.ssm", radius=2.0)
+    camera = FakeCamera()
+    renderer = camera.renderer
+
+    root = Entity(renderer, cube, position=glm.vec3(1, 2, 3), rotation=glm.vec3(10, 20, 30), static=True)
+    child = Entity(renderer, sphere, position=glm.vec3(0, 1, 0), scale=glm.vec3(2, 2, 2), parent=root)
+    grandchild = Entity(renderer, cube, position=glm.vec3(-1, 0, 0), parent=child)
+    empty = Entity(renderer, None, position=glm.vec3(5, 5, 5))  # A pivot without a mesh
+
+    scene = Scene(camera)
+    scene.add_many([root, child, grandchild, empty])
+    return scene
+
+
+def save_and_load(tmp_path: Path, scene: Scene) -> tuple[Scene, FakeMeshCache]:
+    path = tmp_path / "scenes" / "level.sss"
+    path.parent.mkdir()
+    save_scene(path, scene)
+
+    cache = FakeMeshCache()
+    return load_scene(path, FakeCamera(), cache), cache
+
+
+def test_transforms_round_trip(tmp_path: Path, scene: Scene):
+    loaded, _ = save_and_load(tmp_path, scene)
+    assert len(loaded.entities) == len(scene.entities)
+
+    original, restored = scene.transforms, loaded.transforms
+    for field in ("positions", "rotations", "scales"):
+        assert np.array_equal(getattr(restored, field)[loaded.rows], getattr(original, field)[scene.rows])
+
+    # The world matrices include the parents:
+    original.update_matrices()
+    restored.update_matrices()
+    assert np.allclose(restored.matrices[loaded.rows], original.matrices[scene.rows])
+
+
+def test_flags_and_parents_round_trip(tmp_path: Path, scene: Scene):
+    loaded, _ = save_and_load(tmp_path, scene)
+    root, child, grandchild, empty = loaded.entities
+
+    assert [entity.static for entity in loaded.entities] == [True, False, False, False]
+    assert child.parent is root and grandchild.parent is child
+    assert root.parent is None and empty.parent is None
+    assert root.children == [child] and child.children == [grandchild]
+    assert loaded.transforms.hierarchy.parents[grandchild.index] == child.index
+
+
+def test_mesh_paths_round_trip(tmp_path: Path, scene: Scene):
+    loaded, cache = save_and_load(tmp_path, scene)
+
+    # Shared meshes are loaded once, relative to the snapshot:
+    meshes = (tmp_path / "meshes").resolve()
+    assert [path.resolve() for path in cache.requested] == [meshes / "cube.ssm", meshes / "sphere.ssm"]
+    root, child, grandchild, empty = loaded.entities
+    assert root.mesh is grandchild.mesh
+    assert child.mesh.source.resolve() == meshes / "sphere.ssm"
+    assert empty.mesh is None
+
+    # Bounding spheres come from the meshes, only entities with one are drawn:
+    transforms = loaded.transforms
+    assert transforms.drawable[loaded.rows].tolist() == [True, True, True, False]
+    assert np.allclose(transforms.bounds_radii[root.index], 2.0)
+
+
+def test_meshes_without_a_file_are_rejected(tmp_path: Path, scene: Scene):
+    scene.entities[1]._mesh = FakeMesh(None)
+    with pytest.raises(ValueError, match="not loaded from a file"):
+        save_scene(tmp_path / "level.sss", scene)
+
+    scene.entities[1]._mesh = FakeMesh(tmp_path / "sphere.obj")
+    with pytest.raises(ValueError, match="not a .ssm file"):
+        save_scene(tmp_path / "level.sss", scene)
+
+
+def test_broken_files_are_rejected(tmp_path: Path, scene: Scene):
+    path = tmp_path / "level.sss"
+    save_scene(path, scene)
+    data = path.read_bytes()
+
+    path.write_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError, match="not a version"):
+        load_scene(path, FakeCamera(), FakeMeshCache())
+
+    path.write_bytes(data[:-10])
+    with pytest.raises(ValueError, match="truncated"):
+        load_scene(path, FakeCamera(), FakeMeshCache())